@@ -1,11 +1,19 @@
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Callable, Generator
 from typing import Optional
 
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Request, Response
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.core.database import SessionLocal
+from app.core import table_versions
+from app.core.database import (
+    AsyncReadSessionLocal,
+    AsyncSessionLocal,
+    ReadSessionLocal,
+    SessionLocal,
+)
+from app.core.read_routing import use_replica
 from app.core.security import security, verify_token
 from app.models.token import Token
 
@@ -18,19 +26,87 @@ def get_db() -> Generator:
         db.close()
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_read_db(request: Request) -> Generator:
+    """Session for read-only handlers: the replica, unless the client wrote recently."""
+    try:
+        db = ReadSessionLocal() if use_replica(request.scope) else SessionLocal()
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    session_factory = AsyncReadSessionLocal if use_replica(request.scope) else AsyncSessionLocal
+    async with session_factory() as db:
+        yield db
+
+
+def _resolved_token(request: Request, credentials: HTTPAuthorizationCredentials) -> Optional[Token]:
+    # Token already resolved for this request by APIActivityMiddleware
+    token: Optional[Token] = getattr(request.state, 'token', None)
+    if token is not None and token.token == credentials.credentials:
+        return token
+    return None
+
+
 def get_current_token(
-    db: Session = Depends(get_db), credentials: HTTPAuthorizationCredentials = Depends(security)
+    request: Request,
+    db: Session = Depends(get_db),
+    credentials: HTTPAuthorizationCredentials = Depends(security),
 ) -> Token:
-    return verify_token(db, credentials)
+    return _resolved_token(request, credentials) or verify_token(db, credentials)
 
 
 def get_current_token_optional(
+    request: Request,
     db: Session = Depends(get_db),
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
 ) -> Optional[Token]:
     if credentials:
         try:
-            return verify_token(db, credentials)
+            return _resolved_token(request, credentials) or verify_token(db, credentials)
         except HTTPException:
             return None
     return None
+
+
+def conditional(
+    *tables: str, session: Callable[..., Generator] = get_read_db
+) -> Callable[..., None]:
+    """
+    Dependency for GET handlers whose response is built from `tables` alone. Sets ETag and
+    Last-Modified from the tables' version counters, and answers 304 Not Modified before the
+    handler runs when If-None-Match already holds that ETag. `session` is the handler's own
+    session dependency, so the versions and the body are read through the same session.
+    """
+
+    def check(
+        request: Request,
+        response: Response,
+        db: Session = Depends(session),
+        current_token: Token = Depends(get_current_token),
+    ) -> None:
+        etag, last_modified = table_versions.validators(db, tables)
+        headers = {'ETag': etag}
+        if last_modified:
+            headers['Last-Modified'] = last_modified
+        if table_versions.etag_matches(request.headers.get('if-none-match'), etag):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+
+    return check
+
+
+def json_response(body: bytes, response: Response) -> Response:
+    """Response for a pre-serialized JSON body, keeping the validators set by conditional."""
+    headers = {
+        name: value
+        for name, value in response.headers.items()
+        if name in ('etag', 'last-modified')
+    }
+    return Response(content=body, media_type='application/json', headers=headers)
@@ -3,7 +3,7 @@ from typing import Any
 from fastapi import APIRouter, Depends, Form, HTTPException, Request
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import crud, schemas
 from app.api import deps
@@ -21,8 +21,8 @@ async def dashboard(request: Request) -> Any:
 
 
 @router.get('/dashboard/users', response_class=HTMLResponse)
-async def users_tab(request: Request, db: Session = Depends(deps.get_db)) -> Any:
-    users = crud.user.get_multi(db, limit=1000)
+async def users_tab(request: Request, db: AsyncSession = Depends(deps.get_async_read_db)) -> Any:
+    users = await crud.user.get_multi_async(db, limit=1000, profile='full')
     # Sort users by username alphabetically
     users.sort(key=lambda x: x.username.lower())
 
@@ -60,8 +60,10 @@ async def new_user_form(request: Request) -> Any:
 
 
 @router.get('/dashboard/users/{user_id}', response_class=HTMLResponse)
-async def user_detail(request: Request, user_id: str, db: Session = Depends(deps.get_db)) -> Any:
-    user = crud.user.get(db, id=user_id)
+async def user_detail(
+    request: Request, user_id: str, db: AsyncSession = Depends(deps.get_async_read_db)
+) -> Any:
+    user = await crud.user.get_async(db, id=user_id, profile='full')
     if not user:
         raise HTTPException(status_code=404, detail='User not found')
     return templates.TemplateResponse(
@@ -70,8 +72,10 @@ async def user_detail(request: Request, user_id: str, db: Session = Depends(deps
 
 
 @router.get('/dashboard/users/{user_id}/edit', response_class=HTMLResponse)
-async def edit_user_form(request: Request, user_id: str, db: Session = Depends(deps.get_db)) -> Any:
-    user = crud.user.get(db, id=user_id)
+async def edit_user_form(
+    request: Request, user_id: str, db: AsyncSession = Depends(deps.get_async_read_db)
+) -> Any:
+    user = await crud.user.get_async(db, id=user_id, profile='bare')
     if not user:
         raise HTTPException(status_code=404, detail='User not found')
     return templates.TemplateResponse(
@@ -87,8 +91,8 @@ async def edit_user_form(request: Request, user_id: str, db: Session = Depends(d
 
 
 @router.get('/dashboard/roles', response_class=HTMLResponse)
-async def roles_tab(request: Request, db: Session = Depends(deps.get_db)) -> Any:
-    roles = crud.role.get_multi(db, limit=1000)
+async def roles_tab(request: Request, db: AsyncSession = Depends(deps.get_async_read_db)) -> Any:
+    roles = await crud.role.get_multi_async(db, limit=1000, profile='with_user_ids')
     # Sort roles by role name alphabetically
     roles.sort(key=lambda x: x.role_name.lower())
 
@@ -112,8 +116,10 @@ async def roles_tab(request: Request, db: Session = Depends(deps.get_db)) -> Any
 
 
 @router.get('/dashboard/roles/new', response_class=HTMLResponse)
-async def new_role_form(request: Request, db: Session = Depends(deps.get_db)) -> Any:
-    users = crud.user.get_multi(db, limit=1000)
+async def new_role_form(
+    request: Request, db: AsyncSession = Depends(deps.get_async_read_db)
+) -> Any:
+    users = await crud.user.get_multi_async(db, limit=1000, profile='bare')
     return templates.TemplateResponse(
         'dashboard/role_form.html',
         {
@@ -128,8 +134,10 @@ async def new_role_form(request: Request, db: Session = Depends(deps.get_db)) ->
 
 
 @router.get('/dashboard/roles/{role_id}', response_class=HTMLResponse)
-async def role_detail(request: Request, role_id: str, db: Session = Depends(deps.get_db)) -> Any:
-    role = crud.role.get(db, id=role_id)
+async def role_detail(
+    request: Request, role_id: str, db: AsyncSession = Depends(deps.get_async_read_db)
+) -> Any:
+    role = await crud.role.get_async(db, id=role_id, profile='full')
     if not role:
         raise HTTPException(status_code=404, detail='Role not found')
     return templates.TemplateResponse(
@@ -138,11 +146,13 @@ async def role_detail(request: Request, role_id: str, db: Session = Depends(deps
 
 
 @router.get('/dashboard/roles/{role_id}/edit', response_class=HTMLResponse)
-async def edit_role_form(request: Request, role_id: str, db: Session = Depends(deps.get_db)) -> Any:
-    role = crud.role.get(db, id=role_id)
+async def edit_role_form(
+    request: Request, role_id: str, db: AsyncSession = Depends(deps.get_async_read_db)
+) -> Any:
+    role = await crud.role.get_async(db, id=role_id, profile='with_user_ids')
     if not role:
         raise HTTPException(status_code=404, detail='Role not found')
-    users = crud.user.get_multi(db, limit=1000)
+    users = await crud.user.get_multi_async(db, limit=1000, profile='bare')
     return templates.TemplateResponse(
         'dashboard/role_form.html',
         {
@@ -157,13 +167,16 @@ async def edit_role_form(request: Request, role_id: str, db: Session = Depends(d
 
 
 @router.get('/dashboard/secrets', response_class=HTMLResponse)
-async def secrets_tab(request: Request, db: Session = Depends(deps.get_db)) -> Any:
-    tokens = crud.token.get_multi(db, limit=1000)
+async def secrets_tab(request: Request, db: AsyncSession = Depends(deps.get_async_read_db)) -> Any:
+    tokens = await crud.token.get_multi_async(db, limit=1000, profile='bare')
+    # Counts come from the rollups so the raw activity log is never scanned
+    activity_counts = await crud.activity_rollup.totals_by_token_async(db)
 
     # Check if this is an HTMX request
     if request.headers.get('hx-request'):
         return templates.TemplateResponse(
-            'dashboard/secrets.html', {'request': request, 'tokens': tokens}
+            'dashboard/secrets.html',
+            {'request': request, 'tokens': tokens, 'activity_counts': activity_counts},
         )
     else:
         # Full page for direct access/refresh
@@ -172,7 +185,7 @@ async def secrets_tab(request: Request, db: Session = Depends(deps.get_db)) -> A
             {
                 'request': request,
                 'initial_content': templates.get_template('dashboard/secrets.html').render(
-                    request=request, tokens=tokens
+                    request=request, tokens=tokens, activity_counts=activity_counts
                 ),
                 'active_tab': 'secrets',
             },
@@ -180,11 +193,13 @@ async def secrets_tab(request: Request, db: Session = Depends(deps.get_db)) -> A
 
 
 @router.get('/dashboard/secrets/{token_id}', response_class=HTMLResponse)
-async def secret_detail(request: Request, token_id: str, db: Session = Depends(deps.get_db)) -> Any:
-    token = crud.token.get(db, id=token_id)
+async def secret_detail(
+    request: Request, token_id: str, db: AsyncSession = Depends(deps.get_async_read_db)
+) -> Any:
+    token = await crud.token.get_async(db, id=token_id, profile='bare')
     if not token:
         raise HTTPException(status_code=404, detail='Token not found')
-    activities = crud.activity.get_by_token(db, token_id=token_id, limit=100)
+    activities = await crud.activity.get_by_token_async(db, token_id=token_id, limit=100)
     return templates.TemplateResponse(
         'dashboard/secret_detail.html',
         {'request': request, 'token': token, 'activities': activities},
@@ -204,14 +219,16 @@ async def validate_name(request: Request) -> str:
 
 
 @router.post('/validate/email', response_class=HTMLResponse)
-async def validate_email(email: str = Form(...), db: Session = Depends(deps.get_db)) -> str:
+async def validate_email(
+    email: str = Form(...), db: AsyncSession = Depends(deps.get_async_db)
+) -> str:
     import re
 
     if not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email):
         return '<span class="text-red-600">Invalid email format</span>'
 
     # Check if email already exists
-    existing = crud.user.get_by_email(db, email=email)
+    existing = await crud.user.get_by_email_async(db, email=email)
     if existing:
         return '<span class="text-red-600">Email already exists</span>'
 
@@ -219,9 +236,9 @@ async def validate_email(email: str = Form(...), db: Session = Depends(deps.get_
 
 
 @router.post('/api/v1/secrets/htmx', response_class=HTMLResponse)
-async def create_secret_htmx(db: Session = Depends(deps.get_db)) -> str:
+async def create_secret_htmx(db: AsyncSession = Depends(deps.get_async_db)) -> str:
     # Create token
-    token = crud.token.create(db)
+    token = await crud.token.create_async(db)
 
     # Return HTML response for HTMX
     return f"""
@@ -255,7 +272,7 @@ async def create_secret_htmx(db: Session = Depends(deps.get_db)) -> str:
 
 # UI form handlers (no authentication required)
 @router.post('/ui/users/create', response_class=HTMLResponse)
-async def create_user_ui(request: Request, db: Session = Depends(deps.get_db)) -> Any:
+async def create_user_ui(request: Request, db: AsyncSession = Depends(deps.get_async_db)) -> Any:
     form = await request.form()
 
     # Extract form data
@@ -264,54 +281,49 @@ async def create_user_ui(request: Request, db: Session = Depends(deps.get_db)) -
     )
 
     # Check if email already exists
-    if crud.user.get_by_email(db, email=user_data.email):
+    if await crud.user.get_by_email_async(db, email=user_data.email):
         # Return error response
         return templates.TemplateResponse(
             'dashboard/error.html',
             {'request': request, 'error': 'A user with this email already exists.'},
         )
 
-    # Create user
-    user = crud.user.create(db, obj_in=user_data)
-
-    # Check if password was generated
-    generated_password = getattr(user, 'generated_password', None)
+    # Create user; the password is generated and hashed off the event loop
+    user = await crud.user.create_async(db, obj_in=user_data)
+    generated_password = user.generated_password
 
     # Return updated users list with success message
-    users = crud.user.get_multi(db, limit=1000)
-
-    if generated_password:
-        # Return a response that includes the generated password
-        return f"""
-        <div class="rounded-md bg-green-50 p-4 mb-4">
-            <div class="flex">
-                <div class="flex-shrink-0">
-                    <svg class="h-5 w-5 text-green-400" xmlns="http://www.w3.org/2000/svg" viewBox="0 0 20 20" fill="currentColor" aria-hidden="true">
-                        <path fill-rule="evenodd" d="M10 18a8 8 0 100-16 8 8 0 000 16zm3.707-9.293a1 1 0 00-1.414-1.414L9 10.586 7.707 9.293a1 1 0 00-1.414 1.414l2 2a1 1 0 001.414 0l4-4z" clip-rule="evenodd" />
-                    </svg>
-                </div>
-                <div class="ml-3">
-                    <h3 class="text-sm font-medium text-green-800">User Created Successfully</h3>
-                    <div class="mt-2 text-sm text-green-700">
-                        <p>Username: <strong>{user.username}</strong></p>
-                        <p>Generated Password: <strong>{generated_password}</strong></p>
-                        <p class="mt-1 text-xs">Save this password - it won't be shown again!</p>
-                    </div>
+    users = await crud.user.get_multi_async(db, limit=1000, profile='full')
+
+    # Return a response that includes the generated password
+    return f"""
+    <div class="rounded-md bg-green-50 p-4 mb-4">
+        <div class="flex">
+            <div class="flex-shrink-0">
+                <svg class="h-5 w-5 text-green-400" xmlns="http://www.w3.org/2000/svg" viewBox="0 0 20 20" fill="currentColor" aria-hidden="true">
+                    <path fill-rule="evenodd" d="M10 18a8 8 0 100-16 8 8 0 000 16zm3.707-9.293a1 1 0 00-1.414-1.414L9 10.586 7.707 9.293a1 1 0 00-1.414 1.414l2 2a1 1 0 001.414 0l4-4z" clip-rule="evenodd" />
+                </svg>
+            </div>
+            <div class="ml-3">
+                <h3 class="text-sm font-medium text-green-800">User Created Successfully</h3>
+                <div class="mt-2 text-sm text-green-700">
+                    <p>Username: <strong>{user.username}</strong></p>
+                    <p>Generated Password: <strong>{generated_password}</strong></p>
+                    <p class="mt-1 text-xs">Save this password - it won't be shown again!</p>
                 </div>
             </div>
         </div>
-        """ + templates.get_template('dashboard/users.html').render(request=request, users=users)
-    else:
-        return templates.TemplateResponse(
-            'dashboard/users.html', {'request': request, 'users': users}
-        )
+    </div>
+    """ + templates.get_template('dashboard/users.html').render(request=request, users=users)
 
 
 @router.post('/ui/users/{user_id}', response_class=HTMLResponse)
-async def update_user_ui(request: Request, user_id: str, db: Session = Depends(deps.get_db)) -> Any:
+async def update_user_ui(
+    request: Request, user_id: str, db: AsyncSession = Depends(deps.get_async_db)
+) -> Any:
     form = await request.form()
 
-    user = crud.user.get(db, id=user_id)
+    user = await crud.user.get_async(db, id=user_id)
     if not user:
         return templates.TemplateResponse(
             'dashboard/error.html', {'request': request, 'error': 'User not found'}
@@ -335,28 +347,26 @@ async def update_user_ui(request: Request, user_id: str, db: Session = Depends(d
         update_data['display_name'] = f'{first_name} {last_name}'
 
     # Update user
-    user = crud.user.update(db, db_obj=user, obj_in=update_data)
+    user = await crud.user.update_async(db, db_obj=user, obj_in=update_data)
 
     # Return updated users list
-    users = crud.user.get_multi(db, limit=1000)
+    users = await crud.user.get_multi_async(db, limit=1000, profile='full')
     # Sort users by username alphabetically
     users.sort(key=lambda x: x.username.lower())
     return templates.TemplateResponse('dashboard/users.html', {'request': request, 'users': users})
 
 
 @router.delete('/ui/users/{user_id}', response_class=HTMLResponse)
-async def delete_user_ui(user_id: str, db: Session = Depends(deps.get_db)) -> str:
-    user = crud.user.get(db, id=user_id)
-    if not user:
+async def delete_user_ui(user_id: str, db: AsyncSession = Depends(deps.get_async_db)) -> str:
+    if not await crud.user.remove_async(db, id=user_id):
         return '<div class="text-red-600">User not found</div>'
 
-    crud.user.remove(db, id=user_id)
     # Return empty response for HTMX to remove the row
     return ''
 
 
 @router.post('/ui/roles/create', response_class=HTMLResponse)
-async def create_role_ui(request: Request, db: Session = Depends(deps.get_db)) -> Any:
+async def create_role_ui(request: Request, db: AsyncSession = Depends(deps.get_async_db)) -> Any:
     form = await request.form()
 
     # Extract form data
@@ -365,7 +375,7 @@ async def create_role_ui(request: Request, db: Session = Depends(deps.get_db)) -
     )
 
     # Check if role name already exists
-    if crud.role.get_by_name(db, role_name=role_data.role_name):
+    if await crud.role.get_by_name_async(db, role_name=role_data.role_name):
         # Return error response
         return templates.TemplateResponse(
             'dashboard/error.html',
@@ -373,20 +383,22 @@ async def create_role_ui(request: Request, db: Session = Depends(deps.get_db)) -
         )
 
     # Create role
-    crud.role.create(db, obj_in=role_data)
+    await crud.role.create_async(db, obj_in=role_data)
 
     # Return updated roles list
-    roles = crud.role.get_multi(db, limit=1000)
+    roles = await crud.role.get_multi_async(db, limit=1000, profile='with_user_ids')
     # Sort roles by role name alphabetically
     roles.sort(key=lambda x: x.role_name.lower())
     return templates.TemplateResponse('dashboard/roles.html', {'request': request, 'roles': roles})
 
 
 @router.post('/ui/roles/{role_id}', response_class=HTMLResponse)
-async def update_role_ui(request: Request, role_id: str, db: Session = Depends(deps.get_db)) -> Any:
+async def update_role_ui(
+    request: Request, role_id: str, db: AsyncSession = Depends(deps.get_async_db)
+) -> Any:
     form = await request.form()
 
-    role = crud.role.get(db, id=role_id)
+    role = await crud.role.get_async(db, id=role_id)
     if not role:
         return templates.TemplateResponse(
             'dashboard/error.html', {'request': request, 'error': 'Role not found'}
@@ -401,15 +413,15 @@ async def update_role_ui(request: Request, role_id: str, db: Session = Depends(d
 
     # Update role
     if update_data:
-        role = crud.role.update(db, db_obj=role, obj_in=update_data)
+        role = await crud.role.update_async(db, db_obj=role, obj_in=update_data)
 
     # Update user assignments
     user_ids = form.getlist('user_ids')
     if user_ids is not None:
-        role = crud.role.update_users(db, db_obj=role, user_ids=user_ids)
+        role = await crud.role.update_users_async(db, db_obj=role, user_ids=user_ids)
 
     # Return updated roles list
-    roles = crud.role.get_multi(db, limit=1000)
+    roles = await crud.role.get_multi_async(db, limit=1000, profile='with_user_ids')
     # Sort roles by role name alphabetically
     roles.sort(key=lambda x: x.role_name.lower())
     return templates.TemplateResponse('dashboard/roles.html', {'request': request, 'roles': roles})
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import roles, users
+from app.api.v1.endpoints import activities, membership, roles, users
 
 api_router = APIRouter()
 
@@ -10,3 +10,9 @@ api_router.include_router(users.router, prefix='/users', tags=['users'])
 
 # /roles endpoints (all CRUD operations)
 api_router.include_router(roles.router, prefix='/roles', tags=['roles'])
+
+# /membership endpoints (membership checks and role set queries)
+api_router.include_router(membership.router, prefix='/membership', tags=['membership'])
+
+# /activities endpoints (read-only API activity log)
+api_router.include_router(activities.router, prefix='/activities', tags=['activities'])
@@ -0,0 +1,125 @@
+from datetime import datetime, timezone
+from typing import Any, Literal, Optional, overload
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app import crud, schemas
+from app.api import deps
+from app.core.instrumentation import route_latency
+from app.core.pagination import decode_cursor, encode_cursor
+from app.models.token import Token
+
+router = APIRouter()
+
+
+@overload
+def _utc(value: datetime) -> datetime: ...
+
+
+@overload
+def _utc(value: None) -> None: ...
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Timestamps are stored in UTC and SQLite compares them as text, so query bounds in another
+    # offset are converted first; naive values are taken to be UTC already
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+@router.get('/', response_model=schemas.ActivityPage)
+def read_activities(
+    db: Session = Depends(deps.get_read_db),
+    token_id: Optional[str] = None,
+    endpoint: Optional[str] = Query(None, description="Exact endpoint, e.g. 'GET /api/v1/users/'"),
+    status_min: Optional[int] = Query(None, ge=100, le=599),
+    status_max: Optional[int] = Query(None, ge=100, le=599),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = Query(None, description='next_cursor from the previous page'),
+    limit: int = Query(100, ge=1, le=1000),
+    current_token: Token = Depends(deps.get_current_token),
+) -> Any:
+    """List API activity newest first, using keyset pagination on (timestamp, id)."""
+    before = None
+    if cursor:
+        timestamp, activity_id = decode_cursor(cursor, 2)
+        if not isinstance(activity_id, str):
+            raise HTTPException(status_code=400, detail='Invalid cursor')
+        try:
+            before = (_utc(datetime.fromisoformat(timestamp)), activity_id)
+        except (TypeError, ValueError) as error:
+            raise HTTPException(status_code=400, detail='Invalid cursor') from error
+
+    # Fetch one extra row to know whether another page exists
+    activities = crud.activity.get_page_before(
+        db,
+        token_id=token_id,
+        endpoint=endpoint,
+        status_min=status_min,
+        status_max=status_max,
+        since=_utc(since),
+        until=_utc(until),
+        before=before,
+        limit=limit + 1,
+    )
+    next_cursor = None
+    if len(activities) > limit:
+        activities = activities[:limit]
+        last = activities[-1]
+        next_cursor = encode_cursor(last.timestamp, last.id)
+    return schemas.ActivityPage(
+        items=[schemas.Activity.model_validate(activity) for activity in activities],
+        next_cursor=next_cursor,
+    )
+
+
+@router.get('/latency', response_model=list[schemas.RouteLatency])
+def read_route_latency(current_token: Token = Depends(deps.get_current_token)) -> Any:
+    """Latency percentiles per API route since startup, from in-memory histograms."""
+    return [
+        schemas.RouteLatency(route=route, **summary)
+        for route, summary in route_latency.summary().items()
+    ]
+
+
+@router.get('/rollups', response_model=list[schemas.ActivityRollup])
+def read_activity_rollups(
+    token_id: str,
+    db: Session = Depends(deps.get_read_db),
+    granularity: Literal['minute', 'hour'] = 'minute',
+    endpoint: Optional[str] = Query(None, description="Route, e.g. 'GET /api/v1/users/{user_id}'"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    current_token: Token = Depends(deps.get_current_token),
+) -> Any:
+    """Request counts and status classes per route and time bucket for one token."""
+    return crud.activity_rollup.get_series(
+        db,
+        token_id=token_id,
+        granularity=granularity,
+        endpoint=endpoint,
+        since=_utc(since),
+        until=_utc(until),
+        limit=limit,
+    )
+
+
+@router.get('/top-endpoints', response_model=list[schemas.EndpointActivity])
+def read_top_endpoints(
+    token_id: str,
+    db: Session = Depends(deps.get_read_db),
+    since: Optional[datetime] = Query(None, description='Rounded down to the hour'),
+    until: Optional[datetime] = None,
+    limit: int = Query(10, ge=1, le=100),
+    current_token: Token = Depends(deps.get_current_token),
+) -> Any:
+    """Most requested routes for one token, from the hourly rollups."""
+    return crud.activity_rollup.top_endpoints(
+        db, token_id=token_id, since=_utc(since), until=_utc(until), limit=limit
+    )
@@ -0,0 +1,52 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app import crud, schemas
+from app.api import deps
+from app.core.membership_index import membership_index
+from app.models.token import Token
+
+router = APIRouter()
+
+
+@router.get('/check', response_model=schemas.MembershipCheck)
+def check_membership(
+    user_id: str,
+    role_id: str,
+    db: Session = Depends(deps.get_read_db),
+    current_token: Token = Depends(deps.get_current_token),
+) -> Any:
+    """Whether a user holds a role."""
+    if membership_index.enabled:
+        member = membership_index.has(user_id, role_id)
+    else:
+        member = crud.membership.has(db, user_id=user_id, role_id=role_id)
+    return schemas.MembershipCheck(user_id=user_id, role_id=role_id, member=member)
+
+
+@router.get('/users', response_model=schemas.MembershipQuery)
+def select_users(
+    any_of: list[str] = Query([], description='Users holding at least one of these roles'),
+    all_of: list[str] = Query([], description='Users holding every one of these roles'),
+    none_of: list[str] = Query([], description='Users holding none of these roles'),
+    limit: int = Query(100, ge=0, le=1000),
+    db: Session = Depends(deps.get_read_db),
+    current_token: Token = Depends(deps.get_current_token),
+) -> Any:
+    """
+    Users matching a boolean combination of roles, e.g. ?all_of=A&all_of=B for the intersection
+    of two roles. Unknown role ids match no users.
+    """
+    if not any_of and not all_of:
+        raise HTTPException(status_code=400, detail='Give at least one any_of or all_of role')
+
+    if membership_index.enabled:
+        bits = membership_index.select(any_of=any_of, all_of=all_of, none_of=none_of)
+        count, user_ids = membership_index.count(bits), membership_index.user_ids(bits, limit)
+    else:
+        count, user_ids = crud.membership.select_users(
+            db, any_of=any_of, all_of=all_of, none_of=none_of, limit=limit
+        )
+    return schemas.MembershipQuery(count=count, user_ids=user_ids)
@@ -1,52 +1,249 @@
-from typing import Any
+from typing import Any, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
 
 from app import crud, schemas
 from app.api import deps
+from app.core.cache import role_cache
+from app.core.pagination import next_page, page_after, set_page_headers
 from app.models.token import Token
+from app.models.user import User
 
 router = APIRouter()
 
 
-@router.get('/', response_model=list[schemas.Role])
+@router.get(
+    '/',
+    response_model=list[schemas.Role],
+    dependencies=[Depends(deps.conditional('roles'))],
+)
 def read_roles(
-    db: Session = Depends(deps.get_db),
+    request: Request,
+    response: Response,
+    db: Session = Depends(deps.get_read_db),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description='X-Next-Cursor from the previous page'),
+    order_by: Literal['id', 'role_name'] = 'id',
+    include_total: bool = Query(False, description='Return the role count in X-Total-Count'),
     current_token: Token = Depends(deps.get_current_token),
 ) -> Any:
-    roles = crud.role.get_multi(db, skip=skip, limit=limit)
+    """List roles a page at a time, with Link and X-Next-Cursor headers as for users."""
+    after = page_after(cursor, order_by)
+    roles = crud.role.get_page(
+        db,
+        order_by=order_by,
+        after=after,
+        skip=0 if after is not None else skip,
+        limit=limit + 1,
+        profile='bare',
+    )
+    roles, next_cursor = next_page(roles, limit, order_by)
+    total = crud.role.count(db) if include_total else None
+    set_page_headers(request, response, next_cursor, total)
     return roles
 
 
-@router.get('/{role_id}', response_model=schemas.RoleWithUsers)
+@router.get(
+    '/{role_id}',
+    response_model=schemas.RoleWithUsers,
+    dependencies=[Depends(deps.conditional('roles', 'user_roles', session=deps.get_db))],
+)
 def read_role(
     role_id: str,
+    response: Response,
+    # Cache misses read the primary, so replica lag is never cached
     db: Session = Depends(deps.get_db),
     current_token: Token = Depends(deps.get_current_token),
 ) -> Any:
-    role = crud.role.get(db, id=role_id)
-    if not role:
+    def load() -> Optional[bytes]:
+        role = crud.role.get(db, id=role_id, profile='with_user_ids')
+        if not role:
+            return None
+
+        # Convert to response model with user IDs
+        role_dict = role.__dict__.copy()
+        role_dict['user_ids'] = [user.id for user in role.users]
+
+        return schemas.RoleWithUsers(**role_dict).model_dump_json().encode()
+
+    body = role_cache.read_through(role_id, load)
+    if body is None:
         raise HTTPException(status_code=404, detail='Role not found')
-    
-    # Convert to response model with user IDs
-    role_dict = role.__dict__.copy()
-    role_dict['user_ids'] = [user.id for user in role.users]
-    
-    return schemas.RoleWithUsers(**role_dict)
+    return deps.json_response(body, response)
 
 
-@router.get('/{role_id}/users', response_model=list[schemas.User])
+@router.get(
+    '/{role_id}/users',
+    response_model=list[schemas.User],
+    dependencies=[Depends(deps.conditional('roles', 'users', 'user_roles'))],
+)
 def get_role_users(
+    request: Request,
+    response: Response,
+    role_id: str,
+    db: Session = Depends(deps.get_read_db),
+    limit: Optional[int] = Query(None, ge=1, description='Page size; every member if omitted'),
+    cursor: Optional[str] = Query(None, description='X-Next-Cursor from the previous page'),
+    order_by: Literal['id', 'username'] = 'id',
+    include_total: bool = Query(False, description='Return the member count in X-Total-Count'),
+    current_token: Token = Depends(deps.get_current_token),
+) -> Any:
+    """Get the users assigned to a specific role, optionally a page at a time."""
+    role = crud.role.get(db, id=role_id, profile='bare')
+    if not role:
+        raise HTTPException(status_code=404, detail='Role not found')
+
+    users = crud.role.get_users_page(
+        db,
+        role_id=role_id,
+        order_by=order_by,
+        after=page_after(cursor, order_by),
+        limit=limit + 1 if limit else None,
+    )
+    next_cursor = None
+    if limit:
+        users, next_cursor = next_page(users, limit, order_by)
+    total = crud.role.count_users(db, role_id=role_id) if include_total else None
+    set_page_headers(request, response, next_cursor, total)
+    return users
+
+
+@router.get(
+    '/{role_id}/effective-users',
+    response_model=list[schemas.User],
+    dependencies=[Depends(deps.conditional('roles', 'users', 'user_roles', 'role_closure'))],
+)
+def get_role_effective_users(
+    request: Request,
+    response: Response,
+    role_id: str,
+    db: Session = Depends(deps.get_read_db),
+    limit: Optional[int] = Query(None, ge=1, description='Page size; every user if omitted'),
+    cursor: Optional[str] = Query(None, description='X-Next-Cursor from the previous page'),
+    order_by: Literal['id', 'username'] = 'id',
+    include_total: bool = Query(False, description='Return the user count in X-Total-Count'),
+    current_token: Token = Depends(deps.get_current_token),
+) -> Any:
+    """Users holding the role directly or through a role that inherits it."""
+    role = crud.role.get(db, id=role_id, profile='bare')
+    if not role:
+        raise HTTPException(status_code=404, detail='Role not found')
+
+    users = crud.role.get_effective_users_page(
+        db,
+        role_id=role_id,
+        order_by=order_by,
+        after=page_after(cursor, order_by),
+        limit=limit + 1 if limit else None,
+    )
+    next_cursor = None
+    if limit:
+        users, next_cursor = next_page(users, limit, order_by)
+    total = crud.role.count_effective_users(db, role_id=role_id) if include_total else None
+    set_page_headers(request, response, next_cursor, total)
+    return users
+
+
+@router.get(
+    '/{role_id}/parents',
+    response_model=list[schemas.Role],
+    dependencies=[Depends(deps.conditional('roles', 'role_hierarchy'))],
+)
+def get_role_parents(
+    role_id: str,
+    db: Session = Depends(deps.get_read_db),
+    current_token: Token = Depends(deps.get_current_token),
+) -> Any:
+    """Roles this role inherits directly."""
+    if not crud.role.get(db, id=role_id, profile='bare'):
+        raise HTTPException(status_code=404, detail='Role not found')
+    return crud.role_hierarchy.get_parents(db, role_id=role_id)
+
+
+@router.post('/{role_id}/parents/{parent_id}', status_code=status.HTTP_201_CREATED)
+def add_role_parent(
     role_id: str,
+    parent_id: str,
     db: Session = Depends(deps.get_db),
     current_token: Token = Depends(deps.get_current_token),
 ) -> Any:
-    """Get all users assigned to a specific role."""
-    role = crud.role.get(db, id=role_id)
+    """Make a role inherit another: holders of the role also hold the parent and its ancestors."""
+    role = crud.role.get(db, id=role_id, profile='bare')
     if not role:
         raise HTTPException(status_code=404, detail='Role not found')
-    
-    return role.users
\ No newline at end of file
+    parent = crud.role.get(db, id=parent_id, profile='bare')
+    if not parent:
+        raise HTTPException(status_code=404, detail='Parent role not found')
+
+    # The parent may not be the role itself or already inherit from it
+    try:
+        added = crud.role_hierarchy.add_parent(db, role_id=role_id, parent_id=parent_id)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error)) from error
+    if not added:
+        raise HTTPException(status_code=400, detail='Role already inherits this role')
+
+    return {'message': f'Role {role.role_name} now inherits {parent.role_name}'}
+
+
+@router.delete('/{role_id}/parents/{parent_id}', status_code=status.HTTP_204_NO_CONTENT)
+def remove_role_parent(
+    role_id: str,
+    parent_id: str,
+    db: Session = Depends(deps.get_db),
+    current_token: Token = Depends(deps.get_current_token),
+) -> None:
+    """Stop a role inheriting a parent directly."""
+    if not crud.role_hierarchy.remove_parent(db, role_id=role_id, parent_id=parent_id):
+        raise HTTPException(status_code=404, detail='Role does not inherit this role')
+
+
+def check_users_exist(db: Session, user_ids: list[str]) -> None:
+    missing = crud.membership.missing(db, model=User, ids=user_ids)
+    if missing:
+        raise HTTPException(status_code=400, detail=f'Users not found: {", ".join(sorted(missing))}')
+
+
+@router.patch('/{role_id}/users', response_model=schemas.MembershipChange)
+def update_role_users(
+    role_id: str,
+    membership_in: schemas.MembershipUpdate,
+    db: Session = Depends(deps.get_db),
+    current_token: Token = Depends(deps.get_current_token),
+) -> Any:
+    """Add and remove users of a role; ids already in the requested state are skipped."""
+    if not crud.role.get(db, id=role_id, profile='bare'):
+        raise HTTPException(status_code=404, detail='Role not found')
+    both = set(membership_in.add) & set(membership_in.remove)
+    if both:
+        raise HTTPException(
+            status_code=400, detail=f'Users both added and removed: {", ".join(sorted(both))}'
+        )
+    check_users_exist(db, membership_in.add)
+
+    added, removed = crud.membership.apply(
+        db,
+        add=[(user_id, role_id) for user_id in membership_in.add],
+        remove=[(user_id, role_id) for user_id in membership_in.remove],
+    )
+    return schemas.MembershipChange(added=added, removed=removed)
+
+
+@router.put('/{role_id}/users', response_model=schemas.MembershipChange)
+def replace_role_users(
+    role_id: str,
+    users_in: schemas.RoleUsersReplace,
+    db: Session = Depends(deps.get_db),
+    current_token: Token = Depends(deps.get_current_token),
+) -> Any:
+    """Set the users of a role, writing only the assignments that differ from the current ones."""
+    if not crud.role.get(db, id=role_id, profile='bare'):
+        raise HTTPException(status_code=404, detail='Role not found')
+    check_users_exist(db, users_in.user_ids)
+
+    added, removed = crud.membership.replace_role_users(
+        db, role_id=role_id, user_ids=users_in.user_ids
+    )
+    return schemas.MembershipChange(added=added, removed=removed)
@@ -1,41 +1,150 @@
-from typing import Any
+from typing import Any, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app import crud, schemas
 from app.api import deps
+from app.core import user_import
+from app.core.cache import user_cache
+from app.core.pagination import encode_cursor, next_page, page_after, set_page_headers
+from app.models.role import Role
 from app.models.token import Token
 
 router = APIRouter()
 
+# The import body is streamed rather than parsed by FastAPI, so describe it explicitly
+IMPORT_REQUEST_BODY = {
+    'required': True,
+    'content': {
+        'application/json': {
+            'schema': {'type': 'array', 'items': {'$ref': '#/components/schemas/UserCreate'}}
+        },
+        'application/x-ndjson': {
+            'schema': {'$ref': '#/components/schemas/UserCreate'},
+            'example': '{"first_name": "Jane", "last_name": "Smith", "email": "jane@example.com"}',
+        },
+        'text/csv': {
+            'schema': {'type': 'string'},
+            'example': 'first_name,last_name,email,password\nJane,Smith,jane@example.com,\n',
+        },
+    },
+}
 
-@router.get('/', response_model=list[schemas.User])
+
+@router.get(
+    '/',
+    response_model=list[schemas.User],
+    dependencies=[Depends(deps.conditional('users'))],
+)
 def read_users(
-    db: Session = Depends(deps.get_db),
+    request: Request,
+    response: Response,
+    db: Session = Depends(deps.get_read_db),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description='X-Next-Cursor from the previous page'),
+    order_by: Literal['id', 'username'] = 'id',
+    include_total: bool = Query(False, description='Return the user count in X-Total-Count'),
+    current_token: Token = Depends(deps.get_current_token),
+) -> Any:
+    """
+    List users a page at a time. The next page is linked in the Link and X-Next-Cursor headers;
+    a cursor seeks by key, so deep pages cost the same as the first.
+    """
+    after = page_after(cursor, order_by)
+    # Fetch one extra row to know whether another page exists
+    users = crud.user.get_page(
+        db,
+        order_by=order_by,
+        after=after,
+        skip=0 if after is not None else skip,
+        limit=limit + 1,
+        profile='bare',
+    )
+    users, next_cursor = next_page(users, limit, order_by)
+    total = crud.user.count(db) if include_total else None
+    set_page_headers(request, response, next_cursor, total)
+    return users
+
+
+@router.get(
+    '/search',
+    response_model=list[schemas.User],
+    dependencies=[Depends(deps.conditional('users'))],
+)
+def search_users(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1, description='Words to match in names, username and email'),
+    db: Session = Depends(deps.get_read_db),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description='X-Next-Cursor from the previous page'),
+    include_total: bool = Query(False, description='Return the match count in X-Total-Count'),
     current_token: Token = Depends(deps.get_current_token),
 ) -> Any:
-    users = crud.user.get_multi(db, skip=skip, limit=limit)
+    """
+    Full-text user search, best match first. Each word matches as a prefix, so partial input works
+    for type-ahead.
+    """
+    # Ranked results have no stable key to seek by, so the cursor carries the offset
+    offset = page_after(cursor, 'rank') or 0
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail='Invalid cursor')
+    users = crud.user.search(db, query=q, skip=offset, limit=limit + 1, profile='bare')
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_cursor = encode_cursor('rank', offset + limit)
+    total = crud.user.count_search(db, query=q) if include_total else None
+    set_page_headers(request, response, next_cursor, total)
     return users
 
 
-@router.get('/{user_id}', response_model=schemas.UserWithRoles)
+@router.get(
+    '/{user_id}',
+    response_model=schemas.UserWithRoles,
+    dependencies=[Depends(deps.conditional('users', 'user_roles', session=deps.get_db))],
+)
 def read_user(
     user_id: str,
+    response: Response,
+    # Cache misses read the primary, so replica lag is never cached
     db: Session = Depends(deps.get_db),
     current_token: Token = Depends(deps.get_current_token),
 ) -> Any:
-    user = crud.user.get(db, id=user_id)
-    if not user:
+    def load() -> Optional[bytes]:
+        user = crud.user.get(db, id=user_id, profile='with_role_ids')
+        if not user:
+            return None
+
+        # Convert to response model with role IDs
+        user_dict = user.__dict__.copy()
+        user_dict['role_ids'] = [role.id for role in user.roles]
+
+        return schemas.UserWithRoles(**user_dict).model_dump_json().encode()
+
+    body = user_cache.read_through(user_id, load)
+    if body is None:
         raise HTTPException(status_code=404, detail='User not found')
-    
-    # Convert to response model with role IDs
-    user_dict = user.__dict__.copy()
-    user_dict['role_ids'] = [role.id for role in user.roles]
-    
-    return schemas.UserWithRoles(**user_dict)
+    return deps.json_response(body, response)
+
+
+@router.get(
+    '/{user_id}/effective-roles',
+    response_model=list[schemas.Role],
+    dependencies=[Depends(deps.conditional('users', 'roles', 'user_roles', 'role_closure'))],
+)
+def read_user_effective_roles(
+    user_id: str,
+    db: Session = Depends(deps.get_read_db),
+    current_token: Token = Depends(deps.get_current_token),
+) -> Any:
+    """Roles the user holds directly or inherits through the role hierarchy."""
+    if not crud.user.get(db, id=user_id, profile='bare'):
+        raise HTTPException(status_code=404, detail='User not found')
+    return crud.role.get_effective_for_user(db, user_id=user_id)
 
 
 @router.post('/', response_model=schemas.UserCreateResponse, status_code=status.HTTP_201_CREATED)
@@ -60,6 +169,24 @@ def create_user(
     return user_response
 
 
+@router.post(
+    '/bulk',
+    response_model=schemas.UserImportResponse,
+    openapi_extra={'requestBody': IMPORT_REQUEST_BODY},
+)
+async def import_users(
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_token: Token = Depends(deps.get_current_token),
+) -> Any:
+    """
+    Create many users from a JSON array, NDJSON or CSV body. Rows are processed in batches and
+    each row's outcome is reported, including generated passwords.
+    """
+    records = user_import.read_records(request.headers.get('content-type', ''), request.stream())
+    return await user_import.import_users(db, records)
+
+
 @router.patch('/{user_id}', response_model=schemas.User)
 def update_user(
     user_id: str,
@@ -91,21 +218,30 @@ def update_user(
     return user
 
 
+@router.delete('/', response_model=schemas.UserBulkDeleteResponse)
+def delete_users(
+    users_in: schemas.UserBulkDelete,
+    db: Session = Depends(deps.get_db),
+    current_token: Token = Depends(deps.get_current_token),
+) -> Any:
+    """Delete users by id, along with their role assignments, in one transaction."""
+    deleted = {user.id for user in crud.user.remove_many(db, ids=set(users_in.ids))}
+    return schemas.UserBulkDeleteResponse(
+        deleted=[user_id for user_id in users_in.ids if user_id in deleted],
+        not_found=[user_id for user_id in users_in.ids if user_id not in deleted],
+    )
+
+
 @router.delete('/{user_id}', status_code=status.HTTP_204_NO_CONTENT)
 def delete_user(
     user_id: str,
     db: Session = Depends(deps.get_db),
     current_token: Token = Depends(deps.get_current_token),
 ) -> None:
-    user = crud.user.get(db, id=user_id)
-    if not user:
+    # Role assignments are deleted with the user
+    if not crud.user.remove(db, id=user_id):
         raise HTTPException(status_code=404, detail='User not found')
 
-    # Remove user from all roles before deletion
-    crud.user.remove_from_all_roles(db, user=user)
-
-    crud.user.remove(db, id=user_id)
-
 
 @router.post('/{user_id}/roles/{role_id}', status_code=status.HTTP_201_CREATED)
 def assign_role_to_user(
@@ -115,23 +251,19 @@ def assign_role_to_user(
     current_token: Token = Depends(deps.get_current_token),
 ) -> Any:
     """Assign a role to a user."""
-    user = crud.user.get(db, id=user_id)
+    user = crud.user.get(db, id=user_id, profile='bare')
     if not user:
         raise HTTPException(status_code=404, detail='User not found')
     
-    role = crud.role.get(db, id=role_id)
+    role = crud.role.get(db, id=role_id, profile='bare')
     if not role:
         raise HTTPException(status_code=404, detail='Role not found')
     
-    # Check if already assigned
-    if role in user.roles:
+    # Insert the assignment; nothing is added if it already exists
+    added, _ = crud.membership.apply(db, add=[(user_id, role_id)])
+    if not added:
         raise HTTPException(status_code=400, detail='User already has this role')
     
-    # Add role to user
-    user.roles.append(role)
-    db.add(user)
-    db.commit()
-    
     return {'message': f'Role {role.role_name} assigned to user {user.display_name}'}
 
 
@@ -143,19 +275,62 @@ def remove_role_from_user(
     current_token: Token = Depends(deps.get_current_token),
 ) -> None:
     """Remove a role from a user."""
-    user = crud.user.get(db, id=user_id)
-    if not user:
+    if not crud.user.get(db, id=user_id, profile='bare'):
         raise HTTPException(status_code=404, detail='User not found')
     
-    role = crud.role.get(db, id=role_id)
-    if not role:
+    if not crud.role.get(db, id=role_id, profile='bare'):
         raise HTTPException(status_code=404, detail='Role not found')
     
-    # Check if user has the role
-    if role not in user.roles:
+    # Delete the assignment; nothing is removed if the user does not have the role
+    _, removed = crud.membership.apply(db, remove=[(user_id, role_id)])
+    if not removed:
         raise HTTPException(status_code=400, detail='User does not have this role')
-    
-    # Remove role from user
-    user.roles.remove(role)
-    db.add(user)
-    db.commit()
+
+
+def check_roles_exist(db: Session, role_ids: list[str]) -> None:
+    missing = crud.membership.missing(db, model=Role, ids=role_ids)
+    if missing:
+        raise HTTPException(status_code=400, detail=f'Roles not found: {", ".join(sorted(missing))}')
+
+
+@router.patch('/{user_id}/roles', response_model=schemas.MembershipChange)
+def update_user_roles(
+    user_id: str,
+    membership_in: schemas.MembershipUpdate,
+    db: Session = Depends(deps.get_db),
+    current_token: Token = Depends(deps.get_current_token),
+) -> Any:
+    """Add and remove roles of a user; ids already in the requested state are skipped."""
+    if not crud.user.get(db, id=user_id, profile='bare'):
+        raise HTTPException(status_code=404, detail='User not found')
+    both = set(membership_in.add) & set(membership_in.remove)
+    if both:
+        raise HTTPException(
+            status_code=400, detail=f'Roles both added and removed: {", ".join(sorted(both))}'
+        )
+    check_roles_exist(db, membership_in.add)
+
+    added, removed = crud.membership.apply(
+        db,
+        add=[(user_id, role_id) for role_id in membership_in.add],
+        remove=[(user_id, role_id) for role_id in membership_in.remove],
+    )
+    return schemas.MembershipChange(added=added, removed=removed)
+
+
+@router.put('/{user_id}/roles', response_model=schemas.MembershipChange)
+def replace_user_roles(
+    user_id: str,
+    roles_in: schemas.UserRolesReplace,
+    db: Session = Depends(deps.get_db),
+    current_token: Token = Depends(deps.get_current_token),
+) -> Any:
+    """Set the roles of a user, writing only the assignments that differ from the current ones."""
+    if not crud.user.get(db, id=user_id, profile='bare'):
+        raise HTTPException(status_code=404, detail='User not found')
+    check_roles_exist(db, roles_in.role_ids)
+
+    added, removed = crud.membership.replace_user_roles(
+        db, user_id=user_id, role_ids=roles_in.role_ids
+    )
+    return schemas.MembershipChange(added=added, removed=removed)
@@ -0,0 +1,205 @@
+import logging
+import queue
+import threading
+import time
+from functools import partial
+from typing import Any, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app import crud
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import registry
+from app.schemas.activity import ActivityCreate
+
+logger = logging.getLogger(__name__)
+
+
+class ActivitySink:
+    """Buffers activity records in memory and inserts them in batches from a background thread."""
+
+    def __init__(
+        self,
+        *,
+        batch_size: int,
+        flush_interval: float,
+        max_queue_size: int,
+        policy: str = 'drop',
+        block_timeout: float = 5.0,
+    ):
+        if policy not in ('drop', 'block'):
+            raise ValueError(f'Unknown activity queue policy: {policy}')
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self.written = 0
+        self.flushes = 0
+        self.last_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+        self._queue: queue.Queue[ActivityCreate] = queue.Queue(maxsize=max_queue_size)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Guards the thread handle and the counters, which the event loop and the flusher
+        # thread both update
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='activity-sink', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flusher thread and write out everything still queued."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+        self.flush()
+
+    async def put(self, activity: ActivityCreate) -> bool:
+        """Queue an activity record; returns False if it had to be dropped."""
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(activity)
+            return True
+        except queue.Full:
+            if self.policy == 'block':
+                # Apply backpressure without blocking the event loop
+                try:
+                    await run_in_threadpool(
+                        partial(self._queue.put, activity, timeout=self.block_timeout)
+                    )
+                    return True
+                except queue.Full:
+                    pass
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def flush(self) -> None:
+        """Synchronously write every queued record."""
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return
+            self._write(batch)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'dropped': self.dropped,
+                'written': self.written,
+                'flushes': self.flushes,
+                'last_flush_seconds': self.last_flush_seconds,
+                'total_flush_seconds': self.total_flush_seconds,
+            }
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                self._write(batch)
+
+    def _collect(self) -> list[ActivityCreate]:
+        # Wait for a first record, then keep filling the batch until it is full or the flush
+        # interval has passed
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and not self._stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self, limit: int) -> list[ActivityCreate]:
+        batch: list[ActivityCreate] = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _insert(self, batch: list[ActivityCreate]) -> bool:
+        db = SessionLocal()
+        try:
+            crud.activity.create_many(db, objs_in=batch, refresh=False)
+            return True
+        except Exception:
+            logger.exception('Failed to write %d activity records', len(batch))
+            return False
+        finally:
+            db.close()
+
+    def _write(self, batch: list[ActivityCreate]) -> None:
+        started = time.perf_counter()
+        # Retry once for transient errors such as `database is locked`, then write the records
+        # one at a time so only those that fail on their own are dropped
+        written = dropped = 0
+        if self._insert(batch) or self._insert(batch):
+            written = len(batch)
+        else:
+            for record in batch:
+                if self._insert([record]):
+                    written += 1
+                else:
+                    dropped += 1
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.written += written
+            self.dropped += dropped
+            self.flushes += 1
+            self.last_flush_seconds = elapsed
+            self.total_flush_seconds += elapsed
+
+
+activity_sink = ActivitySink(
+    batch_size=settings.activity_batch_size,
+    flush_interval=settings.activity_flush_interval,
+    max_queue_size=settings.activity_queue_size,
+    policy=settings.activity_queue_policy,
+    block_timeout=settings.activity_queue_block_timeout,
+)
+
+registry.gauge_callback(
+    'activity_queue_depth', 'Activity records waiting to be written', activity_sink._queue.qsize
+)
+registry.gauge_callback(
+    'activity_queue_capacity', 'Activity queue size limit', lambda: activity_sink._queue.maxsize
+)
+registry.counter_callback(
+    'activity_written_total', 'Activity records written', lambda: activity_sink.written
+)
+registry.counter_callback(
+    'activity_dropped_total', 'Activity records dropped', lambda: activity_sink.dropped
+)
+registry.counter_callback(
+    'activity_flushes_total', 'Activity batches written', lambda: activity_sink.flushes
+)
+registry.counter_callback(
+    'activity_flush_seconds_total',
+    'Time spent writing activity batches',
+    lambda: activity_sink.total_flush_seconds,
+)
+registry.gauge_callback(
+    'activity_last_flush_seconds',
+    'Duration of the most recent activity batch write',
+    lambda: activity_sink.last_flush_seconds,
+)
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any, Optional
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+# Returned by LRUCache.get when a key is absent, so that a cached None (negative entry) can be
+# told apart from a miss
+MISSING: Any = object()
+
+
+class LRUCache:
+    """Thread-safe LRU cache with per-entry TTL and optional negative caching of None values."""
+
+    def __init__(
+        self, maxsize: int, ttl: Optional[float] = None, negative_ttl: Optional[float] = None
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bumped by every invalidation, so a fill that read the source before a write can detect
+        # it lost the race and skip storing a stale value
+        self.generation = 0
+        self._data: OrderedDict[Hashable, tuple[Any, Optional[float]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def get(self, key: Hashable) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return MISSING
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        """Store `value`; with `generation`, only if nothing was invalidated since it was read."""
+        if not self.enabled:
+            return
+        ttl = self.ttl
+        if value is None:
+            if self.negative_ttl is None:
+                return
+            ttl = self.negative_ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def read_through(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        """
+        The cached value for `key`, else `load()`, which is stored unless it is None or an
+        invalidation happened while it ran.
+        """
+        value = self.get(key) if self.enabled else MISSING
+        if value is MISSING:
+            generation = self.generation
+            value = load()
+            self.set(key, value, generation=generation)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self.generation += 1
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+def register_cache_metrics(cache: LRUCache, name: str) -> None:
+    registry.gauge_callback('cache_entries', 'Entries held in a cache', cache.__len__, cache=name)
+    registry.gauge_callback(
+        'cache_capacity', 'Maximum cache entries', lambda: cache.maxsize, cache=name
+    )
+    registry.counter_callback('cache_hits_total', 'Cache hits', lambda: cache.hits, cache=name)
+    registry.counter_callback('cache_misses_total', 'Cache misses', lambda: cache.misses, cache=name)
+    registry.counter_callback(
+        'cache_evictions_total', 'Entries evicted by size', lambda: cache.evictions, cache=name
+    )
+
+
+# Bearer token string -> token id, or None for strings known not to be valid tokens
+token_cache = LRUCache(
+    settings.token_cache_size,
+    ttl=settings.token_cache_ttl,
+    negative_ttl=settings.token_cache_negative_ttl,
+)
+register_cache_metrics(token_cache, 'token')
+
+# Serialized GET /users/{id} and /roles/{id} bodies by id (ENTITY_CACHE_ENABLED=false disables)
+entity_cache_size = settings.entity_cache_size if settings.entity_cache_enabled else 0
+user_cache = LRUCache(entity_cache_size, ttl=settings.entity_cache_ttl)
+role_cache = LRUCache(entity_cache_size, ttl=settings.entity_cache_ttl)
+register_cache_metrics(user_cache, 'user')
+register_cache_metrics(role_cache, 'role')
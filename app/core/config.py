@@ -1,13 +1,86 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
     secret_key: str = 'your-secret-key-here-please-change-in-production'
     database_url: str = 'sqlite:///./app.db'
+    # Optional read replica for safe (GET) handlers. A client that sent a write within the
+    # window keeps reading from the primary so it sees its own changes
+    read_database_url: Optional[str] = None
+    read_your_writes_window: float = 5.0
     environment: str = 'development'
     project_name: str = 'FastAPI User & Role Testing Application'
     api_v1_str: str = '/api/v1'
 
+    # Connection pool (file-backed SQLite and server databases); recycle and pre-ping only
+    # apply to server databases
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    # Compiled SQL cache entries per engine; also sizes asyncpg's prepared statement cache
+    db_statement_cache_size: int = 500
+    # SQLite connection pragmas
+    sqlite_journal_mode: str = 'wal'
+    sqlite_synchronous: str = 'normal'
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size: int = -64000  # negative values are KiB, as in PRAGMA cache_size
+    # 'auto' lets the driver BEGIN right before a transaction's first write, so reads never hold
+    # a snapshot that later has to be upgraded; 'immediate' takes the write lock at the start of
+    # every transaction, fully serializing writers (and transactions) through busy_timeout
+    sqlite_begin_mode: str = 'auto'
+
+    # Bearer token verification cache (size 0 disables caching)
+    token_cache_size: int = 1024
+    token_cache_ttl: float = 300.0
+    token_cache_negative_ttl: float = 30.0
+
+    # Serialized single user and role responses, invalidated by this process's writes; the TTL
+    # bounds how long writes made by other workers can go unseen
+    entity_cache_enabled: bool = True
+    entity_cache_size: int = 10000
+    entity_cache_ttl: float = 60.0
+
+    # Background activity writer
+    activity_batch_size: int = 100
+    activity_flush_interval: float = 1.0
+    activity_queue_size: int = 10000
+    activity_queue_policy: str = 'drop'  # 'drop' or 'block' when the queue is full
+    activity_queue_block_timeout: float = 5.0
+    # Only the first N bytes of each request/response body are kept on the activity record;
+    # activity_capture_limits overrides this per endpoint, keyed by 'METHOD /path' prefix
+    activity_capture_max_bytes: int = 8192
+    activity_capture_limits: dict[str, int] = {}
+    # 'raw', 'redacted', or 'compressed' (redacted, then compressed above the threshold)
+    activity_payload_mode: str = 'compressed'
+    activity_redact_fields: list[str] = [
+        'password',
+        'generated_password',
+        'hashed_password',
+        'token',
+        'access_token',
+    ]
+    activity_compress_threshold: int = 512
+
+    # Activity retention (0 days keeps everything in the activities table)
+    activity_retention_days: int = 30
+    activity_retention_interval: float = 3600.0
+    activity_archive_dir: str = './activity_archive'
+
+    # bcrypt hashing and verification run on this many dedicated threads
+    password_hash_workers: int = 4
+
+    # In-process role membership bitmaps for /membership queries, loaded at startup and updated
+    # by this process's writes; disable when several workers change memberships
+    membership_index_enabled: bool = True
+
+    # Records per validation batch and insert transaction for POST /users/bulk
+    user_import_batch_size: int = 500
+
     model_config = SettingsConfigDict(env_file='.env', case_sensitive=False)
 
 
@@ -1,13 +1,146 @@
-from sqlalchemy import create_engine
+from typing import Any
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
+from app.core.instrumentation import instrument_engine
+from app.core.metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool, instrument_pool
 
-engine = create_engine(
-    settings.database_url,
-    connect_args={'check_same_thread': False},  # SQLite specific
-)
+# asyncio driver used for each backend by the async engine
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+
+def check_backend(url: URL) -> None:
+    """Refuse backends other than SQLite and PostgreSQL, the two the CRUD upserts support."""
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(
+            f'Unsupported database backend {backend!r}: DATABASE_URL and READ_DATABASE_URL must '
+            'point at SQLite or PostgreSQL'
+        )
+
+
+def async_url(url: URL) -> URL:
+    """The same database as `url`, reached through the backend's asyncio driver."""
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+def is_in_memory(url: URL) -> bool:
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def engine_options(url: URL) -> dict[str, Any]:
+    """create_engine arguments for `url`'s dialect and driver, from Settings."""
+    options: dict[str, Any] = {'query_cache_size': settings.db_statement_cache_size}
+    if url.get_backend_name() == 'sqlite':
+        if url.get_driver_name() == 'pysqlite':
+            options['connect_args'] = {'check_same_thread': False}
+        if is_in_memory(url):
+            # Keep the dialect's single-connection pool so every session sees the same database
+            return options
+    else:
+        options['pool_recycle'] = settings.db_pool_recycle
+        options['pool_pre_ping'] = settings.db_pool_pre_ping
+        if url.get_driver_name() == 'asyncpg':
+            options['connect_args'] = {
+                'prepared_statement_cache_size': settings.db_statement_cache_size
+            }
+    options['pool_size'] = settings.db_pool_size
+    options['max_overflow'] = settings.db_max_overflow
+    options['pool_timeout'] = settings.db_pool_timeout
+    return options
+
+
+def sqlite_pragmas(url: URL) -> dict[str, Any]:
+    pragmas = {
+        'busy_timeout': settings.sqlite_busy_timeout_ms,
+        'synchronous': settings.sqlite_synchronous,
+        'cache_size': settings.sqlite_cache_size,
+        'mmap_size': settings.sqlite_mmap_size,
+    }
+    # WAL needs a database file
+    if not is_in_memory(url):
+        pragmas['journal_mode'] = settings.sqlite_journal_mode
+    return pragmas
+
+
+def configure_sqlite(engine: Engine, url: URL) -> None:
+    """Apply the SQLite pragmas and transaction mode from Settings to every new connection."""
+    pragmas = sqlite_pragmas(url)
+    immediate = settings.sqlite_begin_mode == 'immediate'
+
+    @event.listens_for(engine, 'connect')
+    def _connect(dbapi_connection, connection_record):  # type: ignore[no-untyped-def]
+        if immediate:
+            # Stop the driver from issuing its own BEGIN so _begin below controls it
+            dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+    if immediate:
+
+        @event.listens_for(engine, 'begin')
+        def _begin(conn):  # type: ignore[no-untyped-def]
+            conn.exec_driver_sql('BEGIN IMMEDIATE')
+
+
+def _prepare(engine: Engine, url: URL, name: str) -> None:
+    if url.get_backend_name() == 'sqlite':
+        configure_sqlite(engine, url)
+    instrument_engine(engine)
+    instrument_pool(engine, name)
+
+
+def make_engine(database_url: str, name: str) -> Engine:
+    """Sync engine for `database_url`, tuned from Settings and exported to /metrics as `name`."""
+    url = make_url(database_url)
+    check_backend(url)
+    engine = create_engine(
+        url,
+        poolclass=None if is_in_memory(url) else InstrumentedQueuePool,
+        **engine_options(url),
+    )
+    _prepare(engine, url, name)
+    return engine
+
+
+def make_async_engine(database_url: str, name: str) -> AsyncEngine:
+    """make_engine for the asyncio driver of the same database."""
+    url = make_url(database_url)
+    check_backend(url)
+    url = async_url(url)
+    engine = create_async_engine(
+        url,
+        poolclass=None if is_in_memory(url) else InstrumentedAsyncQueuePool,
+        **engine_options(url),
+    )
+    _prepare(engine.sync_engine, url, name)
+    return engine
+
+
+engine = make_engine(settings.database_url, 'primary')
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Used by async handlers so queries never block the event loop. Objects stay loaded after commit,
+# since refreshing an expired attribute would need implicit IO
+async_engine = make_async_engine(settings.database_url, 'async')
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Read replica; without one, reads go to the primary engines
+if settings.read_database_url:
+    read_engine = make_engine(settings.read_database_url, 'replica')
+    async_read_engine = make_async_engine(settings.read_database_url, 'replica_async')
+else:
+    read_engine, async_read_engine = engine, async_engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+AsyncReadSessionLocal = async_sessionmaker(
+    async_read_engine, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
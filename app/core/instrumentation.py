@@ -0,0 +1,151 @@
+"""
+In-process request instrumentation: per-request DB timing and per-route latency histograms.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Sequence
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine, ExceptionContext
+
+# Each power of two is split into this many linear sub-buckets, so a recorded value is off by
+# at most 1/SUB_BUCKETS (~3%) of itself, as in an HDR histogram with fixed relative precision
+SUB_BUCKETS = 32
+_SUB_BITS = SUB_BUCKETS.bit_length() - 1
+
+
+class LatencyHistogram:
+    """Log-linear histogram of durations with bounded relative error, recorded in microseconds."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._buckets: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _index(micros: int) -> int:
+        if micros < SUB_BUCKETS:
+            return micros
+        shift = micros.bit_length() - _SUB_BITS - 1
+        return (shift + 1) * SUB_BUCKETS + (micros >> shift) - SUB_BUCKETS
+
+    @staticmethod
+    def _upper_bound(index: int) -> int:
+        if index < SUB_BUCKETS:
+            return index
+        shift = index // SUB_BUCKETS - 1
+        return ((index % SUB_BUCKETS + SUB_BUCKETS + 1) << shift) - 1
+
+    def record(self, seconds: float) -> None:
+        index = self._index(int(seconds * 1_000_000))
+        with self._lock:
+            self._buckets[index] = self._buckets.get(index, 0) + 1
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        """Duration in seconds at or below which a fraction `q` of recorded values fall."""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = max(1, round(q * self.count))
+            seen = 0
+            for index in sorted(self._buckets):
+                seen += self._buckets[index]
+                if seen >= rank:
+                    return min(self._upper_bound(index) / 1_000_000, self.max)
+            return self.max
+
+    def bucket_counts(self, bounds: Sequence[float]) -> list[int]:
+        """Counts at or below each bound in seconds (ascending), plus a final +Inf slot."""
+        counts = [0] * (len(bounds) + 1)
+        with self._lock:
+            buckets = list(self._buckets.items())
+        for index, count in buckets:
+            counts[bisect_left(bounds, self._upper_bound(index) / 1_000_000)] += count
+        return counts
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'p50_ms': self.percentile(0.50) * 1000,
+            'p95_ms': self.percentile(0.95) * 1000,
+            'p99_ms': self.percentile(0.99) * 1000,
+            'max_ms': self.max * 1000,
+        }
+
+
+class LatencyRegistry:
+    """Latency histograms keyed by route."""
+
+    def __init__(self) -> None:
+        self._histograms: dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, seconds: float) -> None:
+        histogram = self._histograms.get(route)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(route, LatencyHistogram())
+        histogram.record(seconds)
+
+    def items(self) -> list[tuple[str, LatencyHistogram]]:
+        return sorted(self._histograms.items())
+
+    def summary(self) -> dict[str, dict[str, Any]]:
+        return {route: histogram.summary() for route, histogram in self.items()}
+
+
+route_latency = LatencyRegistry()
+
+
+class RequestStats:
+    """Database work done on behalf of the current request."""
+
+    __slots__ = ('db_seconds', 'query_count')
+
+    def __init__(self) -> None:
+        self.db_seconds = 0.0
+        self.query_count = 0
+
+
+# Set by APIActivityMiddleware; copied into the threadpool that runs sync endpoints, so cursor
+# events fired from there update the same RequestStats object
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar('request_stats', default=None)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Attribute the time spent executing statements to the current request."""
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):  # type: ignore[no-untyped-def]
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _finish(conn: Connection) -> None:
+        started = conn.info.get('query_started')
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        stats = request_stats.get()
+        if stats is not None:
+            stats.db_seconds += elapsed
+            stats.query_count += 1
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):  # type: ignore[no-untyped-def]
+        _finish(conn)
+
+    # A failing statement skips after_cursor_execute; conn.info lives as long as the pooled DBAPI
+    # connection, so its start time must be popped here or the list grows for good
+    @event.listens_for(engine, 'handle_error')
+    def _handle_error(context: ExceptionContext) -> None:
+        if context.connection is not None:
+            _finish(context.connection)
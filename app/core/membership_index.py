@@ -0,0 +1,291 @@
+"""
+In-process index of role membership. Users are numbered with dense ordinals and each role's
+members are held as a compressed bitmap in the style of Roaring bitmaps, so membership checks
+and unions, intersections and differences of roles never touch the database.
+
+Ordinals are split into chunks of 2**16. A chunk with few members is a sorted array of their
+low 16 bits, a fuller one is a bitmap (a Python int with bit `low` set), and empty chunks are not
+stored, so a role costs memory in proportion to its members and a single change copies at most
+one 8 KiB chunk.
+"""
+
+import threading
+from array import array
+from bisect import bisect_left
+from collections.abc import Collection, Iterable, Iterator
+from typing import Optional, Union
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.metrics import registry
+from app.models.user import user_roles
+
+CHUNK_BITS = 16
+CHUNK_SIZE = 1 << CHUNK_BITS
+CHUNK_BYTES = CHUNK_SIZE // 8
+# Past this many members a sorted array of 2-byte entries outgrows the chunk's bitmap. Bitmaps
+# stay bitmaps as members are removed, until the next load, as they never exceed 8 KiB
+ARRAY_MAX = 4096
+
+# A chunk's members: sorted array('H') of low bits, or an int bitmap. Chunks are never
+# mutated in place, so readers can use them without taking the lock
+Container = Union[array, int]
+# Query results: chunk number -> int bitmap, holding only non-empty chunks
+Bitmap = dict[int, int]
+
+
+def _popcount(bits: int) -> int:
+    return bin(bits).count('1')
+
+
+def _bits(lows: Iterable[int]) -> int:
+    buf = bytearray(CHUNK_BYTES)
+    for low in lows:
+        buf[low >> 3] |= 1 << (low & 7)
+    return int.from_bytes(buf, 'little')
+
+
+def _lows(bits: int) -> Iterator[int]:
+    """The set bits of a chunk bitmap, in ascending order."""
+    for index, byte in enumerate(bits.to_bytes(CHUNK_BYTES, 'little')):
+        if byte:
+            for bit in range(8):
+                if byte >> bit & 1:
+                    yield index << 3 | bit
+
+
+def _container(lows: list[int]) -> Container:
+    """A chunk holding the sorted, distinct `lows`."""
+    return array('H', lows) if len(lows) <= ARRAY_MAX else _bits(lows)
+
+
+def _contains(chunk: Container, low: int) -> bool:
+    if isinstance(chunk, int):
+        return bool(chunk >> low & 1)
+    index = bisect_left(chunk, low)
+    return index < len(chunk) and chunk[index] == low
+
+
+def _with(chunk: Container, low: int) -> Container:
+    if isinstance(chunk, int):
+        return chunk | 1 << low
+    if len(chunk) >= ARRAY_MAX:
+        return _bits(chunk) | 1 << low
+    index = bisect_left(chunk, low)
+    return chunk[:index] + array('H', [low]) + chunk[index:]
+
+
+def _without(chunk: Container, low: int) -> Container:
+    if isinstance(chunk, int):
+        return chunk & ~(1 << low)
+    index = bisect_left(chunk, low)
+    return chunk[:index] + chunk[index + 1:]
+
+
+def _as_bits(chunk: Container) -> int:
+    return chunk if isinstance(chunk, int) else _bits(chunk)
+
+
+class MembershipIndex:
+    def __init__(self) -> None:
+        # False until load runs; callers fall back to querying user_roles
+        self.enabled = False
+        self._ordinals: dict[str, int] = {}
+        self._user_ids: list[Optional[str]] = []
+        self._roles: dict[str, dict[int, Container]] = {}
+        self._lock = threading.Lock()
+
+    def load(self, db: Session) -> None:
+        """Rebuild from user_roles, numbering users in id order."""
+        ordinals: dict[str, int] = {}
+        user_ids: list[Optional[str]] = []
+        # Rows arrive in ordinal order, so each chunk's members are collected already sorted
+        # and every chunk is built once
+        members: dict[str, dict[int, list[int]]] = {}
+        stmt = select(user_roles.c.user_id, user_roles.c.role_id).order_by(user_roles.c.user_id)
+        for user_id, role_id in db.execute(stmt):
+            ordinal = ordinals.get(user_id)
+            if ordinal is None:
+                ordinal = ordinals[user_id] = len(user_ids)
+                user_ids.append(user_id)
+            key, low = divmod(ordinal, CHUNK_SIZE)
+            members.setdefault(role_id, {}).setdefault(key, []).append(low)
+        roles = {
+            role_id: {key: _container(lows) for key, lows in chunks.items()}
+            for role_id, chunks in members.items()
+        }
+        with self._lock:
+            self._ordinals, self._user_ids, self._roles = ordinals, user_ids, roles
+            self.enabled = True
+
+    def _ordinal(self, user_id: str) -> int:
+        ordinal = self._ordinals.get(user_id)
+        if ordinal is None:
+            ordinal = self._ordinals[user_id] = len(self._user_ids)
+            self._user_ids.append(user_id)
+        return ordinal
+
+    @staticmethod
+    def _set(chunks: dict[int, Container], ordinal: int) -> None:
+        key, low = divmod(ordinal, CHUNK_SIZE)
+        chunk = chunks.get(key)
+        if chunk is None:
+            chunks[key] = array('H', [low])
+        elif not _contains(chunk, low):
+            chunks[key] = _with(chunk, low)
+
+    @staticmethod
+    def _unset(chunks: dict[int, Container], ordinal: int) -> None:
+        key, low = divmod(ordinal, CHUNK_SIZE)
+        chunk = chunks.get(key)
+        if chunk is None or not _contains(chunk, low):
+            return
+        chunk = _without(chunk, low)
+        if chunk:
+            chunks[key] = chunk
+        else:
+            del chunks[key]
+
+    # Maintenance, called by the membership CRUD methods after their transaction commits
+    def add(self, pairs: Iterable[tuple[str, str]]) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            for user_id, role_id in pairs:
+                self._set(self._roles.setdefault(role_id, {}), self._ordinal(user_id))
+
+    def remove(self, pairs: Iterable[tuple[str, str]]) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            for user_id, role_id in pairs:
+                ordinal = self._ordinals.get(user_id)
+                if ordinal is not None and role_id in self._roles:
+                    self._unset(self._roles[role_id], ordinal)
+
+    def replace_role(self, role_id: str, user_ids: Iterable[str]) -> None:
+        """Make `user_ids` the exact members of a role."""
+        if not self.enabled:
+            return
+        with self._lock:
+            members: dict[int, list[int]] = {}
+            for ordinal in sorted(self._ordinal(user_id) for user_id in set(user_ids)):
+                key, low = divmod(ordinal, CHUNK_SIZE)
+                members.setdefault(key, []).append(low)
+            self._roles[role_id] = {key: _container(lows) for key, lows in members.items()}
+
+    def replace_user(self, user_id: str, role_ids: Collection[str]) -> None:
+        """Make `role_ids` the exact roles of a user."""
+        if not self.enabled:
+            return
+        with self._lock:
+            ordinal = self._ordinal(user_id)
+            for role_id in role_ids:
+                self._set(self._roles.setdefault(role_id, {}), ordinal)
+            for role_id, chunks in self._roles.items():
+                if role_id not in role_ids:
+                    self._unset(chunks, ordinal)
+
+    def drop_users(self, user_ids: Iterable[str]) -> None:
+        """Forget deleted users. Their ordinals are not reused until the next load."""
+        if not self.enabled:
+            return
+        with self._lock:
+            dropped = []
+            for user_id in user_ids:
+                ordinal = self._ordinals.pop(user_id, None)
+                if ordinal is not None:
+                    self._user_ids[ordinal] = None
+                    dropped.append(ordinal)
+            # Only the chunks that actually hold a dropped user are rewritten
+            for chunks in self._roles.values():
+                for ordinal in dropped:
+                    self._unset(chunks, ordinal)
+
+    # Queries
+    def has(self, user_id: str, role_id: str) -> bool:
+        ordinal = self._ordinals.get(user_id)
+        if ordinal is None:
+            return False
+        key, low = divmod(ordinal, CHUNK_SIZE)
+        chunk = self._roles.get(role_id, {}).get(key)
+        return chunk is not None and _contains(chunk, low)
+
+    def _bitmap(self, role_id: str) -> Bitmap:
+        # list() snapshots the chunks atomically, as a writer may be adding or removing some
+        return {key: _as_bits(chunk) for key, chunk in list(self._roles.get(role_id, {}).items())}
+
+    def select(
+        self,
+        *,
+        any_of: Collection[str] = (),
+        all_of: Collection[str] = (),
+        none_of: Collection[str] = (),
+    ) -> Bitmap:
+        """
+        Bitmap of users holding at least one role of `any_of`, every role of `all_of` and no
+        role of `none_of`. At least one of `any_of` and `all_of` must be given.
+        """
+        bits: Optional[Bitmap] = None
+        if any_of:
+            bits = {}
+            for role_id in any_of:
+                for key, chunk in self._bitmap(role_id).items():
+                    bits[key] = bits.get(key, 0) | chunk
+        for role_id in all_of:
+            other = self._bitmap(role_id)
+            if bits is None:
+                bits = other
+                continue
+            bits = {key: chunk & other[key] for key, chunk in bits.items() if key in other}
+            bits = {key: chunk for key, chunk in bits.items() if chunk}
+        if bits is None:
+            return {}
+        for role_id in none_of:
+            other = self._bitmap(role_id)
+            bits = {key: chunk & ~other.get(key, 0) for key, chunk in bits.items()}
+            bits = {key: chunk for key, chunk in bits.items() if chunk}
+        return bits
+
+    @staticmethod
+    def count(bits: Bitmap) -> int:
+        return sum(_popcount(chunk) for chunk in bits.values())
+
+    def user_ids(self, bits: Bitmap, limit: int) -> list[str]:
+        """The users for the lowest `limit` ordinals set in `bits`."""
+        found: list[str] = []
+        for key in sorted(bits):
+            for low in _lows(bits[key]):
+                if len(found) >= limit:
+                    return found
+                user_id = self._user_ids[key * CHUNK_SIZE + low]
+                if user_id is not None:
+                    found.append(user_id)
+        return found
+
+    def stats(self) -> dict[str, int]:
+        chunks = [chunk for role in list(self._roles.values()) for chunk in list(role.values())]
+        return {
+            'users': len(self._ordinals),
+            'roles': len(self._roles),
+            'bytes': sum(
+                (chunk.bit_length() + 7) // 8
+                if isinstance(chunk, int)
+                else len(chunk) * chunk.itemsize
+                for chunk in chunks
+            ),
+        }
+
+
+membership_index = MembershipIndex()
+registry.gauge_callback(
+    'membership_index_users',
+    'Users in the membership index',
+    lambda: membership_index.stats()['users'],
+)
+registry.gauge_callback(
+    'membership_index_bytes',
+    'Bitmap bytes held by the membership index',
+    lambda: membership_index.stats()['bytes'],
+)
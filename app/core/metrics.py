@@ -0,0 +1,291 @@
+"""
+Minimal in-process metrics rendered in the Prometheus text exposition format.
+
+Metrics are plain counters and fixed-bucket histograms updated in memory; values owned by other
+components (pool state, queue depth, cache stats) are read through callbacks at scrape time.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Iterable, Sequence
+from typing import Any, Callable, cast
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.instrumentation import LatencyRegistry, route_latency
+
+Labels = tuple[tuple[str, str], ...]
+Sample = tuple[str, Labels, float]
+
+# Default latency buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(labelnames: Sequence[str], values: dict[str, str]) -> Labels:
+    return tuple((name, str(values[name])) for name in labelnames)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+
+    def samples(self) -> Iterable[Sample]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation)
+        self.labelnames = tuple(labelnames)
+        self._values: dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = _labels(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, value in list(self._values.items()):
+            yield self.name, labels, value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation)
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (+Inf last)], sum
+        self._series: dict[Labels, tuple[list[int], list[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _labels(self.labelnames, labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, (counts, total) in list(self._series.items()):
+            yield from _histogram_samples(self.name, labels, self.buckets, counts, total[0])
+
+
+def _histogram_samples(
+    name: str, labels: Labels, buckets: Sequence[float], counts: Sequence[int], total: float
+) -> Iterable[Sample]:
+    cumulative = 0
+    for bound, count in zip((*buckets, float('inf')), counts):
+        cumulative += count
+        yield f'{name}_bucket', (*labels, ('le', _format_value(bound))), cumulative
+    yield f'{name}_sum', labels, total
+    yield f'{name}_count', labels, cumulative
+
+
+class CallbackMetric(Metric):
+    """Gauge or counter whose values are read from their owners at scrape time."""
+
+    def __init__(self, name: str, documentation: str, kind: str):
+        super().__init__(name, documentation)
+        self.kind = kind
+        self._series: dict[Labels, Callable[[], float]] = {}
+
+    def add(self, func: Callable[[], float], labels: dict[str, str]) -> None:
+        self._series[tuple(sorted(labels.items()))] = func
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, func in list(self._series.items()):
+            yield self.name, labels, func()
+
+
+class RouteLatencyMetric(Metric):
+    """Exposes the per-route HDR latency histograms as Prometheus histograms."""
+
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        registry: LatencyRegistry,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation)
+        self.registry = registry
+        self.buckets = tuple(buckets)
+
+    def samples(self) -> Iterable[Sample]:
+        for route, histogram in self.registry.items():
+            counts = histogram.bucket_counts(self.buckets)
+            labels = (('route', route),)
+            yield from _histogram_samples(self.name, labels, self.buckets, counts, histogram.total)
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))  # type: ignore[return-value]
+
+    def gauge_callback(
+        self, name: str, documentation: str, func: Callable[[], float], **labels: str
+    ) -> None:
+        self._callback(name, documentation, 'gauge').add(func, labels)
+
+    def counter_callback(
+        self, name: str, documentation: str, func: Callable[[], float], **labels: str
+    ) -> None:
+        self._callback(name, documentation, 'counter').add(func, labels)
+
+    def _callback(self, name: str, documentation: str, kind: str) -> CallbackMetric:
+        metric = self._metrics.get(name)
+        if not isinstance(metric, CallbackMetric):
+            metric = self.register(CallbackMetric(name, documentation, kind))
+        return metric  # type: ignore[return-value]
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                if labels:
+                    label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels)
+                    name = f'{name}{{{label_text}}}'
+                lines.append(f'{name} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    'http_requests_total', 'API requests by route and status code', ('route', 'status')
+)
+registry.register(
+    RouteLatencyMetric(
+        'http_request_duration_seconds', 'API request latency by route', route_latency
+    )
+)
+db_queries_per_request = registry.histogram(
+    'db_queries_per_request',
+    'SQL statements executed per API request',
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+db_time_per_request = registry.histogram(
+    'db_time_per_request_seconds', 'Time spent executing SQL per API request'
+)
+password_hash_duration = registry.histogram(
+    'password_hash_duration_seconds',
+    'Time spent in bcrypt hashing and verification',
+    ('operation',),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+password_hash_queue_wait = registry.histogram(
+    'password_hash_queue_wait_seconds',
+    'Time a bcrypt job waited for a free hashing worker',
+    ('operation',),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+db_pool_wait = registry.histogram(
+    'db_pool_wait_seconds',
+    'Time spent acquiring a pooled database connection',
+    ('engine',),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+db_pool_checkouts = registry.counter(
+    'db_pool_checkouts_total', 'Connections checked out of the pool', ('engine',)
+)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waits for a connection."""
+
+    metrics_name = 'default'
+
+    def _do_get(self) -> Any:
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_wait.observe(time.perf_counter() - started, engine=self.metrics_name)
+
+    def recreate(self) -> QueuePool:
+        pool = super().recreate()
+        pool.metrics_name = self.metrics_name  # type: ignore[attr-defined]
+        return pool
+
+
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """InstrumentedQueuePool for asyncio engines."""
+
+
+def instrument_pool(engine: Engine, name: str) -> None:
+    """Expose pool checkouts, occupancy and overflow for `engine` under engine=`name`."""
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.metrics_name = name
+
+    @event.listens_for(engine, 'checkout')
+    def _checkout(dbapi_connection, connection_record, connection_proxy):  # type: ignore[no-untyped-def]
+        db_pool_checkouts.inc(engine=name)
+
+    if isinstance(engine.pool, QueuePool):
+        # Read through the engine, which gets a new pool object after dispose()
+        def pool() -> QueuePool:
+            return cast(QueuePool, engine.pool)
+
+        registry.gauge_callback(
+            'db_pool_size', 'Configured pool size', lambda: pool().size(), engine=name
+        )
+        registry.gauge_callback(
+            'db_pool_checked_out',
+            'Connections currently checked out',
+            lambda: pool().checkedout(),
+            engine=name,
+        )
+        registry.gauge_callback(
+            'db_pool_overflow',
+            'Connections open beyond the pool size',
+            lambda: pool().overflow(),
+            engine=name,
+        )
@@ -1,83 +1,178 @@
-import json
-from typing import Callable
+import time
+from datetime import datetime, timezone
+from typing import Optional
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import StreamingResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from app import crud
-from app.api import deps
+from app.core.activity_sink import activity_sink
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.instrumentation import RequestStats, request_stats, route_latency
+from app.core.metrics import db_queries_per_request, db_time_per_request, http_requests
+from app.core.read_routing import SAFE_METHODS, record_write
+from app.core.security import get_token_async
+from app.models.token import Token
 from app.schemas.activity import ActivityCreate
 
+CAPTURE_METHODS = {'POST', 'PUT', 'PATCH'}
+TRUNCATED_MARKER = '... [truncated]'
 
-class APIActivityMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+
+class BodyCapture:
+    """Keeps at most `limit` bytes of a body that is streamed through in chunks."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.size = 0
+        self._chunks: list[bytes] = []
+        self._captured = 0
+
+    def feed(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        remaining = self.limit - self._captured
+        if remaining > 0 and chunk:
+            piece = chunk[:remaining]
+            self._chunks.append(piece)
+            self._captured += len(piece)
+
+    @property
+    def truncated(self) -> bool:
+        return self.size > self._captured
+
+    def text(self) -> Optional[str]:
+        if not self.size:
+            return None
+        text = b''.join(self._chunks).decode('utf-8', errors='replace')
+        return text + TRUNCATED_MARKER if self.truncated else text
+
+
+class APIActivityMiddleware:
+    """
+    Times every API call and records authenticated ones, teeing request and response bodies as
+    they stream.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_body_bytes: Optional[int] = None,
+        endpoint_limits: Optional[dict[str, int]] = None,
+    ):
+        self.app = app
+        self.max_body_bytes = (
+            settings.activity_capture_max_bytes if max_body_bytes is None else max_body_bytes
+        )
+        limits = settings.activity_capture_limits if endpoint_limits is None else endpoint_limits
+        # Longest prefix first so the most specific override wins
+        self.endpoint_limits = sorted(limits.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def capture_limit(self, endpoint: str) -> int:
+        for prefix, limit in self.endpoint_limits:
+            if endpoint.startswith(prefix):
+                return limit
+        return self.max_body_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         # Only track API calls
-        if not request.url.path.startswith('/api/'):
-            return await call_next(request)
-
-        # Get token from request if present
-        token = None
-        auth_header = request.headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
-            token_value = auth_header.split(' ')[1]
-            # Get db session
-            db = next(deps.get_db())
-            try:
-                db_token = crud.token.get_by_token(db, token=token_value)
-                if db_token:
-                    token = db_token
-            finally:
-                db.close()
-
-        # If no valid token, just proceed without tracking
-        if not token:
-            return await call_next(request)
-
-        # Capture request data
-        request_body = None
-        if request.method in ['POST', 'PUT', 'PATCH']:
-            body = await request.body()
-            if body:
-                try:
-                    request_body = json.dumps(json.loads(body))
-                except (json.JSONDecodeError, UnicodeDecodeError):
-                    request_body = body.decode('utf-8', errors='replace')
-            # Need to recreate the request with the body we read
-            request._body = body
-
-        # Process the request
-        response = await call_next(request)
-
-        # Capture response data
-        response_body = None
-        response_status = response.status_code
-
-        # Capture response body for JSON responses
-        if hasattr(response, 'body'):
-            try:
-                if response.headers.get('content-type', '').startswith('application/json'):
-                    response_body = response.body.decode('utf-8')
-                elif len(response.body) < 1000:  # Only capture small non-JSON responses
-                    response_body = response.body.decode('utf-8', errors='replace')[:500]
-            except Exception:
-                response_body = None
-        elif isinstance(response, StreamingResponse):
-            # For streaming responses, we can't easily capture the body
-            response_body = '[Streaming Response]'
-
-        # Log the activity
-        db = next(deps.get_db())
+        if scope['type'] != 'http' or not scope['path'].startswith('/api/'):
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        context_token = request_stats.set(stats)
+        try:
+            await self._track(scope, receive, send, stats)
+        finally:
+            request_stats.reset(context_token)
+
+    async def _track(self, scope: Scope, receive: Receive, send: Send, stats: RequestStats) -> None:
+        timestamp = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        token = await self._resolve_token(scope)
+
+        method = scope['method']
+        endpoint = f'{method} {scope["path"]}'
+        # Without a valid token nothing is recorded, but the response size is still counted
+        limit = self.capture_limit(endpoint) if token else 0
+        request_body = BodyCapture(limit) if token and method in CAPTURE_METHODS else None
+        response_body = BodyCapture(limit)
+        status_code = 500
+
+        async def receive_wrapper() -> Message:
+            message = await receive()
+            if request_body is not None and message['type'] == 'http.request':
+                request_body.feed(message.get('body', b''))
+            return message
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            elif message['type'] == 'http.response.body':
+                response_body.feed(message.get('body', b''))
+            await send(message)
+
         try:
-            activity = ActivityCreate(
-                endpoint=f'{request.method} {request.url.path}',
-                request=request_body,
-                response=response_body,
-                status_code=response_status,
-                token_id=token.id,
-            )
-            crud.activity.create(db, obj_in=activity)
+            await self.app(scope, receive_wrapper, send_wrapper)
         finally:
-            db.close()
+            duration = time.perf_counter() - started
+            # The router leaves the matched route in the scope
+            route = scope.get('route')
+            route_name = f'{method} {route.path}' if route is not None else None
+            route_label = route_name or f'{method} (unmatched)'
+            route_latency.record(route_label, duration)
+            http_requests.inc(route=route_label, status=str(status_code))
+            db_queries_per_request.observe(stats.query_count)
+            db_time_per_request.observe(stats.db_seconds)
+
+            if token is not None:
+                # Hand the activity to the background writer
+                await activity_sink.put(
+                    ActivityCreate(
+                        endpoint=endpoint,
+                        route=route_name,
+                        request=request_body.text() if request_body is not None else None,
+                        response=response_body.text(),
+                        status_code=status_code,
+                        token_id=token.id,
+                        timestamp=timestamp,
+                        duration_ms=duration * 1000,
+                        db_time_ms=stats.db_seconds * 1000,
+                        response_size=response_body.size,
+                    )
+                )
+
+    async def _resolve_token(self, scope: Scope) -> Optional[Token]:
+        auth_header = Headers(scope=scope).get('authorization')
+        if not auth_header or not auth_header.startswith('Bearer '):
+            return None
+        # Async session, so a cache miss doesn't block the event loop
+        async with AsyncSessionLocal() as db:
+            token = await get_token_async(db, auth_header.split(' ')[1])
+        # Share the resolved token with the auth dependency (request.state) so it is looked
+        # up only once
+        scope.setdefault('state', {})['token'] = token
+        return token
 
-        return response
+
+class ReadYourWritesMiddleware:
+    """
+    Remembers clients that sent a write, so their reads go to the primary for
+    `read_your_writes_window` seconds after it completes instead of a lagging replica.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or scope['method'] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        # Reads issued while the write is still running also go to the primary
+        record_write(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            record_write(scope)
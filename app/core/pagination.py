@@ -0,0 +1,60 @@
+"""
+Opaque cursors for keyset pagination.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional
+
+from fastapi import HTTPException, Request, Response
+
+
+def encode_cursor(*values: Any) -> str:
+    payload = json.dumps(
+        [value.isoformat() if isinstance(value, datetime) else value for value in values],
+        separators=(',', ':'),
+    )
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int) -> list[Any]:
+    """Decode a cursor holding `size` keys; raises a 400 if it is malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError):
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail='Invalid cursor')
+    return values
+
+
+def page_after(cursor: Optional[str], order_by: str) -> Optional[Any]:
+    """The key to seek past for a list cursor, checking it was issued for the same ordering."""
+    if not cursor:
+        return None
+    field, value = decode_cursor(cursor, 2)
+    if field != order_by:
+        raise HTTPException(status_code=400, detail=f'Cursor was issued for order_by={field}')
+    return value
+
+
+def next_page(items: list[Any], limit: int, order_by: str) -> tuple[list[Any], Optional[str]]:
+    """Trim a page fetched with limit + 1 rows; returns the page and the cursor after it."""
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    return items, encode_cursor(order_by, getattr(items[-1], order_by))
+
+
+def set_page_headers(
+    request: Request, response: Response, next_cursor: Optional[str], total: Optional[int]
+) -> None:
+    """Advertise the next page (Link and X-Next-Cursor) and the total count on a list response."""
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+        url = request.url.remove_query_params('skip').include_query_params(cursor=next_cursor)
+        response.headers['Link'] = f'<{url}>; rel="next"'
+    if total is not None:
+        response.headers['X-Total-Count'] = str(total)
@@ -0,0 +1,48 @@
+"""
+Encoding of captured request/response payloads for storage on activity records.
+"""
+
+import re
+import zlib
+from collections.abc import Iterable
+from typing import Optional
+
+from app.core.config import settings
+
+REDACTED = '[REDACTED]'
+
+
+def redaction_pattern(fields: Iterable[str]) -> Optional[re.Pattern]:
+    names = '|'.join(re.escape(field) for field in fields)
+    if not names:
+        return None
+    # Matches "field": "value" pairs without parsing, so truncated bodies are redacted too
+    return re.compile(rf'("(?:{names})"\s*:\s*)"(?:[^"\\]|\\.)*"?', re.IGNORECASE)
+
+
+_pattern = redaction_pattern(settings.activity_redact_fields)
+
+
+def redact(text: str) -> str:
+    if _pattern is None:
+        return text
+    return _pattern.sub(rf'\1"{REDACTED}"', text)
+
+
+def encode(text: Optional[str]) -> tuple[Optional[str], Optional[bytes]]:
+    """Return the (text, compressed) column values to store for a captured payload."""
+    mode = settings.activity_payload_mode
+    if text is None or mode == 'raw':
+        return text, None
+    text = redact(text)
+    if mode == 'compressed':
+        data = text.encode('utf-8')
+        if len(data) >= settings.activity_compress_threshold:
+            return None, zlib.compress(data)
+    return text, None
+
+
+def decode(text: Optional[str], compressed: Optional[bytes]) -> Optional[str]:
+    if compressed is not None:
+        return zlib.decompress(compressed).decode('utf-8')
+    return text
@@ -0,0 +1,39 @@
+"""
+Read replica routing: safe requests read from the replica unless their client wrote recently.
+"""
+
+from starlette.datastructures import Headers
+from starlette.types import Scope
+
+from app.core.cache import MISSING, LRUCache, register_cache_metrics
+from app.core.config import settings
+
+SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+RECENT_WRITERS_SIZE = 10000
+
+replica_enabled = bool(settings.read_database_url)
+
+# Client key -> True while the client's last write is within the read-your-writes window
+recent_writers = LRUCache(RECENT_WRITERS_SIZE, ttl=settings.read_your_writes_window)
+register_cache_metrics(recent_writers, 'recent_writers')
+
+
+def client_key(scope: Scope) -> str:
+    """The bearer token for API calls, otherwise the client address (UI sessions)."""
+    authorization = Headers(scope=scope).get('authorization')
+    if authorization:
+        return authorization
+    client = scope.get('client')
+    return client[0] if client else ''
+
+
+def record_write(scope: Scope) -> None:
+    recent_writers.set(client_key(scope), True)
+
+
+def use_replica(scope: Scope) -> bool:
+    return (
+        replica_enabled
+        and scope['method'] in SAFE_METHODS
+        and recent_writers.get(client_key(scope)) is MISSING
+    )
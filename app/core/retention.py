@@ -0,0 +1,186 @@
+"""
+Activity retention: day buckets older than the retention window are archived to gzipped JSONL
+files and then dropped from the activities table with one range delete per bucket.
+"""
+
+import gzip
+import itertools
+import json
+import logging
+import os
+import shutil
+import threading
+from datetime import date, datetime, time, timedelta, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+from sqlalchemy import delete, func, inspect, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.activity import Activity
+
+logger = logging.getLogger(__name__)
+
+# Stored payload columns are replaced by their decoded text in archive records
+_PAYLOAD_COLUMNS = {'request_text', 'request_compressed', 'response_text', 'response_compressed'}
+
+
+def _bucket_bounds(day: date) -> tuple[datetime, datetime]:
+    start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def _archive_record(activity: Activity) -> dict[str, Any]:
+    record = {
+        attr.key: getattr(activity, attr.key)
+        for attr in inspect(Activity).column_attrs
+        if attr.key not in _PAYLOAD_COLUMNS
+    }
+    record['request'] = activity.request
+    record['response'] = activity.response
+    return record
+
+
+def archive_path(day: date, archive_dir: Optional[str] = None) -> Path:
+    directory = Path(archive_dir or settings.activity_archive_dir)
+    return directory / f'activities-{day.isoformat()}.jsonl.gz'
+
+
+def expired_buckets(db: Session, *, cutoff: date) -> list[date]:
+    """Days that still hold activity rows and lie entirely before the cutoff day."""
+    days: list[date] = []
+    stmt = select(func.min(Activity.timestamp))
+    oldest = db.scalar(stmt)
+    # Seek from each non-empty day to the next on the timestamp index, skipping empty days
+    while oldest is not None and oldest.date() < cutoff:
+        days.append(oldest.date())
+        _, next_day = _bucket_bounds(oldest.date())
+        oldest = db.scalar(stmt.where(Activity.timestamp >= next_day))
+    return days
+
+
+def _pending_path(path: Path) -> Path:
+    return path.with_name(path.name + '.tmp')
+
+
+def archive_bucket(db: Session, *, day: date, archive_dir: Optional[str] = None) -> int:
+    """
+    Archive one day of activities and drop the bucket from the table. The new archive is
+    written beside the old one and only renamed over it once the delete has committed, so a
+    failed run leaves the archive as it was and the next run starts that day afresh.
+    """
+    start, end = _bucket_bounds(day)
+    in_bucket = (Activity.timestamp >= start) & (Activity.timestamp < end)
+    path = archive_path(day, archive_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    rows = iter(
+        db.scalars(
+            select(Activity).where(in_bucket).order_by(Activity.timestamp, Activity.id)
+        ).yield_per(1000)
+    )
+    first = next(rows, None)
+    if first is None:
+        # Nothing to archive; don't leave an empty file behind
+        db.commit()
+        return 0
+
+    count = 0
+    pending = _pending_path(path)
+    with pending.open('wb') as out:
+        # Rows that arrived after an earlier archive of this day follow its gzip members
+        if path.exists():
+            with path.open('rb') as archived:
+                shutil.copyfileobj(archived, out)
+        with gzip.GzipFile(fileobj=out, mode='wb') as archive:
+            for activity in itertools.chain([first], rows):
+                line = json.dumps(_archive_record(activity), default=str) + '\n'
+                archive.write(line.encode('utf-8'))
+                count += 1
+        out.flush()
+        os.fsync(out.fileno())
+    try:
+        db.execute(delete(Activity).where(in_bucket).execution_options(synchronize_session=False))
+        db.commit()
+    except Exception:
+        db.rollback()
+        pending.unlink()
+        raise
+    os.replace(pending, path)
+    return count
+
+
+def finish_pending(db: Session, *, archive_dir: Optional[str] = None) -> None:
+    """
+    Settle archives left pending by a run that stopped between its commit and the rename: the
+    rename is completed if the day's rows are gone, and the file discarded if they are not.
+    """
+    directory = Path(archive_dir or settings.activity_archive_dir)
+    for pending in directory.glob('activities-*.jsonl.gz.tmp'):
+        day = date.fromisoformat(pending.name[len('activities-'):][:10])
+        start, end = _bucket_bounds(day)
+        remaining = db.scalar(
+            select(Activity.id)
+            .where(Activity.timestamp >= start, Activity.timestamp < end)
+            .limit(1)
+        )
+        db.commit()
+        if remaining is None:
+            os.replace(pending, archive_path(day, archive_dir))
+        else:
+            pending.unlink()
+
+
+def run_retention(
+    db: Session, *, retention_days: Optional[int] = None, now: Optional[datetime] = None
+) -> dict[date, int]:
+    """Archive and drop every day bucket that has fallen out of the retention window."""
+    retention_days = settings.activity_retention_days if retention_days is None else retention_days
+    if retention_days <= 0:
+        return {}
+    now = now or datetime.now(timezone.utc)
+    cutoff = (now - timedelta(days=retention_days)).date()
+    finish_pending(db)
+    archived = {}
+    for day in expired_buckets(db, cutoff=cutoff):
+        archived[day] = archive_bucket(db, day=day)
+        logger.info('Archived %d activities for %s', archived[day], day)
+    return archived
+
+
+class RetentionWorker:
+    """Runs the retention policy periodically in a background thread."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None or settings.activity_retention_days <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='activity-retention', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            db = SessionLocal()
+            try:
+                run_retention(db)
+            except Exception:
+                logger.exception('Activity retention run failed')
+            finally:
+                db.close()
+            self._stop.wait(self.interval)
+
+
+retention_worker = RetentionWorker(settings.activity_retention_interval)
@@ -1,21 +1,88 @@
+import asyncio
 import secrets
 import string
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
 
 from fastapi import HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from passlib.context import CryptContext
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app import crud
+from app.core.cache import MISSING, token_cache
+from app.core.config import settings
+from app.core.metrics import password_hash_duration, password_hash_queue_wait, registry
 from app.models.token import Token
 
 security = HTTPBearer()
 pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
 
+# bcrypt releases the GIL, so a small thread pool hashes in parallel while keeping the CPU
+# spent on hashing bounded no matter how many requests ask for it at once
+hash_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers, thread_name_prefix='password-hash'
+)
+
+
+class PendingJobs:
+    """Count of futures submitted and not yet done, settled by a done-callback."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def track(self, future: Future) -> Future:
+        with self._lock:
+            self.count += 1
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future: Future) -> None:
+        with self._lock:
+            self.count -= 1
+
+
+pending_hashes = PendingJobs()
+registry.gauge_callback(
+    'password_hash_queue_depth',
+    'bcrypt jobs queued or running on the hashing pool',
+    lambda: pending_hashes.count,
+)
+
+
+def _detached_token(token: str, token_id: Optional[str]) -> Optional[Token]:
+    if token_id is None:
+        return None
+    # Detached copy so cached tokens are never bound to another request's session
+    return Token(id=token_id, token=token)
+
+
+def get_token(db: Session, token: str) -> Optional[Token]:
+    """Resolve a bearer string to its token, consulting the shared token cache first."""
+    token_id = token_cache.get(token)
+    if token_id is MISSING:
+        db_token = crud.token.get_by_token(db, token=token)
+        token_id = db_token.id if db_token else None
+        token_cache.set(token, token_id)
+    return _detached_token(token, token_id)
+
+
+async def get_token_async(db: AsyncSession, token: str) -> Optional[Token]:
+    """get_token for async callers."""
+    token_id = token_cache.get(token)
+    if token_id is MISSING:
+        db_token = await crud.token.get_by_token_async(db, token=token)
+        token_id = db_token.id if db_token else None
+        token_cache.set(token, token_id)
+    return _detached_token(token, token_id)
+
 
 def verify_token(db: Session, credentials: HTTPAuthorizationCredentials) -> Token:
-    token = credentials.credentials
-    db_token = crud.token.get_by_token(db, token=token)
+    db_token = get_token(db, credentials.credentials)
 
     if not db_token:
         raise HTTPException(
@@ -27,12 +94,39 @@ def verify_token(db: Session, credentials: HTTPAuthorizationCredentials) -> Toke
     return db_token
 
 
+def _submit(operation: str, func: Callable[..., Any], *args: Any) -> Future:
+    """Run a bcrypt call on the hashing pool, recording queue wait and run time."""
+    submitted = time.perf_counter()
+
+    def run() -> Any:
+        started = time.perf_counter()
+        password_hash_queue_wait.observe(started - submitted, operation=operation)
+        try:
+            return func(*args)
+        finally:
+            password_hash_duration.observe(time.perf_counter() - started, operation=operation)
+
+    return pending_hashes.track(hash_executor.submit(run))
+
+
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return _submit('hash', pwd_context.hash, password).result()
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return _submit('verify', pwd_context.verify, plain_password, hashed_password).result()
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash without blocking the event loop."""
+    return await asyncio.wrap_future(_submit('hash', pwd_context.hash, password))
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify without blocking the event loop."""
+    return await asyncio.wrap_future(
+        _submit('verify', pwd_context.verify, plain_password, hashed_password)
+    )
 
 
 def generate_password(length: int = 12) -> str:
@@ -0,0 +1,121 @@
+"""
+Per-table version counters for conditional GETs. Session events note which versioned tables a
+transaction writes, through the ORM or INSERT/UPDATE/DELETE statements, and bump their counters
+in the same commit, so a reader's ETag changes exactly when data it depends on has.
+"""
+
+from collections.abc import Iterable
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Any, Optional
+
+from sqlalchemy import event, insert, inspect, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app.models.table_version import TableVersion
+
+VERSIONED_TABLES = frozenset({'users', 'roles', 'user_roles', 'role_hierarchy', 'role_closure'})
+
+# Session.info key holding the versioned tables written in the current transaction
+CHANGED_KEY = 'changed_tables'
+
+
+def _mark(session: Session, tables: Iterable[str]) -> None:
+    changed = VERSIONED_TABLES.intersection(tables)
+    if changed:
+        session.info.setdefault(CHANGED_KEY, set()).update(changed)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_statement(state: ORMExecuteState) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        table = getattr(state.statement, 'table', None)
+        if table is not None:
+            _mark(state.session, [table.name])
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_flush(session: Session, flush_context: Any, instances: Any) -> None:
+    deleted = set(session.deleted)
+    for obj in (*session.new, *session.dirty, *deleted):
+        state = inspect(obj)
+        _mark(session, [table.name for table in state.mapper.tables])
+        # Collection changes, and deletes, write to the association tables
+        _mark(
+            session,
+            [
+                rel.secondary.name
+                for rel in state.mapper.relationships
+                if rel.secondary is not None
+                and (obj in deleted or state.attrs[rel.key].history.has_changes())
+            ],
+        )
+
+
+@event.listens_for(Session, 'before_commit')
+def _bump(session: Session) -> None:
+    # Commit flushes after this hook runs; flush now so pending ORM changes are counted
+    session.flush()
+    changed = session.info.pop(CHANGED_KEY, None)
+    if not changed:
+        return
+    now = datetime.now(timezone.utc)
+    bump = (
+        update(TableVersion)
+        .where(TableVersion.table_name.in_(changed))
+        .values(version=TableVersion.version + 1, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    if session.execute(bump).rowcount < len(changed):
+        existing = set(
+            session.scalars(
+                select(TableVersion.table_name).where(TableVersion.table_name.in_(changed))
+            )
+        )
+        session.execute(
+            insert(TableVersion),
+            [{'table_name': name, 'version': 1, 'updated_at': now} for name in changed - existing],
+        )
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget(session: Session, previous_transaction: Any) -> None:
+    session.info.pop(CHANGED_KEY, None)
+
+
+def install(engine: Engine) -> None:
+    """Create a counter row for every versioned table that lacks one."""
+    now = datetime.now(timezone.utc)
+    with engine.begin() as conn:
+        existing = set(conn.scalars(select(TableVersion.table_name)))
+        missing = VERSIONED_TABLES - existing
+        if missing:
+            conn.execute(
+                insert(TableVersion),
+                [{'table_name': name, 'version': 0, 'updated_at': now} for name in missing],
+            )
+
+
+def validators(db: Session, tables: Iterable[str]) -> tuple[str, Optional[str]]:
+    """Strong ETag and Last-Modified (HTTP date) for a response built from `tables`."""
+    names = sorted(tables)
+    stmt = select(TableVersion.table_name, TableVersion.version, TableVersion.updated_at).where(
+        TableVersion.table_name.in_(names)
+    )
+    rows = {row.table_name: row for row in db.execute(stmt)}
+    etag = '"' + '.'.join(str(rows[name].version if name in rows else 0) for name in names) + '"'
+    if not rows:
+        return etag, None
+    updated_at = max(row.updated_at for row in rows.values())
+    if updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=timezone.utc)
+    return etag, format_datetime(updated_at.astimezone(timezone.utc), usegmt=True)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against `etag`, as RFC 9110 prescribes."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+    return '*' in candidates or etag in [candidate.removeprefix('W/') for candidate in candidates]
@@ -0,0 +1,200 @@
+"""
+Bulk user import: streams JSON, NDJSON or CSV records and creates users batch by batch.
+"""
+
+import asyncio
+import csv
+import json
+from collections.abc import AsyncIterator
+from typing import Any, Optional
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+from app.core.config import settings
+from app.core.security import generate_password, get_password_hash_async
+from app.models.user import User
+from app.schemas.user import UserCreate, UserImportResponse, UserImportResult
+
+JSON_TYPES = {'application/json'}
+NDJSON_TYPES = {'application/x-ndjson', 'application/ndjson', 'application/jsonl'}
+CSV_TYPES = {'text/csv', 'application/csv'}
+
+# A record as read from the body: an NDJSON line (bytes) still to be parsed, or decoded JSON/CSV
+# fields
+RawRecord = Any
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    buffer = b''
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            yield line.rstrip(b'\r')
+    if buffer:
+        yield buffer.rstrip(b'\r')
+
+
+async def read_records(content_type: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[RawRecord]:
+    """Yield the records in a request body; NDJSON and CSV are parsed as they stream in."""
+    media_type = content_type.split(';')[0].strip().lower()
+    if media_type in JSON_TYPES:
+        body = b''.join([chunk async for chunk in chunks])
+        try:
+            records = json.loads(body)
+        except ValueError:
+            records = None
+        if not isinstance(records, list):
+            raise HTTPException(status_code=400, detail='Expected a JSON array of users')
+        for record in records:
+            yield record
+    elif media_type in NDJSON_TYPES:
+        async for line in _lines(chunks):
+            if line.strip():
+                yield line
+    elif media_type in CSV_TYPES:
+        header: Optional[list[str]] = None
+        async for line in _lines(chunks):
+            if not line.strip():
+                continue
+            values = next(csv.reader([line.decode('utf-8')]))
+            if header is None:
+                header = [name.strip().lstrip('\ufeff') for name in values]
+                continue
+            # Empty cells count as missing, so an empty password is auto-generated
+            yield {name: value for name, value in zip(header, values) if value}
+    else:
+        raise HTTPException(
+            status_code=415,
+            detail='Send users as application/json, application/x-ndjson or text/csv',
+        )
+
+
+def _validate(record: RawRecord) -> UserCreate:
+    if isinstance(record, bytes):
+        return UserCreate.model_validate_json(record)
+    return UserCreate.model_validate(record)
+
+
+def _describe(exc: ValidationError) -> str:
+    messages = []
+    for error in exc.errors():
+        location = '.'.join(str(part) for part in error['loc'])
+        messages.append(f'{location}: {error["msg"]}' if location else error['msg'])
+    return '; '.join(messages)
+
+
+async def _import_batch(
+    db: AsyncSession, batch: list[tuple[int, RawRecord]], seen_emails: set[str]
+) -> list[UserImportResult]:
+    results: dict[int, UserImportResult] = {}
+    valid: list[tuple[int, UserCreate]] = []
+    for row, record in batch:
+        try:
+            user_in = _validate(record)
+        except ValidationError as exc:
+            results[row] = UserImportResult(row=row, status='error', error=_describe(exc))
+            continue
+        if user_in.email in seen_emails:
+            results[row] = UserImportResult(
+                row=row, status='error', email=user_in.email, error='Duplicate email in import'
+            )
+            continue
+        seen_emails.add(user_in.email)
+        valid.append((row, user_in))
+
+    # One query for the whole batch instead of a get_by_email per user
+    existing = await crud.user.get_existing_emails_async(
+        db, emails=[user_in.email for _, user_in in valid]
+    )
+    pending = []
+    for row, user_in in valid:
+        if user_in.email in existing:
+            results[row] = UserImportResult(
+                row=row,
+                status='error',
+                email=user_in.email,
+                error='A user with this email already exists.',
+            )
+        else:
+            pending.append((row, user_in))
+
+    generated = {row: generate_password() for row, user_in in pending if not user_in.password}
+    hashed_passwords = await asyncio.gather(
+        *(get_password_hash_async(user_in.password or generated[row]) for row, user_in in pending)
+    )
+
+    # Nothing needs reading back: the ids and usernames are generated before the insert
+    created: list[Optional[User]]
+    try:
+        users = await crud.user.create_many_async(
+            db,
+            objs_in=[user_in for _, user_in in pending],
+            refresh=False,
+            hashed_passwords=hashed_passwords,
+        )
+        created = list(users)
+    except IntegrityError:
+        # A concurrent writer took one of the emails after the check; retry row by row so only
+        # the conflicting rows fail
+        await db.rollback()
+        created = []
+        for (_, user_in), hashed_password in zip(pending, hashed_passwords):
+            try:
+                created += await crud.user.create_many_async(
+                    db,
+                    objs_in=[user_in],
+                    refresh=False,
+                    hashed_passwords=[hashed_password],
+                )
+            except IntegrityError:
+                await db.rollback()
+                created.append(None)
+
+    for (row, user_in), user in zip(pending, created):
+        if user is None:
+            results[row] = UserImportResult(
+                row=row,
+                status='error',
+                email=user_in.email,
+                error='A user with this email already exists.',
+            )
+        else:
+            results[row] = UserImportResult(
+                row=row,
+                status='created',
+                id=user.id,
+                username=user.username,
+                email=user.email,
+                generated_password=generated.get(row),
+            )
+    return [results[row] for row, _ in batch]
+
+
+async def import_users(
+    db: AsyncSession, records: AsyncIterator[RawRecord], batch_size: Optional[int] = None
+) -> UserImportResponse:
+    """
+    Create users from `records`, validating, checking emails, hashing and inserting a batch at a
+    time; each batch is committed on its own.
+    """
+    batch_size = batch_size or settings.user_import_batch_size
+    results: list[UserImportResult] = []
+    seen_emails: set[str] = set()
+    batch: list[tuple[int, RawRecord]] = []
+    row = 0
+    async for record in records:
+        row += 1
+        batch.append((row, record))
+        if len(batch) >= batch_size:
+            results += await _import_batch(db, batch, seen_emails)
+            batch = []
+    if batch:
+        results += await _import_batch(db, batch, seen_emails)
+
+    created = sum(1 for result in results if result.status == 'created')
+    return UserImportResponse(created=created, failed=len(results) - created, results=results)
@@ -0,0 +1,94 @@
+"""
+Full-text user search: an SQLite FTS5 index over usernames, names and emails, kept in sync with
+the users table by triggers.
+"""
+
+import logging
+import re
+from typing import Optional
+
+from sqlalchemy import ColumnElement, column, literal_column, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# External-content index keyed on the users rowid, so the text is stored once. Prefix indexes
+# for 2 and 3 characters keep short type-ahead queries from scanning the full term list
+SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+        username, first_name, last_name, email,
+        content='users', content_rowid='rowid', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN
+        INSERT INTO users_fts(rowid, username, first_name, last_name, email)
+        VALUES (new.rowid, new.username, new.first_name, new.last_name, new.email);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN
+        INSERT INTO users_fts(users_fts, rowid, username, first_name, last_name, email)
+        VALUES ('delete', old.rowid, old.username, old.first_name, old.last_name, old.email);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_fts_update
+    AFTER UPDATE OF username, first_name, last_name, email ON users BEGIN
+        INSERT INTO users_fts(users_fts, rowid, username, first_name, last_name, email)
+        VALUES ('delete', old.rowid, old.username, old.first_name, old.last_name, old.email);
+        INSERT INTO users_fts(rowid, username, first_name, last_name, email)
+        VALUES (new.rowid, new.username, new.first_name, new.last_name, new.email);
+    END
+    """,
+]
+
+# For building queries; not part of the metadata, since create_all cannot create it
+users_fts = table('users_fts', column('rowid'), column('rank'))
+
+# Set by install once the index exists; searches fall back to LIKE scans otherwise
+enabled = False
+
+
+def install(engine: Engine) -> None:
+    """Create the index and its triggers if missing, indexing existing users the first time."""
+    global enabled
+    if engine.dialect.name != 'sqlite':
+        return
+    try:
+        with engine.begin() as conn:
+            exists = conn.scalar(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users_fts'")
+            )
+            for statement in SEARCH_DDL:
+                conn.exec_driver_sql(statement)
+            if not exists:
+                conn.exec_driver_sql("INSERT INTO users_fts(users_fts) VALUES ('rebuild')")
+    except OperationalError:
+        logger.warning('SQLite was built without FTS5; user search will scan the users table')
+        return
+    enabled = True
+
+
+def rebuild(db: Session) -> None:
+    """Reindex every user, e.g. after a VACUUM, which may renumber the users rowids."""
+    db.execute(text("INSERT INTO users_fts(users_fts) VALUES ('rebuild')"))
+    db.commit()
+
+
+def matches(expression: str) -> ColumnElement[bool]:
+    return literal_column('users_fts').op('MATCH')(expression)
+
+
+def match_expression(query: str) -> Optional[str]:
+    """
+    FTS5 MATCH expression for free text: every word must match as a prefix, so 'jan smi' finds
+    Jane Smith. Returns None if the query has no searchable words.
+    """
+    words = re.findall(r'\w+', query.lower())
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
@@ -1,6 +1,10 @@
 from app.crud.crud_activity import activity
+from app.crud.crud_activity_rollup import activity_rollup
+from app.crud.crud_membership import membership
 from app.crud.crud_role import role
+from app.crud.crud_role_hierarchy import role_hierarchy
 from app.crud.crud_token import token
 from app.crud.crud_user import user
+from app.crud.crud_username_counter import username_counter
 
-__all__ = ["activity", "role", "token", "user"]
\ No newline at end of file
+__all__ = ["activity", "activity_rollup", "membership", "role", "role_hierarchy", "token", "user", "username_counter"]
\ No newline at end of file
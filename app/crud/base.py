@@ -1,9 +1,15 @@
-from typing import Any, Generic, Optional, TypeVar, Union
+from collections.abc import Collection, Iterable, Mapping, Sequence
+from typing import Any, ClassVar, Generic, Optional, TypeVar, Union
 
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import Table, case, delete, func, insert, inspect, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, noload, selectinload
 
+from app.core import table_versions  # noqa: F401  (bumps table versions on commit)
+from app.core.cache import LRUCache
 from app.core.database import Base
 
 ModelType = TypeVar('ModelType', bound=Base)
@@ -11,17 +17,76 @@ CreateSchemaType = TypeVar('CreateSchemaType', bound=BaseModel)
 UpdateSchemaType = TypeVar('UpdateSchemaType', bound=BaseModel)
 
 
+def upsert_insert(db: Session, table: Table) -> Any:
+    """
+    INSERT for the session's dialect that supports on_conflict_do_update/do_nothing. Engines for
+    other dialects are refused at startup by database.check_backend.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(table)
+    if dialect == 'sqlite':
+        return sqlite.insert(table)
+    raise NotImplementedError(f'INSERT ... ON CONFLICT is not supported on {dialect}')
+
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    # Loader options per loading profile. Relationships load lazily by default, so readers pick
+    # the cheapest profile their response needs: 'bare' leaves relationships empty and 'full'
+    # selectin-loads them one level deep. Subclasses add id-only profiles
+    loading_profiles: ClassVar[dict[str, tuple[Any, ...]]] = {
+        'bare': (noload('*'),),
+        'full': (selectinload('*'),),
+    }
+
+    # Serialized responses of this model by id, and caches of other models whose responses list
+    # these rows through an association table (cleared when rows are deleted). The write methods
+    # invalidate both after committing
+    cache: ClassVar[Optional[LRUCache]] = None
+    related_caches: ClassVar[tuple[LRUCache, ...]] = ()
+
     def __init__(self, model: type[ModelType]):
         self.model = model
 
-    def get(self, db: Session, id: Any) -> Optional[ModelType]:
-        return db.query(self.model).filter(self.model.id == id).first()
+    def invalidate(self, ids: Iterable[Any], *, deleted: bool = False) -> None:
+        if self.cache is not None:
+            for id in ids:
+                self.cache.invalidate(id)
+        if deleted:
+            for cache in self.related_caches:
+                cache.clear()
 
-    def get_multi(self, db: Session, *, skip: int = 0, limit: int = 100) -> list[ModelType]:
-        return db.query(self.model).offset(skip).limit(limit).all()
+    def load_options(self, profile: Optional[str]) -> tuple[Any, ...]:
+        """Loader options for `profile`; None keeps the relationships' lazy loading."""
+        if profile is None:
+            return ()
+        try:
+            return self.loading_profiles[profile]
+        except KeyError:
+            raise ValueError(
+                f'Unknown loading profile for {self.model.__name__}: {profile}'
+            ) from None
 
-    def create(self, db: Session, *, obj_in: CreateSchemaType, **kwargs) -> ModelType:
+    def get(self, db: Session, id: Any, profile: Optional[str] = None) -> Optional[ModelType]:
+        return (
+            db.query(self.model)
+            .options(*self.load_options(profile))
+            .filter(self.model.id == id)
+            .first()
+        )
+
+    def get_multi(
+        self, db: Session, *, skip: int = 0, limit: int = 100, profile: Optional[str] = None
+    ) -> list[ModelType]:
+        return (
+            db.query(self.model)
+            .options(*self.load_options(profile))
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+
+    def create(self, db: Session, *, obj_in: CreateSchemaType, **kwargs: Any) -> ModelType:
         obj_in_data = jsonable_encoder(obj_in)
         obj_in_data.update(kwargs)
         db_obj = self.model(**obj_in_data)
@@ -41,6 +106,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
+        self.invalidate([db_obj.id])
         return db_obj
 
     def remove(self, db: Session, *, id: Any) -> Optional[ModelType]:
@@ -48,4 +114,235 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         if obj:
             db.delete(obj)
             db.commit()
+            self.invalidate([id], deleted=True)
         return obj
+
+    def get_page(
+        self,
+        db: Session,
+        *,
+        order_by: str = 'id',
+        after: Optional[Any] = None,
+        skip: int = 0,
+        limit: int = 100,
+        profile: Optional[str] = None,
+    ) -> list[ModelType]:
+        """
+        Rows ordered by the unique column `order_by`. Pass the previous page's last key as `after`
+        to seek past it through the column's index, so every page costs the same; `skip` remains
+        for offset callers.
+        """
+        column = getattr(self.model, order_by)
+        stmt = select(self.model).options(*self.load_options(profile)).order_by(column)
+        if after is not None:
+            stmt = stmt.where(column > after)
+        return list(db.scalars(stmt.offset(skip).limit(limit)))
+
+    def count(self, db: Session) -> int:
+        return db.scalar(select(func.count()).select_from(self.model)) or 0
+
+    # Bulk variants: one set-based statement per call instead of a round trip per row. Rows are
+    # read back through RETURNING where the dialect supports it, otherwise with one SELECT after
+    # the commit. Objects loaded by RETURNING are detached so the commit does not expire them
+    def create_values(self, obj_in: CreateSchemaType) -> dict[str, Any]:
+        """Column values to insert for `obj_in`; subclasses add generated ids."""
+        return dict(jsonable_encoder(obj_in))
+
+    def insert_rows(
+        self, db: Session, *, rows: Sequence[dict[str, Any]], refresh: bool = True
+    ) -> Optional[list[ModelType]]:
+        """
+        INSERT `rows` without committing. Returns the stored rows when RETURNING is available,
+        instances built from `rows` without refresh, or None when the rows must be loaded after
+        the commit (see load_many).
+        """
+        if not rows:
+            return []
+        stmt = insert(self.model)
+        if refresh and db.get_bind().dialect.insert_executemany_returning:
+            db_objs = list(
+                db.scalars(stmt.returning(self.model, sort_by_parameter_order=True), rows)
+            )
+            for db_obj in db_objs:
+                db.expunge(db_obj)
+            return db_objs
+        db.execute(stmt, rows)
+        return None if refresh else [self.model(**row) for row in rows]
+
+    def load_many(self, db: Session, *, ids: Sequence[Any]) -> list[ModelType]:
+        """The rows with `ids` in one query, in the order given; missing ids are skipped."""
+        if not ids:
+            return []
+        found = {
+            db_obj.id: db_obj
+            for db_obj in db.scalars(
+                select(self.model)
+                .where(self.model.id.in_(ids))
+                .execution_options(populate_existing=True)
+            )
+        }
+        return [found[id] for id in ids if id in found]
+
+    def create_many(
+        self, db: Session, *, objs_in: Sequence[CreateSchemaType], refresh: bool = True
+    ) -> list[ModelType]:
+        """
+        Insert `objs_in` in one statement and commit. Without refresh the returned instances are
+        built from the inserted values and server defaults are not read back.
+        """
+        rows = [self.create_values(obj_in) for obj_in in objs_in]
+        db_objs = self.insert_rows(db, rows=rows, refresh=refresh)
+        db.commit()
+        if db_objs is None:
+            db_objs = self.load_many(db, ids=[row['id'] for row in rows])
+        return db_objs
+
+    def update_many(
+        self,
+        db: Session,
+        *,
+        updates: Mapping[Any, Union[UpdateSchemaType, dict[str, Any]]],
+        refresh: bool = True,
+    ) -> list[ModelType]:
+        """
+        Apply a partial update per id with a single UPDATE ... SET column = CASE id ... and
+        commit. Returns the updated rows, or an empty list without refresh.
+        """
+        columns = inspect(self.model).columns
+        changes = {
+            id: {
+                field: value
+                for field, value in (
+                    obj_in if isinstance(obj_in, dict) else obj_in.model_dump(exclude_unset=True)
+                ).items()
+                if field in columns and field != 'id'
+            }
+            for id, obj_in in updates.items()
+        }
+        fields = {field for values in changes.values() for field in values}
+        if not fields:
+            return self.load_many(db, ids=list(changes)) if refresh else []
+
+        assignments = {
+            field: case(
+                {
+                    id: literal(values[field], columns[field].type)
+                    for id, values in changes.items()
+                    if field in values
+                },
+                value=self.model.id,
+                else_=getattr(self.model, field),
+            )
+            for field in fields
+        }
+        stmt = (
+            update(self.model)
+            .where(self.model.id.in_(list(changes)))
+            .values(assignments)
+            .execution_options(synchronize_session=False)
+        )
+        db_objs: Optional[list[ModelType]] = None
+        if refresh and db.get_bind().dialect.update_returning:
+            returned = {
+                db_obj.id: db_obj
+                for db_obj in db.scalars(
+                    stmt.returning(self.model), execution_options={'populate_existing': True}
+                )
+            }
+            db_objs = [returned[id] for id in changes if id in returned]
+            for db_obj in db_objs:
+                db.expunge(db_obj)
+        else:
+            db.execute(stmt)
+        db.commit()
+        self.invalidate(changes)
+        if db_objs is None:
+            db_objs = self.load_many(db, ids=list(changes)) if refresh else []
+        return db_objs
+
+    def delete_rows(self, db: Session, *, ids: Collection[Any]) -> list[ModelType]:
+        """
+        DELETE the rows with `ids` and their many-to-many association rows, without committing.
+        Returns the deleted rows.
+        """
+        if not ids:
+            return []
+        ids = list(ids)
+        mapper = inspect(self.model)
+        for relationship in mapper.relationships:
+            if relationship.secondary is not None:
+                for _, secondary_column in relationship.synchronize_pairs:
+                    db.execute(delete(relationship.secondary).where(secondary_column.in_(ids)))
+        stmt = (
+            delete(self.model)
+            .where(self.model.id.in_(ids))
+            .execution_options(synchronize_session=False)
+        )
+        if db.get_bind().dialect.delete_returning:
+            db_objs = list(db.scalars(stmt.returning(self.model)))
+        else:
+            db_objs = self.load_many(db, ids=ids)
+            db.execute(stmt)
+        for db_obj in db_objs:
+            db.expunge(db_obj)
+        return db_objs
+
+    def remove_many(self, db: Session, *, ids: Collection[Any]) -> list[ModelType]:
+        """Delete the rows with `ids` in one statement and commit; returns the deleted rows."""
+        db_objs = self.delete_rows(db, ids=ids)
+        db.commit()
+        self.invalidate(ids, deleted=True)
+        return db_objs
+
+    # Async variants for AsyncSession. Reads are issued directly; writes reuse the sync
+    # implementations through run_sync, which drives them over the async connection
+    # Lazy loads cannot run on the event loop, so templates need a profile covering every
+    # relationship they touch
+    async def get_async(
+        self, db: AsyncSession, id: Any, profile: Optional[str] = None
+    ) -> Optional[ModelType]:
+        return await db.get(self.model, id, options=self.load_options(profile))
+
+    async def get_multi_async(
+        self, db: AsyncSession, *, skip: int = 0, limit: int = 100, profile: Optional[str] = None
+    ) -> list[ModelType]:
+        result = await db.scalars(
+            select(self.model).options(*self.load_options(profile)).offset(skip).limit(limit)
+        )
+        return list(result.all())
+
+    async def create_async(
+        self, db: AsyncSession, *, obj_in: CreateSchemaType, **kwargs: Any
+    ) -> ModelType:
+        return await db.run_sync(self.create, obj_in=obj_in, **kwargs)
+
+    async def update_async(
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: ModelType,
+        obj_in: Union[UpdateSchemaType, dict[str, Any]],
+    ) -> ModelType:
+        return await db.run_sync(self.update, db_obj=db_obj, obj_in=obj_in)
+
+    async def remove_async(self, db: AsyncSession, *, id: Any) -> Optional[ModelType]:
+        return await db.run_sync(self.remove, id=id)
+
+    async def create_many_async(
+        self, db: AsyncSession, *, objs_in: Sequence[CreateSchemaType], refresh: bool = True
+    ) -> list[ModelType]:
+        return await db.run_sync(self.create_many, objs_in=objs_in, refresh=refresh)
+
+    async def update_many_async(
+        self,
+        db: AsyncSession,
+        *,
+        updates: Mapping[Any, Union[UpdateSchemaType, dict[str, Any]]],
+        refresh: bool = True,
+    ) -> list[ModelType]:
+        return await db.run_sync(self.update_many, updates=updates, refresh=refresh)
+
+    async def remove_many_async(
+        self, db: AsyncSession, *, ids: Collection[Any]
+    ) -> list[ModelType]:
+        return await db.run_sync(self.remove_many, ids=ids)
@@ -1,41 +1,139 @@
+from collections.abc import Sequence
+from datetime import datetime, timezone
+from typing import Any, Optional
 
 import ksuid
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.core import payloads
 from app.crud.base import CRUDBase
+from app.crud.crud_activity_rollup import activity_rollup
 from app.models.activity import Activity
 from app.schemas.activity import ActivityCreate
 
 
 class CRUDActivity(CRUDBase[Activity, ActivityCreate, dict]):
-    def create(self, db: Session, *, obj_in: ActivityCreate) -> Activity:
-        # Generate KSUID
-        activity_id = str(ksuid.ksuid())
-
-        db_obj = Activity(
-            id=activity_id,
-            endpoint=obj_in.endpoint,
-            request=obj_in.request,
-            response=obj_in.response,
-            status_code=obj_in.status_code,
-            token_id=obj_in.token_id,
-        )
+    def create_values(self, obj_in: ActivityCreate) -> dict[str, Any]:
+        # Redact and compress payloads according to the configured storage mode
+        request_text, request_compressed = payloads.encode(obj_in.request)
+        response_text, response_compressed = payloads.encode(obj_in.response)
+        values = {
+            # Generate KSUID
+            'id': str(ksuid.ksuid()),
+            'endpoint': obj_in.endpoint,
+            'route': obj_in.route,
+            'request_text': request_text,
+            'request_compressed': request_compressed,
+            'response_text': response_text,
+            'response_compressed': response_compressed,
+            'status_code': obj_in.status_code,
+            'token_id': obj_in.token_id,
+            'duration_ms': obj_in.duration_ms,
+            'db_time_ms': obj_in.db_time_ms,
+            'response_size': obj_in.response_size,
+            # Set here rather than by the server default so every row has microsecond precision
+            # and keyset comparisons on (timestamp, id) stay consistent
+            'timestamp': obj_in.timestamp or datetime.now(timezone.utc),
+        }
+        return values
+
+    def create(self, db: Session, *, obj_in: ActivityCreate, **kwargs: Any) -> Activity:
+        values = self.create_values(obj_in)
+        values.update(kwargs)
+        db_obj = Activity(**values)
         db.add(db_obj)
+        # Keep the rollups in the same transaction as the raw row
+        activity_rollup.record(db, activities=[values])
         db.commit()
         db.refresh(db_obj)
         return db_obj
 
+    def create_many(
+        self, db: Session, *, objs_in: Sequence[ActivityCreate], refresh: bool = True
+    ) -> list[Activity]:
+        """Insert a batch of activities with a single statement and commit."""
+        if not objs_in:
+            return []
+        rows = [self.create_values(obj_in) for obj_in in objs_in]
+        db_objs = self.insert_rows(db, rows=rows, refresh=refresh)
+        activity_rollup.record(db, activities=rows)
+        db.commit()
+        if db_objs is None:
+            db_objs = self.load_many(db, ids=[row['id'] for row in rows])
+        return db_objs
+
     def get_by_token(
         self, db: Session, *, token_id: str, skip: int = 0, limit: int = 100
     ) -> list[Activity]:
         return (
             db.query(Activity)
             .filter(Activity.token_id == token_id)
-            .order_by(Activity.timestamp.desc())
+            .order_by(Activity.timestamp.desc(), Activity.id.desc())
             .offset(skip)
             .limit(limit)
             .all()
         )
 
+    def get_page_before(
+        self,
+        db: Session,
+        *,
+        token_id: Optional[str] = None,
+        endpoint: Optional[str] = None,
+        status_min: Optional[int] = None,
+        status_max: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        before: Optional[tuple[datetime, str]] = None,
+        limit: int = 100,
+    ) -> list[Activity]:
+        """Newest-first keyset page: rows strictly older than `before` (timestamp, id)."""
+        stmt = select(Activity)
+        if token_id is not None:
+            stmt = stmt.where(Activity.token_id == token_id)
+        if endpoint is not None:
+            stmt = stmt.where(Activity.endpoint == endpoint)
+        if status_min is not None:
+            stmt = stmt.where(Activity.status_code >= status_min)
+        if status_max is not None:
+            stmt = stmt.where(Activity.status_code <= status_max)
+        if since is not None:
+            stmt = stmt.where(Activity.timestamp >= since)
+        if until is not None:
+            stmt = stmt.where(Activity.timestamp < until)
+        if before is not None:
+            # (timestamp, id) < before, spelled out so every backend can use the leading
+            # timestamp bound as an index range
+            timestamp, activity_id = before
+            stmt = stmt.where(
+                Activity.timestamp <= timestamp,
+                or_(Activity.timestamp < timestamp, Activity.id < activity_id),
+            )
+        stmt = stmt.order_by(Activity.timestamp.desc(), Activity.id.desc()).limit(limit)
+        return list(db.scalars(stmt))
+
+    async def create_many_async(
+        self, db: AsyncSession, *, objs_in: Sequence[ActivityCreate], refresh: bool = True
+    ) -> list[Activity]:
+        return await db.run_sync(self.create_many, objs_in=objs_in, refresh=refresh)
+
+    async def get_by_token_async(
+        self, db: AsyncSession, *, token_id: str, skip: int = 0, limit: int = 100
+    ) -> list[Activity]:
+        result = await db.scalars(
+            select(Activity)
+            .where(Activity.token_id == token_id)
+            .order_by(Activity.timestamp.desc(), Activity.id.desc())
+            .offset(skip)
+            .limit(limit)
+        )
+        return list(result.all())
+
+    async def get_page_before_async(self, db: AsyncSession, **filters: Any) -> list[Activity]:
+        """Async get_page_before; takes the same keyword filters."""
+        return await db.run_sync(self.get_page_before, **filters)
+
 
 activity = CRUDActivity(Activity)
@@ -0,0 +1,160 @@
+from collections.abc import Iterable, Mapping
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.crud.base import CRUDBase, upsert_insert
+from app.models.activity import Activity
+from app.models.activity_rollup import ActivityRollup
+
+GRANULARITIES = ('minute', 'hour')
+COUNTERS = (
+    'count',
+    'status_1xx',
+    'status_2xx',
+    'status_3xx',
+    'status_4xx',
+    'status_5xx',
+    'duration_ms_sum',
+    'db_time_ms_sum',
+)
+_KEY_COLUMNS = ('token_id', 'granularity', 'bucket', 'endpoint')
+
+
+def truncate(timestamp: datetime, granularity: str) -> datetime:
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(second=0, microsecond=0)
+
+
+def status_counter(status_code: int) -> str:
+    return f'status_{min(max(status_code // 100, 1), 5)}xx'
+
+
+class CRUDActivityRollup(CRUDBase[ActivityRollup, dict, dict]):
+    def record(self, db: Session, *, activities: Iterable[Mapping[Any, Any]]) -> None:
+        """Fold raw activity rows into the rollup counters; the caller commits."""
+        groups: dict[tuple, dict[str, int]] = {}
+        for activity in activities:
+            endpoint = activity['route'] or activity['endpoint']
+            for granularity in GRANULARITIES:
+                bucket = truncate(activity['timestamp'], granularity)
+                key = (activity['token_id'], granularity, bucket, endpoint)
+                counters = groups.setdefault(key, dict.fromkeys(COUNTERS, 0))
+                counters['count'] += 1
+                counters[status_counter(activity['status_code'])] += 1
+                counters['duration_ms_sum'] += activity['duration_ms'] or 0
+                counters['db_time_ms_sum'] += activity['db_time_ms'] or 0
+        if not groups:
+            return
+
+        table = ActivityRollup.__table__
+        stmt = upsert_insert(db, table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(_KEY_COLUMNS),
+            set_={name: table.c[name] + stmt.excluded[name] for name in COUNTERS},
+        )
+        db.execute(
+            stmt, [{**dict(zip(_KEY_COLUMNS, key)), **counters} for key, counters in groups.items()]
+        )
+
+    def rebuild(self, db: Session, *, batch_size: int = 5000) -> int:
+        """
+        Recompute rollups from the raw activities table. Retention archives whole days of raw
+        rows, so only each token's buckets from its oldest remaining activity on are replaced;
+        older buckets, and tokens with no raw rows left, keep their counters.
+        """
+        oldest = select(Activity.token_id, func.min(Activity.timestamp)).group_by(Activity.token_id)
+        for token_id, timestamp in db.execute(oldest):
+            for granularity in GRANULARITIES:
+                db.execute(
+                    delete(ActivityRollup).where(
+                        ActivityRollup.token_id == token_id,
+                        ActivityRollup.granularity == granularity,
+                        ActivityRollup.bucket >= truncate(timestamp, granularity),
+                    )
+                )
+        columns = (
+            Activity.token_id,
+            Activity.timestamp,
+            Activity.endpoint,
+            Activity.route,
+            Activity.status_code,
+            Activity.duration_ms,
+            Activity.db_time_ms,
+        )
+        total = 0
+        result = db.execute(select(*columns).execution_options(yield_per=batch_size))
+        for rows in result.partitions():
+            self.record(db, activities=(row._mapping for row in rows))
+            total += len(rows)
+        db.commit()
+        return total
+
+    def get_series(
+        self,
+        db: Session,
+        *,
+        token_id: str,
+        granularity: str = 'minute',
+        endpoint: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 1000,
+    ) -> list[ActivityRollup]:
+        stmt = select(ActivityRollup).where(
+            ActivityRollup.token_id == token_id, ActivityRollup.granularity == granularity
+        )
+        if endpoint is not None:
+            stmt = stmt.where(ActivityRollup.endpoint == endpoint)
+        if since is not None:
+            stmt = stmt.where(ActivityRollup.bucket >= truncate(since, granularity))
+        if until is not None:
+            stmt = stmt.where(ActivityRollup.bucket < until)
+        stmt = stmt.order_by(ActivityRollup.bucket, ActivityRollup.endpoint).limit(limit)
+        return list(db.scalars(stmt))
+
+    def top_endpoints(
+        self,
+        db: Session,
+        *,
+        token_id: str,
+        granularity: str = 'hour',
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 10,
+    ) -> list[dict[str, Any]]:
+        total = func.sum(ActivityRollup.count)
+        stmt = (
+            select(
+                ActivityRollup.endpoint,
+                total.label('count'),
+                *(func.sum(getattr(ActivityRollup, name)).label(name) for name in COUNTERS[1:]),
+            )
+            .where(ActivityRollup.token_id == token_id, ActivityRollup.granularity == granularity)
+            .group_by(ActivityRollup.endpoint)
+            .order_by(total.desc())
+            .limit(limit)
+        )
+        if since is not None:
+            stmt = stmt.where(ActivityRollup.bucket >= truncate(since, granularity))
+        if until is not None:
+            stmt = stmt.where(ActivityRollup.bucket < until)
+        return [dict(row._mapping) for row in db.execute(stmt)]
+
+    def totals_by_token(self, db: Session) -> dict[str, int]:
+        stmt = (
+            select(ActivityRollup.token_id, func.sum(ActivityRollup.count))
+            .where(ActivityRollup.granularity == 'hour')
+            .group_by(ActivityRollup.token_id)
+        )
+        return dict(db.execute(stmt).tuples().all())
+
+    async def totals_by_token_async(self, db: AsyncSession) -> dict[str, int]:
+        return await db.run_sync(self.totals_by_token)
+
+
+activity_rollup = CRUDActivityRollup(ActivityRollup)
@@ -0,0 +1,171 @@
+from collections.abc import Collection, Iterator, Sequence
+from typing import Any
+
+from sqlalchemy import delete, exists, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.cache import role_cache, user_cache
+from app.core.membership_index import membership_index
+from app.crud.base import upsert_insert
+from app.models.user import user_roles
+
+# Pairs per statement, keeping multi-row VALUES and IN lists under SQLite's bound parameter limit
+CHUNK_SIZE = 500
+
+Pair = tuple[str, str]
+
+
+def _chunks(items: Sequence[Any], size: int = CHUNK_SIZE) -> Iterator[Sequence[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class CRUDMembership:
+    """
+    Role assignments as (user_id, role_id) pairs, read and written directly on user_roles so a
+    change never loads the members of a role or the roles of a user.
+    """
+
+    def has(self, db: Session, *, user_id: str, role_id: str) -> bool:
+        return bool(
+            db.scalar(
+                select(
+                    exists().where(user_roles.c.user_id == user_id, user_roles.c.role_id == role_id)
+                )
+            )
+        )
+
+    def missing(self, db: Session, *, model: Any, ids: Collection[str]) -> set[str]:
+        """The `ids` with no `model` row."""
+        wanted = list(set(ids))
+        found: set[str] = set()
+        for chunk in _chunks(wanted):
+            found.update(db.scalars(select(model.id).where(model.id.in_(chunk))))
+        return set(wanted) - found
+
+    def apply(
+        self, db: Session, *, add: Collection[Pair] = (), remove: Collection[Pair] = ()
+    ) -> tuple[int, int]:
+        """
+        Insert `add` and delete `remove` in one transaction and commit. Pairs already in place
+        are skipped; returns how many were actually added and removed.
+        """
+        rows = [{'user_id': user_id, 'role_id': role_id} for user_id, role_id in set(add)]
+        added = self._insert(db, rows)
+        removed = 0
+        pairs = list(set(remove))
+        for chunk in _chunks(pairs):
+            stmt = delete(user_roles).where(
+                tuple_(user_roles.c.user_id, user_roles.c.role_id).in_(chunk)
+            )
+            removed += db.execute(stmt).rowcount
+        db.commit()
+        membership_index.add(add)
+        membership_index.remove(remove)
+        for user_id, role_id in (*add, *remove):
+            user_cache.invalidate(user_id)
+            role_cache.invalidate(role_id)
+        return added, removed
+
+    def _insert(self, db: Session, rows: Sequence[dict[str, str]]) -> int:
+        added = 0
+        for chunk in _chunks(rows):
+            stmt = upsert_insert(db, user_roles).values(list(chunk)).on_conflict_do_nothing()
+            added += db.execute(stmt).rowcount
+        return added
+
+    def _replace(
+        self, db: Session, *, column: str, other: str, id: str, others: list[str]
+    ) -> tuple[int, int]:
+        # One DELETE of the pairs no longer wanted and an INSERT of the desired ones, so the
+        # current assignments are never read
+        stmt = delete(user_roles).where(user_roles.c[column] == id)
+        if others:
+            stmt = stmt.where(user_roles.c[other].not_in(others))
+        removed = db.execute(stmt).rowcount
+        added = self._insert(db, [{column: id, other: other_id} for other_id in others])
+        db.commit()
+        return added, removed
+
+    def replace_role_users(
+        self, db: Session, *, role_id: str, user_ids: Collection[str]
+    ) -> tuple[int, int]:
+        """Make `user_ids` the exact users of a role and commit; returns added and removed."""
+        desired = sorted(set(user_ids))
+        added, removed = self._replace(
+            db, column='role_id', other='user_id', id=role_id, others=desired
+        )
+        membership_index.replace_role(role_id, desired)
+        role_cache.invalidate(role_id)
+        if removed:
+            # The users that lost the role were not read, so none of them can be singled out
+            user_cache.clear()
+        else:
+            for user_id in desired:
+                user_cache.invalidate(user_id)
+        return added, removed
+
+    def replace_user_roles(
+        self, db: Session, *, user_id: str, role_ids: Collection[str]
+    ) -> tuple[int, int]:
+        """Make `role_ids` the exact roles of a user and commit; returns added and removed."""
+        desired = sorted(set(role_ids))
+        added, removed = self._replace(
+            db, column='user_id', other='role_id', id=user_id, others=desired
+        )
+        membership_index.replace_user(user_id, desired)
+        user_cache.invalidate(user_id)
+        if removed:
+            role_cache.clear()
+        else:
+            for role_id in desired:
+                role_cache.invalidate(role_id)
+        return added, removed
+
+    def remove_user(self, db: Session, *, user_id: str) -> int:
+        """Drop every role assignment of a user and commit."""
+        removed = db.execute(delete(user_roles).where(user_roles.c.user_id == user_id)).rowcount
+        db.commit()
+        membership_index.drop_users([user_id])
+        user_cache.invalidate(user_id)
+        role_cache.clear()
+        return removed
+
+    def select_users(
+        self,
+        db: Session,
+        *,
+        any_of: Collection[str] = (),
+        all_of: Collection[str] = (),
+        none_of: Collection[str] = (),
+        limit: int = 100,
+    ) -> tuple[int, list[str]]:
+        """
+        As MembershipIndex.select, from user_roles: the number of matching users and the first
+        `limit` of their ids.
+        """
+        user_id = user_roles.c.user_id
+        conditions = []
+        if any_of:
+            conditions.append(user_id.in_(select(user_id).where(user_roles.c.role_id.in_(any_of))))
+        for role_id in all_of:
+            conditions.append(user_id.in_(select(user_id).where(user_roles.c.role_id == role_id)))
+        if none_of:
+            conditions.append(
+                user_id.not_in(select(user_id).where(user_roles.c.role_id.in_(none_of)))
+            )
+        matching = select(user_id).where(*conditions).distinct()
+        total = db.scalar(select(func.count()).select_from(matching.subquery())) or 0
+        return total, list(db.scalars(matching.order_by(user_id).limit(limit)))
+
+    async def has_async(self, db: AsyncSession, *, user_id: str, role_id: str) -> bool:
+        return await db.run_sync(self.has, user_id=user_id, role_id=role_id)
+
+    async def apply_async(
+        self, db: AsyncSession, *, add: Collection[Pair] = (), remove: Collection[Pair] = ()
+    ) -> tuple[int, int]:
+        return await db.run_sync(self.apply, add=add, remove=remove)
+
+
+membership = CRUDMembership()
@@ -1,39 +1,66 @@
-from typing import Optional
+from collections.abc import Sequence
+from typing import Any, ClassVar, Optional
 
 import ksuid
-from sqlalchemy.orm import Session
+from sqlalchemy import Select, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 
+from app.core.cache import role_cache, user_cache
 from app.crud.base import CRUDBase
-from app.models.role import Role
-from app.models.user import User
+from app.crud.crud_membership import membership
+from app.crud.crud_role_hierarchy import role_hierarchy
+from app.models.role import Role, role_closure
+from app.models.user import User, user_roles
 from app.schemas.role import RoleCreate, RoleUpdate
 
 
 class CRUDRole(CRUDBase[Role, RoleCreate, RoleUpdate]):
+    loading_profiles: ClassVar[dict[str, tuple[Any, ...]]] = {
+        **CRUDBase.loading_profiles,
+        # User ids only, for RoleWithUsers.user_ids and membership counts
+        'with_user_ids': (selectinload(Role.users).load_only(User.id),),
+    }
+    cache = role_cache
+    # User responses list their role ids
+    related_caches = (user_cache,)
+
     def get_by_name(self, db: Session, *, role_name: str) -> Optional[Role]:
         return db.query(Role).filter(Role.role_name == role_name).first()
 
-    def create(self, db: Session, *, obj_in: RoleCreate) -> Role:
-        # Generate KSUID
-        role_id = str(ksuid.ksuid())
+    def create_values(self, obj_in: RoleCreate) -> dict[str, Any]:
+        return {
+            # Generate KSUID
+            'id': str(ksuid.ksuid()),
+            'role_name': obj_in.role_name,
+            'role_description': obj_in.role_description,
+        }
 
-        db_obj = Role(
-            id=role_id,
-            role_name=obj_in.role_name,
-            role_description=obj_in.role_description,
-        )
+    def create(self, db: Session, *, obj_in: RoleCreate, **kwargs: Any) -> Role:
+        values = self.create_values(obj_in)
+        values.update(kwargs)
+        db_obj = Role(**values)
         db.add(db_obj)
+        db.flush()
+        role_hierarchy.add_roles(db, role_ids=[db_obj.id])
         db.commit()
         db.refresh(db_obj)
         return db_obj
 
-    def update_users(self, db: Session, *, db_obj: Role, user_ids: list[str]) -> Role:
-        # Get users by IDs
-        users = db.query(User).filter(User.id.in_(user_ids)).all()
+    def create_many(
+        self, db: Session, *, objs_in: Sequence[RoleCreate], refresh: bool = True
+    ) -> list[Role]:
+        rows = [self.create_values(obj_in) for obj_in in objs_in]
+        db_objs = self.insert_rows(db, rows=rows, refresh=refresh)
+        role_hierarchy.add_roles(db, role_ids=[row['id'] for row in rows])
+        db.commit()
+        if db_objs is None:
+            db_objs = self.load_many(db, ids=[row['id'] for row in rows])
+        return db_objs
 
+    def update_users(self, db: Session, *, db_obj: Role, user_ids: list[str]) -> Role:
         # Check if any user IDs were not found
-        found_user_ids = {user.id for user in users}
-        missing_user_ids = set(user_ids) - found_user_ids
+        missing_user_ids = membership.missing(db, model=User, ids=user_ids)
         if missing_user_ids:
             from fastapi import HTTPException
 
@@ -41,34 +68,108 @@ class CRUDRole(CRUDBase[Role, RoleCreate, RoleUpdate]):
                 status_code=400, detail=f'Users not found: {", ".join(missing_user_ids)}'
             )
 
-        db_obj.users = users
-        db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        # Write only the assignments that change rather than replacing the collection
+        membership.replace_role_users(db, role_id=db_obj.id, user_ids=user_ids)
+        db.expire(db_obj, ['users'])
         return db_obj
 
     def add_user(self, db: Session, *, db_obj: Role, user: User) -> Role:
-        if user not in db_obj.users:
-            db_obj.users.append(user)
-            db.add(db_obj)
-            db.commit()
-            db.refresh(db_obj)
-        else:
+        added, _ = membership.apply(db, add=[(user.id, db_obj.id)])
+        if not added:
             from fastapi import HTTPException
 
             raise HTTPException(
                 status_code=400,
                 detail=f'User {user.username} already exists in role {db_obj.role_name}',
             )
+        db.expire(db_obj, ['users'])
         return db_obj
 
     def remove_user(self, db: Session, *, db_obj: Role, user: User) -> Role:
-        if user in db_obj.users:
-            db_obj.users.remove(user)
-            db.add(db_obj)
-            db.commit()
-            db.refresh(db_obj)
+        membership.apply(db, remove=[(user.id, db_obj.id)])
+        db.expire(db_obj, ['users'])
         return db_obj
 
+    def get_users_page(
+        self,
+        db: Session,
+        *,
+        role_id: str,
+        order_by: str = 'id',
+        after: Optional[Any] = None,
+        limit: Optional[int] = None,
+    ) -> list[User]:
+        """A role's members ordered by the unique user column `order_by`, as in get_page."""
+        column = getattr(User, order_by)
+        stmt = (
+            select(User)
+            .join(user_roles, user_roles.c.user_id == User.id)
+            .where(user_roles.c.role_id == role_id)
+            .order_by(column)
+        )
+        if after is not None:
+            stmt = stmt.where(column > after)
+        return list(db.scalars(stmt.limit(limit)))
+
+    def count_users(self, db: Session, *, role_id: str) -> int:
+        stmt = select(func.count()).select_from(user_roles).where(user_roles.c.role_id == role_id)
+        return db.scalar(stmt) or 0
+
+    def get_effective_users_page(
+        self,
+        db: Session,
+        *,
+        role_id: str,
+        order_by: str = 'id',
+        after: Optional[Any] = None,
+        limit: Optional[int] = None,
+    ) -> list[User]:
+        """As get_users_page, for users holding the role itself or any role inheriting it."""
+        column = getattr(User, order_by)
+        stmt = select(User).where(User.id.in_(self._effective_user_ids(role_id))).order_by(column)
+        if after is not None:
+            stmt = stmt.where(column > after)
+        return list(db.scalars(stmt.limit(limit)))
+
+    def count_effective_users(self, db: Session, *, role_id: str) -> int:
+        stmt = select(func.count()).select_from(
+            self._effective_user_ids(role_id).distinct().subquery()
+        )
+        return db.scalar(stmt) or 0
+
+    def _effective_user_ids(self, role_id: str) -> Select:
+        # Members of every descendant of the role, itself included
+        return (
+            select(user_roles.c.user_id)
+            .join(role_closure, role_closure.c.descendant_id == user_roles.c.role_id)
+            .where(role_closure.c.ancestor_id == role_id)
+        )
+
+    def get_effective_for_user(self, db: Session, *, user_id: str) -> list[Role]:
+        """Roles a user holds directly or inherits through the hierarchy, by name."""
+        role_ids = (
+            select(role_closure.c.ancestor_id)
+            .join(user_roles, user_roles.c.role_id == role_closure.c.descendant_id)
+            .where(user_roles.c.user_id == user_id)
+        )
+        return list(db.scalars(select(Role).where(Role.id.in_(role_ids)).order_by(Role.role_name)))
+
+    async def get_by_name_async(self, db: AsyncSession, *, role_name: str) -> Optional[Role]:
+        role: Optional[Role] = await db.scalar(
+            select(Role).where(Role.role_name == role_name).limit(1)
+        )
+        return role
+
+    async def update_users_async(
+        self, db: AsyncSession, *, db_obj: Role, user_ids: list[str]
+    ) -> Role:
+        return await db.run_sync(self.update_users, db_obj=db_obj, user_ids=user_ids)
+
+    async def add_user_async(self, db: AsyncSession, *, db_obj: Role, user: User) -> Role:
+        return await db.run_sync(self.add_user, db_obj=db_obj, user=user)
+
+    async def remove_user_async(self, db: AsyncSession, *, db_obj: Role, user: User) -> Role:
+        return await db.run_sync(self.remove_user, db_obj=db_obj, user=user)
+
 
 role = CRUDRole(Role)
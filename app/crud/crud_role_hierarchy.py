@@ -0,0 +1,139 @@
+from collections.abc import Collection
+
+from sqlalchemy import Select, bindparam, delete, exists, literal, select, text, true, update
+from sqlalchemy.orm import Session
+
+from app.crud.base import upsert_insert
+from app.models.role import Role, role_closure
+from app.models.role import role_hierarchy as links
+
+
+class CRUDRoleHierarchy:
+    """
+    Parent/child links between roles. role_closure is updated in the same transaction as every
+    link change, so inheritance queries are a join rather than a walk of the hierarchy.
+    """
+
+    def add_roles(self, db: Session, *, role_ids: Collection[str]) -> None:
+        """Add the self rows of new roles to role_closure, without committing."""
+        if not role_ids:
+            return
+        stmt = upsert_insert(db, role_closure).values(
+            [{'ancestor_id': role_id, 'descendant_id': role_id, 'paths': 1} for role_id in role_ids]
+        )
+        db.execute(stmt.on_conflict_do_nothing())
+
+    def add_missing_roles(self, db: Session) -> int:
+        """Add self rows for roles created before the closure table existed, and commit."""
+        missing = select(Role.id, Role.id.label('descendant_id'), literal(1)).where(
+            ~exists().where(
+                role_closure.c.ancestor_id == Role.id, role_closure.c.descendant_id == Role.id
+            )
+        )
+        if db.scalar(select(missing.exists())) is not True:
+            return 0
+        stmt = role_closure.insert().from_select(['ancestor_id', 'descendant_id', 'paths'], missing)
+        added = db.execute(stmt).rowcount
+        db.commit()
+        return added
+
+    def includes(self, db: Session, *, ancestor_id: str, descendant_id: str) -> bool:
+        """Whether `descendant_id` is `ancestor_id` or inherits from it."""
+        return bool(
+            db.scalar(
+                select(
+                    exists().where(
+                        role_closure.c.ancestor_id == ancestor_id,
+                        role_closure.c.descendant_id == descendant_id,
+                    )
+                )
+            )
+        )
+
+    def get_parents(self, db: Session, *, role_id: str) -> list[Role]:
+        parent_ids = select(links.c.parent_id).where(links.c.child_id == role_id)
+        return list(db.scalars(select(Role).where(Role.id.in_(parent_ids)).order_by(Role.role_name)))
+
+    def _paths(self, parent_id: str, child_id: str) -> Select:
+        # Every (ancestor of parent, descendant of child) pair the link connects, with the number
+        # of routes through it
+        up = role_closure.alias('up')
+        down = role_closure.alias('down')
+        return (
+            select(
+                up.c.ancestor_id, down.c.descendant_id, (up.c.paths * down.c.paths).label('paths')
+            )
+            .select_from(up.join(down, true()))
+            .where(up.c.descendant_id == parent_id, down.c.ancestor_id == child_id)
+        )
+
+    def _connect(self, db: Session, parent_id: str, child_id: str) -> None:
+        stmt = upsert_insert(db, role_closure).from_select(
+            ['ancestor_id', 'descendant_id', 'paths'], self._paths(parent_id, child_id)
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['ancestor_id', 'descendant_id'],
+            set_={'paths': role_closure.c.paths + stmt.excluded.paths},
+        )
+        db.execute(stmt)
+
+    def add_parent(self, db: Session, *, role_id: str, parent_id: str) -> bool:
+        """
+        Make `role_id` inherit `parent_id` and commit; False if it already does directly.
+        Raises ValueError, and writes nothing, if the parent is the role or inherits from it.
+        """
+        if db.get_bind().dialect.name == 'postgresql':
+            # Serialize link changes, so two requests cannot each miss the other's half of a cycle
+            db.execute(text('LOCK TABLE role_hierarchy IN SHARE ROW EXCLUSIVE MODE'))
+        # On SQLite the insert takes the write lock, so the cycle check below sees every link
+        # committed before it and none can be committed until this transaction ends
+        link = upsert_insert(db, links).values(parent_id=parent_id, child_id=role_id)
+        if not db.execute(link.on_conflict_do_nothing()).rowcount:
+            db.rollback()
+            return False
+        if self.includes(db, ancestor_id=role_id, descendant_id=parent_id):
+            db.rollback()
+            raise ValueError('Role inheritance would form a cycle')
+        self.add_roles(db, role_ids=[parent_id, role_id])
+        self._connect(db, parent_id, role_id)
+        db.commit()
+        return True
+
+    def remove_parent(self, db: Session, *, role_id: str, parent_id: str) -> bool:
+        """Stop `role_id` inheriting `parent_id` directly and commit; False if it did not."""
+        unlink = delete(links).where(links.c.parent_id == parent_id, links.c.child_id == role_id)
+        if not db.execute(unlink).rowcount:
+            db.rollback()
+            return False
+        # Routes into the parent and out of the child never use this link (the hierarchy is
+        # acyclic), so the counts read here are unaffected by removing it
+        routes = [
+            {'ancestor': ancestor_id, 'descendant': descendant_id, 'routes': paths}
+            for ancestor_id, descendant_id, paths in db.execute(self._paths(parent_id, role_id))
+        ]
+        if routes:
+            stmt = (
+                update(role_closure)
+                .where(
+                    role_closure.c.ancestor_id == bindparam('ancestor'),
+                    role_closure.c.descendant_id == bindparam('descendant'),
+                )
+                .values(paths=role_closure.c.paths - bindparam('routes'))
+            )
+            db.execute(stmt, routes)
+            db.execute(delete(role_closure).where(role_closure.c.paths <= 0))
+        db.commit()
+        return True
+
+    def rebuild(self, db: Session) -> int:
+        """Recompute role_closure from role_hierarchy and commit; returns the link count."""
+        db.execute(delete(role_closure))
+        self.add_roles(db, role_ids=list(db.scalars(select(Role.id))))
+        pairs = db.execute(select(links.c.parent_id, links.c.child_id)).all()
+        for parent_id, child_id in pairs:
+            self._connect(db, parent_id, child_id)
+        db.commit()
+        return len(pairs)
+
+
+role_hierarchy = CRUDRoleHierarchy()
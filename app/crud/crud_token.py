@@ -1,10 +1,16 @@
 import secrets
-from typing import Optional
+from collections.abc import Collection, Sequence
+from typing import Any, Optional
 
 import ksuid
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.core.cache import token_cache
 from app.crud.base import CRUDBase
+from app.models.activity import Activity
+from app.models.activity_rollup import ActivityRollup
 from app.models.token import Token
 from app.schemas.token import TokenCreate
 
@@ -13,21 +19,66 @@ class CRUDToken(CRUDBase[Token, TokenCreate, dict]):
     def get_by_token(self, db: Session, *, token: str) -> Optional[Token]:
         return db.query(Token).filter(Token.token == token).first()
 
-    def create(self, db: Session) -> Token:
-        # Generate KSUID for token ID
-        token_id = str(ksuid.ksuid())
+    def create_values(self, obj_in: Optional[TokenCreate] = None) -> dict[str, Any]:
+        return {
+            # Generate KSUID for token ID
+            'id': str(ksuid.ksuid()),
+            # Generate 32-character random token
+            'token': secrets.token_urlsafe(24)[:32],
+        }
 
-        # Generate 32-character random token
-        token_value = secrets.token_urlsafe(24)[:32]
-
-        db_obj = Token(
-            id=token_id,
-            token=token_value,
-        )
+    def create(
+        self, db: Session, *, obj_in: Optional[TokenCreate] = None, **kwargs: Any
+    ) -> Token:
+        values = self.create_values(obj_in)
+        values.update(kwargs)
+        db_obj = Token(**values)
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
+        # Drop any negative entry cached for this value
+        token_cache.invalidate(db_obj.token)
+        return db_obj
+
+    def create_many(
+        self, db: Session, *, objs_in: Sequence[TokenCreate], refresh: bool = True
+    ) -> list[Token]:
+        db_objs = super().create_many(db, objs_in=objs_in, refresh=refresh)
+        for db_obj in db_objs:
+            token_cache.invalidate(db_obj.token)
+        return db_objs
+
+    def remove(self, db: Session, *, id: Any) -> Optional[Token]:
+        obj = db.get(Token, id)
+        if obj:
+            # One set-based delete instead of loading every activity for the ORM cascade
+            db.execute(delete(Activity).where(Activity.token_id == id))
+            db.execute(delete(ActivityRollup).where(ActivityRollup.token_id == id))
+            db.delete(obj)
+            db.commit()
+            token_cache.invalidate(obj.token)
+        return obj
+
+    def remove_many(self, db: Session, *, ids: Collection[Any]) -> list[Token]:
+        ids = list(ids)
+        db.execute(delete(Activity).where(Activity.token_id.in_(ids)))
+        db.execute(delete(ActivityRollup).where(ActivityRollup.token_id.in_(ids)))
+        db_objs = self.delete_rows(db, ids=ids)
+        db.commit()
+        for db_obj in db_objs:
+            token_cache.invalidate(db_obj.token)
+        return db_objs
+
+    async def get_by_token_async(self, db: AsyncSession, *, token: str) -> Optional[Token]:
+        db_obj: Optional[Token] = await db.scalar(
+            select(Token).where(Token.token == token).limit(1)
+        )
         return db_obj
 
+    async def create_async(
+        self, db: AsyncSession, *, obj_in: Optional[TokenCreate] = None, **kwargs: Any
+    ) -> Token:
+        return await db.run_sync(self.create, obj_in=obj_in, **kwargs)
+
 
 token = CRUDToken(Token)
@@ -1,32 +1,60 @@
-from typing import Any, Optional, Union
+import asyncio
+from collections import Counter
+from collections.abc import Collection, Mapping, Sequence
+from typing import Any, ClassVar, Optional, Union
 
 import ksuid
-from sqlalchemy import or_
-from sqlalchemy.orm import Session
+from sqlalchemy import func, literal_column, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 
-from app.core.security import generate_password, get_password_hash
+from app.core import user_search
+from app.core.cache import role_cache, user_cache
+from app.core.membership_index import membership_index
+from app.core.security import generate_password, get_password_hash, get_password_hash_async
 from app.crud.base import CRUDBase
+from app.crud.crud_membership import membership
+from app.crud.crud_username_counter import format_username, suffix_of, username_counter
+from app.models.role import Role
 from app.models.user import User, UserStatus
 from app.schemas.user import UserCreate, UserUpdate
 
+# A username collision means the counter fell behind usernames it did not hand out, so the
+# insert is retried this many times with a resynced counter before the IntegrityError is raised
+USERNAME_ATTEMPTS = 3
+
+
+def username_base(first_name: str, last_name: str) -> str:
+    return f'{first_name[0].lower()}{last_name.lower()}'
+
 
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
+    loading_profiles: ClassVar[dict[str, tuple[Any, ...]]] = {
+        **CRUDBase.loading_profiles,
+        # Role ids only, for UserWithRoles.role_ids
+        'with_role_ids': (selectinload(User.roles).load_only(Role.id),),
+    }
+    cache = user_cache
+    # Role responses list their user ids
+    related_caches = (role_cache,)
+
     def get_by_email(self, db: Session, *, email: str) -> Optional[User]:
         return db.query(User).filter(User.email == email).first()
 
     def get_by_username(self, db: Session, *, username: str) -> Optional[User]:
         return db.query(User).filter(User.username == username).first()
 
-    def create(self, db: Session, *, obj_in: UserCreate) -> User:
-        # Generate username
-        base_username = f'{obj_in.first_name[0].lower()}{obj_in.last_name.lower()}'
-        username = base_username
-        counter = 1
-
-        # Check if username exists and append number if needed
-        while self.get_by_username(db, username=username):
-            username = f'{base_username}{counter}'
-            counter += 1
+    def create(
+        self,
+        db: Session,
+        *,
+        obj_in: UserCreate,
+        hashed_password: Optional[str] = None,
+        **kwargs: Any,
+    ) -> User:
+        # Usernames are allocated below, when the user is inserted
+        base_username = username_base(obj_in.first_name, obj_in.last_name)
 
         # Generate display name
         display_name = f'{obj_in.first_name} {obj_in.last_name}'
@@ -34,17 +62,19 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         # Generate KSUID
         user_id = str(ksuid.ksuid())
 
-        # Handle password - use provided or generate
-        if obj_in.password:
-            hashed_password = get_password_hash(obj_in.password)
-        else:
-            # Generate a random password
-            generated_password = generate_password()
-            hashed_password = get_password_hash(generated_password)
+        # Handle password - use provided or generate. Async callers hash obj_in.password with
+        # get_password_hash_async beforehand and pass the result in as hashed_password
+        generated_password = None
+        if hashed_password is None:
+            if obj_in.password:
+                hashed_password = get_password_hash(obj_in.password)
+            else:
+                # Generate a random password
+                generated_password = generate_password()
+                hashed_password = get_password_hash(generated_password)
 
         db_obj = User(
             id=user_id,
-            username=username,
             first_name=obj_in.first_name,
             last_name=obj_in.last_name,
             email=obj_in.email,
@@ -52,12 +82,25 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
             hashed_password=hashed_password,
             status=UserStatus.active,
         )
-        db.add(db_obj)
-        db.commit()
+        # Extra column values, as in CRUDBase.create
+        for field, value in kwargs.items():
+            setattr(db_obj, field, value)
+        for attempt in range(USERNAME_ATTEMPTS):
+            db_obj.username = self.allocate_usernames(
+                db, bases=[base_username], resync=attempt > 0
+            )[0]
+            db.add(db_obj)
+            try:
+                db.commit()
+                break
+            except IntegrityError:
+                db.rollback()
+                if attempt == USERNAME_ATTEMPTS - 1:
+                    raise
         db.refresh(db_obj)
 
         # If password was generated, temporarily store it in a non-persisted attribute
-        if not obj_in.password:
+        if generated_password is not None:
             db_obj.generated_password = generated_password
 
         return db_obj
@@ -75,56 +118,346 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
             del update_data['password']  # Always remove password from update_data
 
         # Handle username update if names change
+        base_username = None
         if 'first_name' in update_data or 'last_name' in update_data:
             first_name = update_data.get('first_name', db_obj.first_name)
             last_name = update_data.get('last_name', db_obj.last_name)
 
-            # Generate new username
-            base_username = f'{first_name[0].lower()}{last_name.lower()}'
-            username = base_username
-            counter = 1
-
-            # Check if username exists and append number if needed (excluding current user)
-            while True:
-                existing_user = self.get_by_username(db, username=username)
-                if not existing_user or existing_user.id == db_obj.id:
-                    break
-                username = f'{base_username}{counter}'
-                counter += 1
+            # Keep the current username if it already derives from the new names
+            base_username = username_base(first_name, last_name)
+            if suffix_of(db_obj.username, base_username) is not None:
+                base_username = None
 
-            update_data['username'] = username
+        for attempt in range(USERNAME_ATTEMPTS):
+            if base_username is not None:
+                update_data['username'] = self.allocate_usernames(
+                    db, bases=[base_username], resync=attempt > 0
+                )[0]
 
-        # Update the user
-        for field, value in update_data.items():
-            setattr(db_obj, field, value)
+            # Update the user
+            for field, value in update_data.items():
+                setattr(db_obj, field, value)
 
-        db.add(db_obj)
-        db.commit()
+            db.add(db_obj)
+            try:
+                db.commit()
+                break
+            except IntegrityError:
+                db.rollback()
+                if base_username is None or attempt == USERNAME_ATTEMPTS - 1:
+                    raise
         db.refresh(db_obj)
+        self.invalidate([db_obj.id])
         return db_obj
 
-    def search(self, db: Session, *, query: str, skip: int = 0, limit: int = 100) -> list[User]:
-        return (
-            db.query(User)
-            .filter(
-                or_(
-                    User.username.contains(query),
-                    User.first_name.contains(query),
-                    User.last_name.contains(query),
-                    User.email.contains(query),
+    def get_existing_emails(self, db: Session, *, emails: Collection[str]) -> set[str]:
+        """The subset of `emails` already registered, in a single query."""
+        if not emails:
+            return set()
+        return set(db.scalars(select(User.email).where(User.email.in_(emails))))
+
+    def allocate_usernames(
+        self, db: Session, *, bases: Sequence[str], resync: bool = False
+    ) -> list[str]:
+        """
+        Hand out a unique username for each base from the per-base counters, with one statement
+        per distinct base however many suffixes are already taken; the caller commits.
+        """
+        next_suffix = {
+            base: username_counter.reserve(db, base=base, count=count, resync=resync)
+            for base, count in Counter(bases).items()
+        }
+        usernames = []
+        for base in bases:
+            usernames.append(format_username(base, next_suffix[base]))
+            next_suffix[base] += 1
+        return usernames
+
+    def create_many(
+        self,
+        db: Session,
+        *,
+        objs_in: Sequence[UserCreate],
+        refresh: bool = True,
+        hashed_passwords: Optional[Sequence[str]] = None,
+    ) -> list[User]:
+        """
+        Insert a batch of users in one transaction, in input order. Emails are assumed to be
+        checked already. Without `hashed_passwords`, passwords are hashed or generated here as in
+        create.
+        """
+        if not objs_in:
+            return []
+        generated_passwords: list[Optional[str]] = [None] * len(objs_in)
+        if hashed_passwords is None:
+            passwords = [obj_in.password or generate_password() for obj_in in objs_in]
+            generated_passwords = [
+                None if obj_in.password else password
+                for obj_in, password in zip(objs_in, passwords)
+            ]
+            hashed_passwords = [get_password_hash(password) for password in passwords]
+        bases = [username_base(obj_in.first_name, obj_in.last_name) for obj_in in objs_in]
+        for attempt in range(USERNAME_ATTEMPTS):
+            usernames = self.allocate_usernames(db, bases=bases, resync=attempt > 0)
+            rows = [
+                {
+                    'id': str(ksuid.ksuid()),
+                    'username': username,
+                    'first_name': obj_in.first_name,
+                    'last_name': obj_in.last_name,
+                    'email': obj_in.email,
+                    'display_name': f'{obj_in.first_name} {obj_in.last_name}',
+                    'hashed_password': hashed_password,
+                    'status': UserStatus.active,
+                }
+                for obj_in, username, hashed_password in zip(objs_in, usernames, hashed_passwords)
+            ]
+            try:
+                db_objs = self.insert_rows(db, rows=rows, refresh=refresh)
+                db.commit()
+                break
+            except IntegrityError:
+                db.rollback()
+                if attempt == USERNAME_ATTEMPTS - 1:
+                    raise
+        if db_objs is None:
+            db_objs = self.load_many(db, ids=[row['id'] for row in rows])
+        for db_obj, generated_password in zip(db_objs, generated_passwords):
+            if generated_password is not None:
+                db_obj.generated_password = generated_password
+        return db_objs
+
+    def update_many(
+        self,
+        db: Session,
+        *,
+        updates: Mapping[Any, Union[UserUpdate, dict[str, Any]]],
+        refresh: bool = True,
+    ) -> list[User]:
+        """
+        update for many users in one statement: passwords are hashed and renamed users get a new
+        username, as in update.
+        """
+        changes = {}
+        for id, obj_in in updates.items():
+            values = (
+                dict(obj_in) if isinstance(obj_in, dict) else obj_in.model_dump(exclude_unset=True)
+            )
+            password = values.pop('password', None)
+            if password:
+                values['hashed_password'] = get_password_hash(password)
+            changes[id] = values
+
+        renamed = [
+            id for id, values in changes.items() if 'first_name' in values or 'last_name' in values
+        ]
+        bases = {}
+        if renamed:
+            current = db.execute(
+                select(User.id, User.username, User.first_name, User.last_name).where(
+                    User.id.in_(renamed)
                 )
             )
-            .offset(skip)
-            .limit(limit)
-            .all()
+            for id, username, first_name, last_name in current:
+                values = changes[id]
+                base = username_base(
+                    values.get('first_name', first_name), values.get('last_name', last_name)
+                )
+                # Keep the current username if it already derives from the new names
+                if suffix_of(username, base) is None:
+                    bases[id] = base
+        # Username collisions are retried by reallocating from resynced counters, as in update
+        for attempt in range(USERNAME_ATTEMPTS):
+            if bases:
+                usernames = self.allocate_usernames(
+                    db, bases=list(bases.values()), resync=attempt > 0
+                )
+                for id, username in zip(bases, usernames):
+                    changes[id]['username'] = username
+            try:
+                db_objs = super().update_many(db, updates=changes, refresh=refresh)
+                break
+            except IntegrityError:
+                db.rollback()
+                if not bases or attempt == USERNAME_ATTEMPTS - 1:
+                    raise
+        return db_objs
+
+    def _search_filter(self, query: str) -> Any:
+        return or_(
+            User.username.contains(query),
+            User.first_name.contains(query),
+            User.last_name.contains(query),
+            User.email.contains(query),
         )
 
-    def remove_from_all_roles(self, db: Session, *, user: User) -> None:
-        # Remove user from all roles they are currently assigned to
-        for role in user.roles:
-            role.users.remove(user)
-            db.add(role)
+    def search(
+        self,
+        db: Session,
+        *,
+        query: str,
+        skip: int = 0,
+        limit: int = 100,
+        profile: Optional[str] = None,
+    ) -> list[User]:
+        """
+        Users matching every word of `query` as a prefix, best match first, from the full-text
+        index; without one, a substring scan ordered by username.
+        """
+        stmt = select(User).options(*self.load_options(profile))
+        if user_search.enabled:
+            expression = user_search.match_expression(query)
+            if expression is None:
+                return []
+            stmt = (
+                stmt.join(
+                    user_search.users_fts,
+                    user_search.users_fts.c.rowid == literal_column('users.rowid'),
+                )
+                .where(user_search.matches(expression))
+                .order_by(user_search.users_fts.c.rank, User.id)
+            )
+        else:
+            stmt = stmt.where(self._search_filter(query)).order_by(User.username)
+        return list(db.scalars(stmt.offset(skip).limit(limit)))
+
+    def count_search(self, db: Session, *, query: str) -> int:
+        if user_search.enabled:
+            expression = user_search.match_expression(query)
+            if expression is None:
+                return 0
+            stmt = (
+                select(func.count())
+                .select_from(user_search.users_fts)
+                .where(user_search.matches(expression))
+            )
+        else:
+            stmt = select(func.count()).select_from(User).where(self._search_filter(query))
+        return db.scalar(stmt) or 0
+
+    def remove(self, db: Session, *, id: str) -> Optional[User]:
+        # Two statements in one transaction: the user's user_roles rows, then the user
+        deleted = self.delete_rows(db, ids=[id])
         db.commit()
+        self.invalidate([id], deleted=True)
+        membership_index.drop_users([id])
+        return deleted[0] if deleted else None
+
+    def remove_many(self, db: Session, *, ids: Collection[str]) -> list[User]:
+        deleted = super().remove_many(db, ids=ids)
+        membership_index.drop_users(user.id for user in deleted)
+        return deleted
+
+    def remove_from_all_roles(self, db: Session, *, user: User) -> None:
+        # Remove user from all roles they are currently assigned to, without loading them
+        membership.remove_user(db, user_id=user.id)
+        db.expire(user, ['roles'])
+
+    # Async variants; passwords are hashed on the hashing pool before the sync implementation
+    # runs, since run_sync executes on the event loop
+    async def get_by_email_async(self, db: AsyncSession, *, email: str) -> Optional[User]:
+        user: Optional[User] = await db.scalar(select(User).where(User.email == email).limit(1))
+        return user
+
+    async def get_by_username_async(self, db: AsyncSession, *, username: str) -> Optional[User]:
+        user: Optional[User] = await db.scalar(
+            select(User).where(User.username == username).limit(1)
+        )
+        return user
+
+    async def create_async(
+        self,
+        db: AsyncSession,
+        *,
+        obj_in: UserCreate,
+        hashed_password: Optional[str] = None,
+        **kwargs: Any,
+    ) -> User:
+        generated_password = None
+        if hashed_password is None:
+            password = obj_in.password
+            if not password:
+                password = generated_password = generate_password()
+            hashed_password = await get_password_hash_async(password)
+        db_obj = await db.run_sync(
+            self.create, obj_in=obj_in, hashed_password=hashed_password, **kwargs
+        )
+        if generated_password:
+            db_obj.generated_password = generated_password
+        return db_obj
+
+    async def update_async(
+        self, db: AsyncSession, *, db_obj: User, obj_in: Union[UserUpdate, dict[str, Any]]
+    ) -> User:
+        update_data = obj_in if isinstance(obj_in, dict) else obj_in.model_dump(exclude_unset=True)
+        password = update_data.get('password')
+        if 'password' in update_data:
+            update_data = {key: value for key, value in update_data.items() if key != 'password'}
+        if password:
+            update_data['hashed_password'] = await get_password_hash_async(password)
+        return await db.run_sync(self.update, db_obj=db_obj, obj_in=update_data)
+
+    async def get_existing_emails_async(
+        self, db: AsyncSession, *, emails: Collection[str]
+    ) -> set[str]:
+        return await db.run_sync(self.get_existing_emails, emails=emails)
+
+    async def create_many_async(
+        self,
+        db: AsyncSession,
+        *,
+        objs_in: Sequence[UserCreate],
+        refresh: bool = True,
+        hashed_passwords: Optional[Sequence[str]] = None,
+    ) -> list[User]:
+        if hashed_passwords is None:
+            passwords = [obj_in.password or generate_password() for obj_in in objs_in]
+            generated_passwords = [
+                None if obj_in.password else password
+                for obj_in, password in zip(objs_in, passwords)
+            ]
+            hashed_passwords = await asyncio.gather(
+                *(get_password_hash_async(password) for password in passwords)
+            )
+            db_objs = await db.run_sync(
+                self.create_many,
+                objs_in=objs_in,
+                refresh=refresh,
+                hashed_passwords=hashed_passwords,
+            )
+            for db_obj, generated_password in zip(db_objs, generated_passwords):
+                if generated_password is not None:
+                    db_obj.generated_password = generated_password
+            return db_objs
+        return await db.run_sync(
+            self.create_many, objs_in=objs_in, refresh=refresh, hashed_passwords=hashed_passwords
+        )
+
+    async def update_many_async(
+        self,
+        db: AsyncSession,
+        *,
+        updates: Mapping[Any, Union[UserUpdate, dict[str, Any]]],
+        refresh: bool = True,
+    ) -> list[User]:
+        changes = {}
+        for id, obj_in in updates.items():
+            values = (
+                dict(obj_in) if isinstance(obj_in, dict) else obj_in.model_dump(exclude_unset=True)
+            )
+            password = values.pop('password', None)
+            if password:
+                values['hashed_password'] = await get_password_hash_async(password)
+            changes[id] = values
+        return await db.run_sync(self.update_many, updates=changes, refresh=refresh)
+
+    async def search_async(
+        self, db: AsyncSession, *, query: str, skip: int = 0, limit: int = 100
+    ) -> list[User]:
+        return await db.run_sync(self.search, query=query, skip=skip, limit=limit)
+
+    async def remove_from_all_roles_async(self, db: AsyncSession, *, user: User) -> None:
+        await db.run_sync(self.remove_from_all_roles, user=user)
 
 
 user = CRUDUser(User)
@@ -0,0 +1,69 @@
+from typing import Optional
+
+from sqlalchemy import case, select, update
+from sqlalchemy.orm import Session
+
+from app.crud.base import CRUDBase, upsert_insert
+from app.models.user import User
+from app.models.username_counter import UsernameCounter
+
+
+def format_username(base: str, suffix: int) -> str:
+    return f'{base}{suffix}' if suffix else base
+
+
+def suffix_of(username: str, base: str) -> Optional[int]:
+    """The suffix `username` was allocated with for `base`, or None if it is not one of them."""
+    if not username.startswith(base):
+        return None
+    suffix = username[len(base):]
+    if not suffix:
+        return 0
+    return int(suffix) if suffix.isdigit() else None
+
+
+class CRUDUsernameCounter(CRUDBase[UsernameCounter, dict, dict]):
+    def highest_suffix(self, db: Session, *, base: str) -> int:
+        """Highest suffix among existing `base`, `base1`, `base2`... usernames, or -1 if none."""
+        # Suffixes are digits, which sort below ':', so this is an index range scan
+        usernames = db.scalars(
+            select(User.username).where(User.username >= base, User.username < f'{base}:')
+        )
+        suffixes = (suffix_of(username, base) for username in usernames)
+        return max((suffix for suffix in suffixes if suffix is not None), default=-1)
+
+    def reserve(self, db: Session, *, base: str, count: int = 1, resync: bool = False) -> int:
+        """
+        Reserve `count` consecutive suffixes for `base` and return the first; the caller commits.
+        `resync` moves the counter past usernames it did not hand out, after a collision.
+        """
+        counter = UsernameCounter.__table__.c.last_suffix
+        if not resync:
+            # Row-locking increment, so concurrent callers always get disjoint suffixes
+            last: Optional[int] = db.scalar(
+                update(UsernameCounter)
+                .where(UsernameCounter.base == base)
+                .values(last_suffix=counter + count)
+                .returning(counter)
+            )
+            if last is not None:
+                return last - count + 1
+
+        # First use of this base: start after the highest suffix already taken
+        stmt = upsert_insert(db, UsernameCounter.__table__).values(
+            base=base, last_suffix=self.highest_suffix(db, base=base) + count
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['base'],
+            set_={
+                'last_suffix': case(
+                    (stmt.excluded.last_suffix > counter + count, stmt.excluded.last_suffix),
+                    else_=counter + count,
+                )
+            },
+        ).returning(counter)
+        last_suffix: int = db.scalar(stmt)
+        return last_suffix - count + 1
+
+
+username_counter = CRUDUsernameCounter(UsernameCounter)
@@ -1,19 +1,53 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 
+from app import crud
 from app.api.ui import router as ui_router
 from app.api.v1.api import api_router
+from app.core import table_versions, user_search
+from app.core.activity_sink import activity_sink
 from app.core.config import settings
-from app.core.database import Base, engine
-from app.core.middleware import APIActivityMiddleware
+from app.core.database import Base, SessionLocal, async_engine, async_read_engine, engine
+from app.core.membership_index import membership_index
+from app.core.metrics import registry
+from app.core.middleware import APIActivityMiddleware, ReadYourWritesMiddleware
+from app.core.read_routing import replica_enabled
+from app.core.retention import retention_worker
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+user_search.install(engine)
+table_versions.install(engine)
+with SessionLocal() as db:
+    crud.role_hierarchy.add_missing_roles(db)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    if settings.membership_index_enabled:
+        with SessionLocal() as db:
+            membership_index.load(db)
+    activity_sink.start()
+    retention_worker.start()
+    yield
+    retention_worker.stop()
+    # Flush queued activity records before shutting down
+    activity_sink.stop()
+    # Close pooled async connections; aiosqlite keeps a worker thread open per connection
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
+
 
 app = FastAPI(
     title=settings.project_name,
     openapi_url=f'{settings.api_v1_str}/openapi.json',
+    lifespan=lifespan,
 )
 
 # Set CORS - allowing all origins for development
@@ -24,11 +58,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=['*'],
     allow_headers=['*'],
+    # Conditional GET validators and pagination headers on list responses
+    expose_headers=['ETag', 'Last-Modified', 'Link', 'X-Next-Cursor', 'X-Total-Count'],
 )
 
 # Add API activity tracking middleware
 app.add_middleware(APIActivityMiddleware)
 
+# Send a client's reads to the primary right after it writes, when reads use a replica
+if replica_enabled:
+    app.add_middleware(ReadYourWritesMiddleware)
+
 # Mount static files
 app.mount('/static', StaticFiles(directory='app/static'), name='static')
 
@@ -40,3 +80,9 @@ app.include_router(ui_router)
 @app.get('/health')
 def health_check():
     return {'status': 'healthy'}
+
+
+@app.get('/metrics', response_class=PlainTextResponse, include_in_schema=False)
+def metrics() -> PlainTextResponse:
+    """Prometheus text exposition of in-process metrics."""
+    return PlainTextResponse(registry.render(), media_type='text/plain; version=0.0.4')
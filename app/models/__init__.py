@@ -1,6 +1,20 @@
 from app.models.activity import Activity
-from app.models.role import Role
+from app.models.activity_rollup import ActivityRollup
+from app.models.role import Role, role_closure, role_hierarchy
+from app.models.table_version import TableVersion
 from app.models.token import Token
 from app.models.user import User, user_roles
+from app.models.username_counter import UsernameCounter
 
-__all__ = ['Activity', 'Role', 'Token', 'User', 'user_roles']
+__all__ = [
+    'Activity',
+    'ActivityRollup',
+    'Role',
+    'TableVersion',
+    'Token',
+    'User',
+    'UsernameCounter',
+    'role_closure',
+    'role_hierarchy',
+    'user_roles',
+]
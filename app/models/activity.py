@@ -1,20 +1,62 @@
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
-from sqlalchemy.orm import relationship
+from datetime import datetime
+from typing import TYPE_CHECKING, Optional
+
+from sqlalchemy import (
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+)
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
+from app.core import payloads
 from app.core.database import Base
 
+if TYPE_CHECKING:
+    from app.models.token import Token
+
 
 class Activity(Base):
     __tablename__ = 'activities'
+    # Keyset pagination walks (timestamp, id), optionally within a token or endpoint
+    __table_args__ = (
+        Index('ix_activities_timestamp_id', 'timestamp', 'id'),
+        Index('ix_activities_token_id_timestamp_id', 'token_id', 'timestamp', 'id'),
+        Index('ix_activities_endpoint_timestamp_id', 'endpoint', 'timestamp', 'id'),
+    )
 
-    id = Column(String, primary_key=True, index=True)
-    endpoint = Column(String, nullable=False)
-    timestamp = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
-    request = Column(Text, nullable=True)
-    response = Column(Text, nullable=True)
-    status_code = Column(Integer, nullable=False)
-    token_id = Column(String, ForeignKey('tokens.id'), nullable=False)
+    id: Mapped[str] = mapped_column(String, primary_key=True, index=True)
+    endpoint: Mapped[str] = mapped_column(String, nullable=False)
+    # Matched route template, e.g. 'GET /api/v1/users/{user_id}'
+    route: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    timestamp: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    # Payloads are stored either as text or, above the size threshold, zlib-compressed
+    request_text: Mapped[Optional[str]] = mapped_column('request', Text, nullable=True)
+    request_compressed: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+    response_text: Mapped[Optional[str]] = mapped_column('response', Text, nullable=True)
+    response_compressed: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+    status_code: Mapped[int] = mapped_column(Integer, nullable=False)
+    duration_ms: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    db_time_ms: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    response_size: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    token_id: Mapped[str] = mapped_column(
+        String, ForeignKey('tokens.id', ondelete='CASCADE'), nullable=False
+    )
 
     # Relationships
-    token = relationship('Token', back_populates='activities')
+    token: Mapped['Token'] = relationship('Token', back_populates='activities')
+
+    @property
+    def request(self) -> Optional[str]:
+        return payloads.decode(self.request_text, self.request_compressed)
+
+    @property
+    def response(self) -> Optional[str]:
+        return payloads.decode(self.response_text, self.response_compressed)
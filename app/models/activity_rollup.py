@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, Float, ForeignKey, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.database import Base
+
+
+class ActivityRollup(Base):
+    """Per token, route and time bucket activity counters maintained on the write path."""
+
+    __tablename__ = 'activity_rollups'
+
+    token_id: Mapped[str] = mapped_column(
+        String, ForeignKey('tokens.id', ondelete='CASCADE'), primary_key=True
+    )
+    granularity: Mapped[str] = mapped_column(String, primary_key=True)  # 'minute' or 'hour'
+    bucket: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    endpoint: Mapped[str] = mapped_column(String, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    status_1xx: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    status_2xx: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    status_3xx: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    status_4xx: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    status_5xx: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    duration_ms_sum: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    db_time_ms_sum: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
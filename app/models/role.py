@@ -1,16 +1,47 @@
-from sqlalchemy import Column, String
-from sqlalchemy.orm import relationship
+from typing import TYPE_CHECKING, Optional
+
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, Table
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.database import Base
 from app.models.user import user_roles
 
+if TYPE_CHECKING:
+    from app.models.user import User
+
+# Role inheritance: a child role includes its parents, so holding the child (say 'admin')
+# effectively grants every ancestor ('editor', 'viewer')
+role_hierarchy = Table(
+    'role_hierarchy',
+    Base.metadata,
+    Column('parent_id', String, ForeignKey('roles.id'), primary_key=True),
+    Column('child_id', String, ForeignKey('roles.id'), primary_key=True),
+    Index('ix_role_hierarchy_child_id', 'child_id'),
+)
+
+# Transitive closure of role_hierarchy, with a row pairing every role with itself. `paths`
+# counts the distinct routes from ancestor to descendant, so unlinking one side of a diamond
+# keeps the pair while another route remains
+role_closure = Table(
+    'role_closure',
+    Base.metadata,
+    Column('ancestor_id', String, ForeignKey('roles.id'), primary_key=True),
+    Column('descendant_id', String, ForeignKey('roles.id'), primary_key=True),
+    Column('paths', Integer, nullable=False),
+    # The primary key serves descendants of a role; this serves ancestors
+    Index('ix_role_closure_descendant_id_ancestor_id', 'descendant_id', 'ancestor_id'),
+)
+
 
 class Role(Base):
     __tablename__ = 'roles'
 
-    id = Column(String, primary_key=True, index=True)
-    role_name = Column(String, unique=True, index=True, nullable=False)
-    role_description = Column(String, nullable=True)
+    id: Mapped[str] = mapped_column(String, primary_key=True, index=True)
+    role_name: Mapped[str] = mapped_column(String, unique=True, index=True, nullable=False)
+    role_description: Mapped[Optional[str]] = mapped_column(String, nullable=True)
 
     # Relationships
-    users = relationship('User', secondary=user_roles, back_populates='roles', lazy='selectin')
+    # Lazy; readers choose eager loading per query through the CRUD loading profiles
+    users: Mapped[list['User']] = relationship(
+        'User', secondary=user_roles, back_populates='roles'
+    )
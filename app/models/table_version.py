@@ -0,0 +1,16 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.database import Base
+
+
+class TableVersion(Base):
+    """Change counter per table, bumped by every committed write; backs ETags on reads."""
+
+    __tablename__ = 'table_versions'
+
+    table_name: Mapped[str] = mapped_column(String, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
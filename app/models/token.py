@@ -1,14 +1,22 @@
-from sqlalchemy import Column, String
-from sqlalchemy.orm import relationship
+from typing import TYPE_CHECKING
+
+from sqlalchemy import String
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.database import Base
 
+if TYPE_CHECKING:
+    from app.models.activity import Activity
+
 
 class Token(Base):
     __tablename__ = 'tokens'
 
-    id = Column(String, primary_key=True, index=True)
-    token = Column(String, unique=True, index=True, nullable=False)
+    id: Mapped[str] = mapped_column(String, primary_key=True, index=True)
+    token: Mapped[str] = mapped_column(String, unique=True, index=True, nullable=False)
 
     # Relationships
-    activities = relationship('Activity', back_populates='token', cascade='all, delete-orphan')
+    # Activities are deleted set-based by CRUDToken.remove rather than loaded and cascaded
+    activities: Mapped[list['Activity']] = relationship(
+        'Activity', back_populates='token', cascade='all, delete-orphan', passive_deletes=True
+    )
@@ -1,10 +1,14 @@
 import enum
+from typing import TYPE_CHECKING
 
-from sqlalchemy import Column, Enum, ForeignKey, String, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Enum, ForeignKey, Index, String, Table
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.database import Base
 
+if TYPE_CHECKING:
+    from app.models.role import Role
+
 
 class UserStatus(str, enum.Enum):
     active = "active"
@@ -17,20 +21,27 @@ user_roles = Table(
     Base.metadata,
     Column('user_id', String, ForeignKey('users.id'), primary_key=True),
     Column('role_id', String, ForeignKey('roles.id'), primary_key=True),
+    # The primary key leads with user_id; this serves membership lookups by role
+    Index('ix_user_roles_role_id_user_id', 'role_id', 'user_id'),
 )
 
 
 class User(Base):
     __tablename__ = 'users'
 
-    id = Column(String, primary_key=True, index=True)
-    username = Column(String, unique=True, index=True, nullable=False)
-    first_name = Column(String, nullable=False)
-    last_name = Column(String, nullable=False)
-    email = Column(String, unique=True, index=True, nullable=False)
-    display_name = Column(String, nullable=False)
-    hashed_password = Column(String, nullable=False)
-    status = Column(Enum(UserStatus), nullable=False, default=UserStatus.active)
+    id: Mapped[str] = mapped_column(String, primary_key=True, index=True)
+    username: Mapped[str] = mapped_column(String, unique=True, index=True, nullable=False)
+    first_name: Mapped[str] = mapped_column(String, nullable=False)
+    last_name: Mapped[str] = mapped_column(String, nullable=False)
+    email: Mapped[str] = mapped_column(String, unique=True, index=True, nullable=False)
+    display_name: Mapped[str] = mapped_column(String, nullable=False)
+    hashed_password: Mapped[str] = mapped_column(String, nullable=False)
+    status: Mapped[UserStatus] = mapped_column(
+        Enum(UserStatus), nullable=False, default=UserStatus.active
+    )
 
     # Relationships
-    roles = relationship('Role', secondary=user_roles, back_populates='users', lazy='selectin')
+    # Lazy; readers choose eager loading per query through the CRUD loading profiles
+    roles: Mapped[list['Role']] = relationship(
+        'Role', secondary=user_roles, back_populates='users'
+    )
@@ -0,0 +1,13 @@
+from sqlalchemy import Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.database import Base
+
+
+class UsernameCounter(Base):
+    """Highest numeric suffix handed out per base username; suffix 0 is the bare base."""
+
+    __tablename__ = 'username_counters'
+
+    base: Mapped[str] = mapped_column(String, primary_key=True)
+    last_suffix: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -1,17 +1,55 @@
-from app.schemas.activity import Activity
-from app.schemas.relationships import RoleWithUsers, UserWithRoles
+from app.schemas.activity import (
+    Activity,
+    ActivityPage,
+    ActivityRollup,
+    EndpointActivity,
+    RouteLatency,
+)
+from app.schemas.relationships import (
+    MembershipChange,
+    MembershipCheck,
+    MembershipQuery,
+    MembershipUpdate,
+    RoleUsersReplace,
+    RoleWithUsers,
+    UserRolesReplace,
+    UserWithRoles,
+)
 from app.schemas.role import Role, RoleCreate, RoleUpdate
-from app.schemas.user import User, UserCreate, UserCreateResponse, UserUpdate
+from app.schemas.user import (
+    User,
+    UserBulkDelete,
+    UserBulkDeleteResponse,
+    UserCreate,
+    UserCreateResponse,
+    UserImportResponse,
+    UserImportResult,
+    UserUpdate,
+)
 
 __all__ = [
     'Activity',
+    'ActivityPage',
+    'ActivityRollup',
+    'EndpointActivity',
+    'MembershipChange',
+    'MembershipCheck',
+    'MembershipQuery',
+    'MembershipUpdate',
     'Role',
     'RoleCreate',
     'RoleUpdate',
+    'RoleUsersReplace',
     'RoleWithUsers',
+    'RouteLatency',
     'User',
+    'UserBulkDelete',
+    'UserBulkDeleteResponse',
     'UserCreate',
     'UserCreateResponse',
+    'UserImportResponse',
+    'UserImportResult',
+    'UserRolesReplace',
     'UserUpdate',
     'UserWithRoles',
 ]
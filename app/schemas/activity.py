@@ -13,10 +13,56 @@ class ActivityBase(BaseModel):
 
 class ActivityCreate(ActivityBase):
     token_id: str
+    route: Optional[str] = None
+    timestamp: Optional[datetime] = None
+    duration_ms: Optional[float] = None
+    db_time_ms: Optional[float] = None
+    response_size: Optional[int] = None
 
 
 class Activity(ActivityBase):
     id: str
     timestamp: datetime
     token_id: str
+    duration_ms: Optional[float] = None
+    db_time_ms: Optional[float] = None
+    response_size: Optional[int] = None
     model_config = ConfigDict(from_attributes=True)
+
+
+class ActivityPage(BaseModel):
+    items: list[Activity]
+    next_cursor: Optional[str] = None
+
+
+class ActivityCounts(BaseModel):
+    count: int
+    status_1xx: int = 0
+    status_2xx: int = 0
+    status_3xx: int = 0
+    status_4xx: int = 0
+    status_5xx: int = 0
+    duration_ms_sum: float = 0.0
+    db_time_ms_sum: float = 0.0
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ActivityRollup(ActivityCounts):
+    token_id: str
+    granularity: str
+    bucket: datetime
+    endpoint: str
+
+
+class EndpointActivity(ActivityCounts):
+    endpoint: str
+
+
+class RouteLatency(BaseModel):
+    route: str
+    count: int
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
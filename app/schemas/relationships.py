@@ -2,7 +2,7 @@
 Schemas for relationships between entities to avoid circular imports.
 """
 
-from pydantic import Field
+from pydantic import BaseModel, Field
 
 from app.schemas.role import RoleInDBBase
 from app.schemas.user import UserInDBBase
@@ -15,4 +15,41 @@ class UserWithRoles(UserInDBBase):
 
 class RoleWithUsers(RoleInDBBase):
     """Role schema with its assigned users."""
-    user_ids: list[str] = Field(default_factory=list)
\ No newline at end of file
+    user_ids: list[str] = Field(default_factory=list)
+
+class MembershipUpdate(BaseModel):
+    """Ids to add to and remove from a role's users or a user's roles."""
+    add: list[str] = Field(default_factory=list)
+    remove: list[str] = Field(default_factory=list)
+
+
+# Replacements send the desired ids as one NOT IN list, kept under the bound parameter limit
+MAX_REPLACE_IDS = 10000
+
+
+class RoleUsersReplace(BaseModel):
+    """The complete set of users a role should have."""
+    user_ids: list[str] = Field(..., max_length=MAX_REPLACE_IDS)
+
+
+class UserRolesReplace(BaseModel):
+    """The complete set of roles a user should have."""
+    role_ids: list[str] = Field(..., max_length=MAX_REPLACE_IDS)
+
+
+class MembershipChange(BaseModel):
+    """How many assignments a membership update actually added and removed."""
+    added: int
+    removed: int
+
+
+class MembershipCheck(BaseModel):
+    user_id: str
+    role_id: str
+    member: bool
+
+
+class MembershipQuery(BaseModel):
+    """Users matched by a role set query: how many, and the first `limit` ids."""
+    count: int
+    user_ids: list[str]
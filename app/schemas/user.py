@@ -1,6 +1,6 @@
 import re
 from enum import Enum
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import BaseModel, ConfigDict, Field, field_validator
 
@@ -66,3 +66,28 @@ class UserCreateResponse(UserInDBBase):
     )
 
 
+class UserImportResult(BaseModel):
+    row: int = Field(..., description='1-based position of the record in the import')
+    status: Literal['created', 'error']
+    id: Optional[str] = None
+    username: Optional[str] = None
+    email: Optional[str] = None
+    generated_password: Optional[str] = Field(
+        None, description='Auto-generated password (only shown on creation)'
+    )
+    error: Optional[str] = None
+
+
+class UserImportResponse(BaseModel):
+    created: int
+    failed: int
+    results: list[UserImportResult]
+
+
+class UserBulkDelete(BaseModel):
+    ids: list[str] = Field(..., min_length=1, max_length=1000, description='Ids of users to delete')
+
+
+class UserBulkDeleteResponse(BaseModel):
+    deleted: list[str]
+    not_found: list[str]
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Maintenance commands for the application database.
+
+Usage:
+    python manage.py archive-activities [--days N]
+    python manage.py backfill-rollups
+    python manage.py rebuild-search-index
+    python manage.py rebuild-role-closure
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app import crud, models  # noqa: F401  (registers all mappers)
+from app.core import table_versions, user_search
+from app.core.database import Base, SessionLocal, engine
+from app.core.retention import run_retention
+
+
+def archive_activities(args: argparse.Namespace) -> None:
+    db = SessionLocal()
+    try:
+        archived = run_retention(db, retention_days=args.days)
+    finally:
+        db.close()
+    for day, count in sorted(archived.items()):
+        print(f'{day}: archived {count} activities')
+    print(f'Archived {sum(archived.values())} activities in {len(archived)} day buckets')
+
+
+def backfill_rollups(args: argparse.Namespace) -> None:
+    db = SessionLocal()
+    try:
+        total = crud.activity_rollup.rebuild(db)
+    finally:
+        db.close()
+    print(f'Rebuilt activity rollups from {total} activities')
+
+
+def rebuild_search_index(args: argparse.Namespace) -> None:
+    if not user_search.enabled:
+        print('The full-text search index is not available on this database')
+        return
+    db = SessionLocal()
+    try:
+        user_search.rebuild(db)
+    finally:
+        db.close()
+    print('Rebuilt the user search index')
+
+
+def rebuild_role_closure(args: argparse.Namespace) -> None:
+    db = SessionLocal()
+    try:
+        links = crud.role_hierarchy.rebuild(db)
+    finally:
+        db.close()
+    print(f'Rebuilt the role closure from {links} parent links')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    archive = commands.add_parser(
+        'archive-activities', help='Archive and drop activity day buckets past the retention window'
+    )
+    archive.add_argument('--days', type=int, default=None, help='Override activity_retention_days')
+    archive.set_defaults(func=archive_activities)
+
+    backfill = commands.add_parser(
+        'backfill-rollups', help='Rebuild the activity rollup tables from the raw activities'
+    )
+    backfill.set_defaults(func=backfill_rollups)
+
+    reindex = commands.add_parser(
+        'rebuild-search-index', help='Reindex all users for full-text search, e.g. after VACUUM'
+    )
+    reindex.set_defaults(func=rebuild_search_index)
+
+    closure = commands.add_parser(
+        'rebuild-role-closure', help='Recompute inherited roles from the parent links'
+    )
+    closure.set_defaults(func=rebuild_role_closure)
+
+    args = parser.parse_args()
+    Base.metadata.create_all(bind=engine)
+    user_search.install(engine)
+    table_versions.install(engine)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import os
+import tempfile
+import uuid
+from collections.abc import Callable, Iterator
+
+# Point the app at a throwaway database before anything reads the settings
+os.environ['DATABASE_URL'] = f'sqlite:///{tempfile.mkdtemp()}/test.db'
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.database import SessionLocal, engine
+from app.main import app
+from app.models.token import Token
+from app.schemas.role import RoleCreate
+from app.schemas.user import UserCreate
+
+
+def unique(prefix: str) -> str:
+    return f'{prefix}{uuid.uuid4().hex[:12]}'
+
+
+@pytest.fixture(scope='session')
+def client() -> Iterator[TestClient]:
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope='session')
+def token() -> Token:
+    with SessionLocal() as db:
+        return crud.token.create(db)
+
+
+@pytest.fixture(scope='session')
+def headers(token: Token) -> dict[str, str]:
+    return {'Authorization': f'Bearer {token.token}'}
+
+
+@pytest.fixture
+def db() -> Iterator[Session]:
+    with SessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+def make_roles(db: Session) -> Callable[[int], list[str]]:
+    """Create `count` roles with unique names and return their ids."""
+
+    def make(count: int) -> list[str]:
+        objs_in = [RoleCreate(role_name=unique('role-')) for _ in range(count)]
+        return [role.id for role in crud.role.create_many(db, objs_in=objs_in, refresh=False)]
+
+    return make
+
+
+@pytest.fixture
+def make_users(db: Session) -> Callable[[int], list[str]]:
+    """Create `count` users, skipping password hashing, and return their ids."""
+
+    def make(count: int) -> list[str]:
+        objs_in = [
+            UserCreate(first_name='Test', last_name='User', email=f'{unique("user")}@example.com')
+            for _ in range(count)
+        ]
+        users = crud.user.create_many(
+            db, objs_in=objs_in, refresh=False, hashed_passwords=['x'] * count
+        )
+        return [user.id for user in users]
+
+    return make
+
+
+@pytest.fixture
+def statements() -> Iterator[list[str]]:
+    """SQL statements run on the primary engine during the test."""
+    seen: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):  # type: ignore[no-untyped-def]
+        seen.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    yield seen
+    event.remove(engine, 'before_cursor_execute', record)
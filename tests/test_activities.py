@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.pagination import encode_cursor
+from app.models.token import Token
+from app.schemas.activity import ActivityCreate
+from tests.conftest import unique
+
+START = datetime(2003, 1, 2, 10, tzinfo=timezone.utc)
+PLUS_TWO = timezone(timedelta(hours=2))
+
+
+@pytest.fixture
+def endpoint(db: Session, token: Token) -> str:
+    """A fresh endpoint with one activity at 10:00, 11:00 and 12:00 UTC."""
+    endpoint = f'GET /{unique("activities-")}'
+    objs_in = [
+        ActivityCreate(
+            endpoint=endpoint,
+            status_code=200,
+            token_id=token.id,
+            timestamp=START + timedelta(hours=hours),
+        )
+        for hours in range(3)
+    ]
+    crud.activity.create_many(db, objs_in=objs_in, refresh=False)
+    return endpoint
+
+
+def timestamps(items: list[dict]) -> list[datetime]:
+    return [
+        datetime.fromisoformat(item['timestamp']).replace(tzinfo=timezone.utc) for item in items
+    ]
+
+
+def test_next_cursor_walks_newest_first(
+    client: TestClient, headers: dict[str, str], endpoint: str
+) -> None:
+    params: dict[str, str] = {'endpoint': endpoint, 'limit': '2'}
+    first = client.get('/api/v1/activities/', headers=headers, params=params).json()
+    second = client.get(
+        '/api/v1/activities/', headers=headers, params={**params, 'cursor': first['next_cursor']}
+    ).json()
+
+    assert second['next_cursor'] is None
+    assert timestamps(first['items'] + second['items']) == [
+        START + timedelta(hours=hours) for hours in (2, 1, 0)
+    ]
+
+
+@pytest.mark.parametrize(
+    'cursor', ['garbage', encode_cursor('yesterday', 'id'), encode_cursor(START, 7)]
+)
+def test_malformed_cursor_is_rejected(
+    client: TestClient, headers: dict[str, str], cursor: str
+) -> None:
+    response = client.get('/api/v1/activities/', headers=headers, params={'cursor': cursor})
+    assert response.status_code == 400
+    assert response.json() == {'detail': 'Invalid cursor'}
+
+
+def test_bounds_in_other_offsets_are_compared_in_utc(
+    client: TestClient, headers: dict[str, str], token: Token, endpoint: str
+) -> None:
+    # 12:30+02:00 and 13:30+02:00 are 10:30 and 11:30 UTC, which leaves only the 11:00 row
+    params = {
+        'endpoint': endpoint,
+        'since': START.replace(hour=12, minute=30, tzinfo=PLUS_TWO).isoformat(),
+        'until': START.replace(hour=13, minute=30, tzinfo=PLUS_TWO).isoformat(),
+    }
+    response = client.get('/api/v1/activities/', headers=headers, params=params)
+    assert timestamps(response.json()['items']) == [START + timedelta(hours=1)]
+
+    response = client.get(
+        '/api/v1/activities/rollups',
+        headers=headers,
+        params={**params, 'token_id': token.id, 'granularity': 'hour'},
+    )
+    # Rollups round `since` down to the bucket holding it
+    buckets = [datetime.fromisoformat(row['bucket']) for row in response.json()]
+    assert [bucket.replace(tzinfo=timezone.utc) for bucket in buckets] == [
+        START, START + timedelta(hours=1)
+    ]
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.crud.crud_activity_rollup import status_counter, truncate
+from app.models.activity import Activity
+from app.models.token import Token
+from app.schemas.activity import ActivityCreate
+
+START = datetime(2024, 3, 1, 9, 58, 30, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize(
+    ('status_code', 'counter'), [(100, 'status_1xx'), (204, 'status_2xx'), (503, 'status_5xx')]
+)
+def test_status_codes_map_to_their_class(status_code: int, counter: str) -> None:
+    assert status_counter(status_code) == counter
+
+
+def test_truncate_to_bucket() -> None:
+    assert truncate(START, 'minute') == START.replace(second=0)
+    assert truncate(START, 'hour') == START.replace(minute=0, second=0)
+
+
+def series(db: Session, token_id: str, granularity: str) -> list[tuple]:
+    rows = crud.activity_rollup.get_series(db, token_id=token_id, granularity=granularity)
+    return [(row.bucket.minute, row.endpoint, row.count, row.status_4xx) for row in rows]
+
+
+@pytest.fixture
+def fresh_token(db: Session) -> Token:
+    return crud.token.create(db)
+
+
+def log(db: Session, token: Token, *offsets_and_statuses: tuple[int, int]) -> None:
+    crud.activity.create_many(
+        db,
+        objs_in=[
+            ActivityCreate(
+                endpoint='GET /api/v1/users/abc',
+                route='GET /api/v1/users/{user_id}',
+                status_code=status_code,
+                token_id=token.id,
+                timestamp=START + timedelta(minutes=offset),
+                duration_ms=2.5,
+            )
+            for offset, status_code in offsets_and_statuses
+        ],
+        refresh=False,
+    )
+
+
+def test_writes_fold_into_minute_and_hour_buckets(db: Session, fresh_token: Token) -> None:
+    log(db, fresh_token, (0, 200), (0, 404), (1, 200))
+    log(db, fresh_token, (1, 404))
+
+    route = 'GET /api/v1/users/{user_id}'
+    assert series(db, fresh_token.id, 'minute') == [(58, route, 2, 1), (59, route, 2, 1)]
+    assert series(db, fresh_token.id, 'hour') == [(0, route, 4, 2)]
+    [top] = crud.activity_rollup.top_endpoints(db, token_id=fresh_token.id)
+    assert (top['endpoint'], top['count'], top['duration_ms_sum']) == (route, 4, 10)
+
+
+def test_rebuild_matches_incremental_counters_and_keeps_archived_buckets(
+    db: Session, fresh_token: Token
+) -> None:
+    log(db, fresh_token, (0, 200), (1, 500), (90, 200))
+    before = series(db, fresh_token.id, 'minute')
+
+    crud.activity_rollup.rebuild(db)
+    assert series(db, fresh_token.id, 'minute') == before
+
+    # Archive the first hour of raw rows: its buckets survive a rebuild unchanged
+    db.execute(
+        delete(Activity).where(
+            Activity.token_id == fresh_token.id, Activity.timestamp < START + timedelta(hours=1)
+        )
+    )
+    db.commit()
+    crud.activity_rollup.rebuild(db)
+    assert series(db, fresh_token.id, 'minute') == before
+    assert [row[2] for row in series(db, fresh_token.id, 'hour')] == [2, 1]
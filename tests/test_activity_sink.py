@@ -0,0 +1,78 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.activity_sink import ActivitySink
+from app.schemas.activity import ActivityCreate
+
+
+def activity(status_code: int = 200) -> ActivityCreate:
+    return ActivityCreate(endpoint='GET /sink', status_code=status_code, token_id='t')
+
+
+class FakeInserts:
+    """Stands in for ActivitySink._insert; records rejected by `fails` never insert."""
+
+    def __init__(self, fails: int = 0) -> None:
+        self.fails = fails
+        self.batches: list[list[ActivityCreate]] = []
+
+    def __call__(self, batch: list[ActivityCreate]) -> bool:
+        self.batches.append(batch)
+        return not any(record.status_code == self.fails for record in batch)
+
+
+@pytest.fixture
+def sink(monkeypatch: pytest.MonkeyPatch) -> ActivitySink:
+    sink = ActivitySink(batch_size=3, flush_interval=0.01, max_queue_size=4)
+    monkeypatch.setattr(sink, 'start', lambda: None)
+    return sink
+
+
+def test_full_queue_drops_and_counts(sink: ActivitySink) -> None:
+    async def put_all() -> list[bool]:
+        return [await sink.put(activity()) for _ in range(6)]
+
+    assert asyncio.run(put_all()) == [True] * 4 + [False] * 2
+    assert sink.stats()['dropped'] == 2
+    assert sink.stats()['queue_depth'] == 4
+
+
+def test_failed_batch_is_retried_then_written_row_by_row(
+    sink: ActivitySink, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    inserts = FakeInserts(fails=500)
+    monkeypatch.setattr(sink, '_insert', inserts)
+    batch = [activity(), activity(500), activity()]
+
+    sink._write(batch)
+
+    # The whole batch twice, then each record on its own
+    assert [len(attempt) for attempt in inserts.batches] == [3, 3, 1, 1, 1]
+    stats = sink.stats()
+    assert (stats['written'], stats['dropped'], stats['flushes']) == (2, 1, 1)
+
+
+def test_counters_add_up_across_the_loop_and_the_flusher(
+    sink: ActivitySink, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(sink, '_insert', FakeInserts(fails=500))
+    rounds = 2000
+
+    def flusher() -> None:
+        for _ in range(rounds):
+            sink._write([activity(500)])
+
+    async def dropper() -> None:
+        for _ in range(rounds):
+            await sink.put(activity())
+
+    # Fill the queue so every put is dropped
+    while not sink._queue.full():
+        sink._queue.put_nowait(activity())
+    thread = threading.Thread(target=flusher)
+    thread.start()
+    asyncio.run(dropper())
+    thread.join()
+    assert sink.stats()['dropped'] == 2 * rounds
@@ -0,0 +1,42 @@
+from typing import Optional
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.database import AsyncSessionLocal
+from app.models.user import User, UserStatus
+from app.schemas.role import RoleCreate
+from app.schemas.user import UserCreate
+from tests.conftest import unique
+
+
+def test_extra_keyword_arguments_set_columns(db: Session) -> None:
+    role = crud.role.create(
+        db, obj_in=RoleCreate(role_name=unique('role-')), role_description='set by kwargs'
+    )
+    assert role.role_description == 'set by kwargs'
+
+    user = crud.user.create(
+        db,
+        obj_in=UserCreate(first_name='Kw', last_name='Args', email=f'{unique("kw")}@example.com'),
+        hashed_password='x',
+        status=UserStatus.disabled,
+    )
+    assert (user.hashed_password, user.status) == ('x', UserStatus.disabled)
+    assert not hasattr(user, 'generated_password')
+
+    token = crud.token.create(db, token=unique('t'))
+    assert crud.token.get_by_token(db, token=token.token) is not None
+
+
+def test_create_async_generates_a_password_only_when_needed(client: TestClient) -> None:
+    async def create(password: Optional[str]) -> User:
+        email = f'{unique("async")}@example.com'
+        obj_in = UserCreate(first_name='As', last_name='Ync', email=email, password=password)
+        async with AsyncSessionLocal() as db:
+            return await crud.user.create_async(db, obj_in=obj_in)
+
+    generated = client.portal.call(create, None)
+    assert len(generated.generated_password) >= 12
+    assert not hasattr(client.portal.call(create, 'pass1234'), 'generated_password')
@@ -0,0 +1,72 @@
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool, SingletonThreadPool
+
+from app.core.config import settings
+from app.core.database import async_url, engine_options, make_engine
+
+
+def test_sqlite_file_options() -> None:
+    options = engine_options(make_url('sqlite:///./app.db'))
+    assert options['connect_args'] == {'check_same_thread': False}
+    assert options['pool_size'] == settings.db_pool_size
+    assert 'pool_pre_ping' not in options
+
+
+def test_in_memory_sqlite_keeps_the_dialect_pool() -> None:
+    options = engine_options(make_url('sqlite://'))
+    assert 'pool_size' not in options
+    assert isinstance(make_engine('sqlite://', 'memory').pool, SingletonThreadPool)
+
+
+@pytest.mark.parametrize(
+    ('database_url', 'connect_args'),
+    [
+        ('postgresql://app@db/app', None),
+        ('postgresql+asyncpg://app@db/app', 'prepared_statement_cache_size'),
+    ],
+)
+def test_postgresql_options(database_url: str, connect_args: str) -> None:
+    options = engine_options(make_url(database_url))
+    assert options['pool_recycle'] == settings.db_pool_recycle
+    assert options['pool_pre_ping'] == settings.db_pool_pre_ping
+    assert options['max_overflow'] == settings.db_max_overflow
+    assert list(options.get('connect_args', {})) == ([connect_args] if connect_args else [])
+
+
+def test_async_url_swaps_in_the_asyncio_driver() -> None:
+    assert async_url(make_url('sqlite:///a.db')).drivername == 'sqlite+aiosqlite'
+    assert async_url(make_url('postgresql+psycopg2://h/d')).drivername == 'postgresql+asyncpg'
+
+
+def test_sqlite_pragmas_are_applied_to_new_connections(tmp_path: Path) -> None:
+    engine = make_engine(f'sqlite:///{tmp_path}/pragmas.db', 'pragmas')
+    assert isinstance(engine.pool, QueuePool)
+    with engine.connect() as conn:
+        pragmas = {
+            name: conn.execute(text(f'PRAGMA {name}')).scalar()
+            for name in ('journal_mode', 'busy_timeout', 'cache_size', 'synchronous')
+        }
+    assert pragmas == {
+        'journal_mode': settings.sqlite_journal_mode,
+        'busy_timeout': settings.sqlite_busy_timeout_ms,
+        'cache_size': settings.sqlite_cache_size,
+        # NORMAL
+        'synchronous': 1,
+    }
+
+
+def test_immediate_begin_mode_takes_the_write_lock_up_front(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, 'sqlite_begin_mode', 'immediate')
+    engine = make_engine(f'sqlite:///{tmp_path}/immediate.db', 'immediate')
+    seen: list[str] = []
+    with engine.connect() as conn:
+        conn.connection.dbapi_connection.set_trace_callback(seen.append)  # type: ignore[union-attr]
+        with conn.begin():
+            conn.execute(text('select 1'))
+    assert seen[0] == 'BEGIN IMMEDIATE'
@@ -0,0 +1,102 @@
+from collections.abc import Callable
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.cache import MISSING, role_cache, user_cache
+from app.core.database import AsyncSessionLocal
+from app.models.user import User
+
+
+def role_ids(client: TestClient, headers: dict[str, str], user_id: str) -> list[str]:
+    return client.get(f'/api/v1/users/{user_id}', headers=headers).json()['role_ids']
+
+
+def user_ids(client: TestClient, headers: dict[str, str], role_id: str) -> list[str]:
+    return client.get(f'/api/v1/roles/{role_id}', headers=headers).json()['user_ids']
+
+
+def test_repeat_reads_are_served_from_cache(
+    client: TestClient,
+    headers: dict[str, str],
+    statements: list[str],
+    make_users: Callable[[int], list[str]],
+) -> None:
+    (user_id,) = make_users(1)
+    first = client.get(f'/api/v1/users/{user_id}', headers=headers)
+    assert user_cache.get(user_id) is not MISSING
+
+    statements.clear()
+    second = client.get(f'/api/v1/users/{user_id}', headers=headers)
+    assert second.json() == first.json()
+    assert not [statement for statement in statements if 'FROM users' in statement]
+
+
+def test_membership_changes_invalidate_both_sides(
+    client: TestClient,
+    headers: dict[str, str],
+    db: Session,
+    make_roles: Callable[[int], list[str]],
+    make_users: Callable[[int], list[str]],
+) -> None:
+    (user_id,) = make_users(1)
+    first, second = make_roles(2)
+    assert role_ids(client, headers, user_id) == []
+    assert user_ids(client, headers, first) == []
+
+    crud.membership.apply(db, add=[(user_id, first)])
+    assert user_cache.get(user_id) is MISSING
+    assert role_cache.get(first) is MISSING
+    assert role_ids(client, headers, user_id) == [first]
+    assert user_ids(client, headers, first) == [user_id]
+
+    response = client.put(
+        f'/api/v1/users/{user_id}/roles', headers=headers, json={'role_ids': [second]}
+    )
+    assert response.status_code == 200
+    assert role_ids(client, headers, user_id) == [second]
+    assert user_ids(client, headers, first) == []
+    assert user_ids(client, headers, second) == [user_id]
+
+
+def test_async_membership_changes_invalidate(
+    client: TestClient,
+    headers: dict[str, str],
+    make_roles: Callable[[int], list[str]],
+    make_users: Callable[[int], list[str]],
+) -> None:
+    (user_id,) = make_users(1)
+    (role_id,) = make_roles(1)
+    assert role_ids(client, headers, user_id) == []
+
+    async def assign() -> None:
+        async with AsyncSessionLocal() as db:
+            await crud.membership.apply_async(db, add=[(user_id, role_id)])
+
+    assert client.portal is not None
+    client.portal.call(assign)
+    assert role_ids(client, headers, user_id) == [role_id]
+
+
+def test_updates_and_deletes_invalidate(
+    client: TestClient,
+    headers: dict[str, str],
+    db: Session,
+    make_roles: Callable[[int], list[str]],
+    make_users: Callable[[int], list[str]],
+) -> None:
+    (user_id,) = make_users(1)
+    (role_id,) = make_roles(1)
+    crud.membership.apply(db, add=[(user_id, role_id)])
+    assert user_ids(client, headers, role_id) == [user_id]
+
+    user = db.get(User, user_id)
+    assert user is not None
+    crud.user.update(db, db_obj=user, obj_in={'last_name': 'Updated'})
+    response = client.get(f'/api/v1/users/{user_id}', headers=headers)
+    assert response.json()['last_name'] == 'Updated'
+
+    crud.user.remove(db, id=user_id)
+    assert client.get(f'/api/v1/users/{user_id}', headers=headers).status_code == 404
+    assert user_ids(client, headers, role_id) == []
@@ -0,0 +1,62 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app.core.instrumentation import (
+    SUB_BUCKETS,
+    LatencyHistogram,
+    RequestStats,
+    instrument_engine,
+    request_stats,
+)
+
+
+@pytest.mark.parametrize('micros', [0, 7, 31, 32, 33, 1000, 123_456, 9_876_543])
+def test_bucket_bounds_stay_within_the_relative_error(micros: int) -> None:
+    bound = LatencyHistogram._upper_bound(LatencyHistogram._index(micros))
+    assert micros <= bound <= micros * (1 + 1 / SUB_BUCKETS) + 1
+
+
+def test_percentiles_and_cumulative_buckets() -> None:
+    histogram = LatencyHistogram()
+    for millis in range(1, 101):
+        histogram.record(millis / 1000)
+
+    assert histogram.percentile(0.5) == pytest.approx(0.050, rel=1 / SUB_BUCKETS)
+    assert histogram.percentile(0.99) == pytest.approx(0.099, rel=1 / SUB_BUCKETS)
+    assert histogram.percentile(1.0) == histogram.max == 0.1
+    assert sum(histogram.bucket_counts([0.01, 0.1])) == 100
+    assert histogram.bucket_counts([0.0105, 0.2])[0] == 10
+    assert LatencyHistogram().summary()['p99_ms'] == 0.0
+
+
+def test_statements_are_charged_to_the_current_request() -> None:
+    engine = create_engine('sqlite://')
+    instrument_engine(engine)
+    stats = RequestStats()
+    context_token = request_stats.set(stats)
+    try:
+        with engine.connect() as conn:
+            conn.execute(text('select 1'))
+            with pytest.raises(OperationalError):
+                conn.execute(text('select * from missing_table'))
+            conn.execute(text('select 2'))
+            # The failed statement's start time was popped too
+            assert conn.info['query_started'] == []
+    finally:
+        request_stats.reset(context_token)
+    assert stats.query_count == 3
+    assert stats.db_seconds > 0
+
+
+def test_latency_is_reported_per_route_template(
+    client: TestClient, headers: dict[str, str]
+) -> None:
+    for user_id in ('a', 'b'):
+        client.get(f'/api/v1/users/{user_id}', headers=headers)
+
+    routes = client.get('/api/v1/activities/latency', headers=headers).json()
+    [user_detail] = [item for item in routes if item['route'] == 'GET /api/v1/users/{user_id}']
+    assert user_detail['count'] >= 2
+    assert not any(item['route'].endswith('/a') for item in routes)
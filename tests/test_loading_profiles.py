@@ -0,0 +1,68 @@
+from collections.abc import Callable
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.database import AsyncSessionLocal
+
+
+@pytest.fixture
+def member(db: Session, make_users: Callable, make_roles: Callable) -> str:
+    """A user holding two roles."""
+    [user_id] = make_users(1)
+    crud.membership.replace_user_roles(db, user_id=user_id, role_ids=make_roles(2))
+    return user_id
+
+
+def role_selects(statements: list[str]) -> list[str]:
+    return [sql for sql in statements if 'FROM roles' in sql or 'JOIN roles' in sql]
+
+
+def test_bare_profile_never_touches_roles(db: Session, member: str, statements: list) -> None:
+    user = crud.user.get(db, id=member, profile='bare')
+    assert user is not None
+    assert user.roles == []
+    assert role_selects(statements) == []
+
+
+def test_id_only_profile_loads_just_role_ids(db: Session, member: str, statements: list) -> None:
+    user = crud.user.get(db, id=member, profile='with_role_ids')
+    assert user is not None
+    assert len(user.roles) == 2
+    [select_roles] = role_selects(statements)
+    assert 'roles.role_name' not in select_roles
+
+
+def test_full_profile_loads_relationships_up_front(db: Session, member: str) -> None:
+    user = crud.user.get(db, id=member, profile='full')
+    db.expunge(user)
+    # Detached, so this would raise if it still needed a lazy load
+    assert len(user.roles) == 2
+
+
+def test_unknown_profile_is_rejected(db: Session) -> None:
+    with pytest.raises(ValueError, match='Unknown loading profile for Role: with_role_ids'):
+        crud.role.get(db, id='x', profile='with_role_ids')
+
+
+def test_async_full_profile_can_be_rendered(client: TestClient, member: str) -> None:
+    async def role_counts() -> dict[str, int]:
+        async with AsyncSessionLocal() as db:
+            users = await crud.user.get_multi_async(db, limit=10000, profile='full')
+            return {user.id: len(user.roles) for user in users}
+
+    assert client.portal.call(role_counts)[member] == 2
+
+
+def test_user_list_query_count_does_not_grow_with_the_page(
+    client: TestClient, headers: dict[str, str], make_users: Callable, statements: list
+) -> None:
+    make_users(30)
+    counts = []
+    for limit in (5, 30):
+        statements.clear()
+        client.get('/api/v1/users/', params={'limit': limit}, headers=headers)
+        counts.append(len(statements))
+    assert counts[0] == counts[1]
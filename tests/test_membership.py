@@ -0,0 +1,98 @@
+import re
+from collections.abc import Callable
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.membership_index import membership_index
+from app.models.user import user_roles
+
+
+def members(db: Session, role_id: str) -> set[str]:
+    stmt = select(user_roles.c.user_id).where(user_roles.c.role_id == role_id)
+    return set(db.scalars(stmt))
+
+
+def reads_user_roles(statements: list[str]) -> bool:
+    return any(re.match(r'\s*SELECT\b.*\bFROM user_roles\b', sql, re.S) for sql in statements)
+
+
+def test_apply_skips_pairs_already_in_place(
+    db: Session,
+    make_roles: Callable[[int], list[str]],
+    make_users: Callable[[int], list[str]],
+) -> None:
+    (role_id,) = make_roles(1)
+    first, second = make_users(2)
+
+    assert crud.membership.apply(db, add=[(first, role_id)]) == (1, 0)
+    assert crud.membership.apply(db, add=[(first, role_id), (second, role_id)]) == (1, 0)
+    assert crud.membership.apply(db, remove=[(first, role_id), (first, role_id)]) == (0, 1)
+    assert members(db, role_id) == {second}
+
+
+def test_replace_role_users_never_reads_current_members(
+    db: Session,
+    statements: list[str],
+    make_roles: Callable[[int], list[str]],
+    make_users: Callable[[int], list[str]],
+) -> None:
+    (role_id,) = make_roles(1)
+    user_ids = make_users(5)
+    crud.membership.apply(db, add=[(user_id, role_id) for user_id in user_ids[:3]])
+
+    statements.clear()
+    added, removed = crud.membership.replace_role_users(
+        db, role_id=role_id, user_ids=user_ids[2:]
+    )
+    assert (added, removed) == (2, 2)
+    assert not reads_user_roles(statements)
+    assert members(db, role_id) == set(user_ids[2:])
+    if membership_index.enabled:
+        assert [membership_index.has(user_id, role_id) for user_id in user_ids] == [
+            False, False, True, True, True
+        ]
+
+    assert crud.membership.replace_role_users(db, role_id=role_id, user_ids=[]) == (0, 3)
+    assert members(db, role_id) == set()
+
+
+def test_replace_user_roles(
+    db: Session,
+    make_roles: Callable[[int], list[str]],
+    make_users: Callable[[int], list[str]],
+) -> None:
+    kept, dropped, added = make_roles(3)
+    (user_id,) = make_users(1)
+    crud.membership.apply(db, add=[(user_id, kept), (user_id, dropped)])
+
+    change = crud.membership.replace_user_roles(db, user_id=user_id, role_ids=[kept, added])
+    assert change == (1, 1)
+    assert set(crud.membership.select_users(db, any_of=[kept, added])[1]) == {user_id}
+    assert not crud.membership.has(db, user_id=user_id, role_id=dropped)
+    if membership_index.enabled:
+        assert not membership_index.has(user_id, dropped)
+        assert membership_index.has(user_id, added)
+
+
+def test_put_role_users(
+    client: TestClient,
+    headers: dict[str, str],
+    make_roles: Callable[[int], list[str]],
+    make_users: Callable[[int], list[str]],
+) -> None:
+    (role_id,) = make_roles(1)
+    user_ids = make_users(2)
+    path = f'/api/v1/roles/{role_id}/users'
+
+    response = client.put(path, headers=headers, json={'user_ids': user_ids})
+    assert response.json() == {'added': 2, 'removed': 0}
+    response = client.put(path, headers=headers, json={'user_ids': user_ids[:1]})
+    assert response.json() == {'added': 0, 'removed': 1}
+
+    response = client.put(path, headers=headers, json={'user_ids': ['missing']})
+    assert response.status_code == 400
+    response = client.put(path, headers=headers, json={'user_ids': ['x'] * 10001})
+    assert response.status_code == 422
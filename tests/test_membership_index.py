@@ -0,0 +1,127 @@
+import random
+from collections.abc import Callable
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core import membership_index as module
+from app.core.membership_index import MembershipIndex, membership_index
+
+ROLES = ['r0', 'r1', 'r2', 'r3']
+
+
+@pytest.fixture(params=['default', 'tiny'])
+def index(request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch) -> MembershipIndex:
+    """
+    An enabled, empty index. 'tiny' shrinks the chunks so a few users span several of them and
+    arrays turn into bitmaps.
+    """
+    if request.param == 'tiny':
+        monkeypatch.setattr(module, 'CHUNK_SIZE', 64)
+        monkeypatch.setattr(module, 'CHUNK_BYTES', 8)
+        monkeypatch.setattr(module, 'ARRAY_MAX', 4)
+    index = MembershipIndex()
+    index.enabled = True
+    return index
+
+
+def test_disabled_index_ignores_maintenance() -> None:
+    index = MembershipIndex()
+    index.add([('u', 'r')])
+    assert not index.has('u', 'r')
+    assert index.stats()['users'] == 0
+
+
+def test_add_remove_and_drop_users(index: MembershipIndex) -> None:
+    index.add([('a', 'r0'), ('b', 'r0'), ('a', 'r1'), ('a', 'r0')])
+    assert index.has('a', 'r0') and index.has('b', 'r0') and index.has('a', 'r1')
+
+    index.remove([('a', 'r0'), ('nobody', 'r0'), ('a', 'r9')])
+    assert not index.has('a', 'r0')
+    assert index.user_ids(index.select(any_of=['r0', 'r1']), 10) == ['a', 'b']
+
+    index.drop_users(['a', 'a'])
+    assert not index.has('a', 'r1')
+    assert index.user_ids(index.select(any_of=['r0', 'r1']), 10) == ['b']
+    # A dropped user's ordinal is not reused
+    index.add([('c', 'r1')])
+    assert index.user_ids(index.select(any_of=['r1']), 10) == ['c']
+    assert index.stats()['users'] == 2
+
+
+def test_replace_role_and_user(index: MembershipIndex) -> None:
+    index.add([('a', 'r0'), ('b', 'r0'), ('b', 'r1')])
+    index.replace_role('r0', ['c', 'b', 'c'])
+    assert sorted(index.user_ids(index.select(any_of=['r0']), 10)) == ['b', 'c']
+
+    index.replace_user('b', ['r2'])
+    assert [index.has('b', role_id) for role_id in ROLES] == [False, False, True, False]
+
+
+def test_matches_a_set_of_pairs_under_random_changes(index: MembershipIndex) -> None:
+    rng = random.Random(22)
+    users = [f'u{number:03}' for number in range(200)]
+    expected: set[tuple[str, str]] = set()
+    for _ in range(400):
+        pairs = {(rng.choice(users), rng.choice(ROLES)) for _ in range(rng.randint(1, 8))}
+        operation = rng.random()
+        if operation < 0.5:
+            index.add(pairs)
+            expected |= pairs
+        elif operation < 0.8:
+            index.remove(pairs)
+            expected -= pairs
+        elif operation < 0.9:
+            role_id = rng.choice(ROLES)
+            members = rng.sample(users, rng.randint(0, 40))
+            index.replace_role(role_id, members)
+            expected = {pair for pair in expected if pair[1] != role_id}
+            expected |= {(user_id, role_id) for user_id in members}
+        else:
+            dropped = rng.sample(users, 3)
+            index.drop_users(dropped)
+            expected = {pair for pair in expected if pair[0] not in dropped}
+
+    def holders(role_id: str) -> set[str]:
+        return {user_id for user_id, role in expected if role == role_id}
+
+    for user_id in users:
+        assert {role for role in ROLES if index.has(user_id, role)} == {
+            role for user, role in expected if user == user_id
+        }
+    bits = index.select(any_of=['r0', 'r1'], all_of=['r2'], none_of=['r3'])
+    wanted = ((holders('r0') | holders('r1')) & holders('r2')) - holders('r3')
+    assert index.count(bits) == len(wanted)
+    assert set(index.user_ids(bits, 1000)) == wanted
+
+
+def test_load_and_queries_agree_with_the_database(
+    client: TestClient,
+    headers: dict[str, str],
+    db: Session,
+    make_users: Callable,
+    make_roles: Callable,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    first, second = make_roles(2)
+    users = make_users(4)
+    crud.membership.replace_role_users(db, role_id=first, user_ids=users[:3])
+    crud.membership.replace_role_users(db, role_id=second, user_ids=users[1:])
+    crud.user.remove_many(db, ids=[users[2]])
+
+    def query(**roles: list[str]) -> dict:
+        params = {**roles, 'limit': 10}
+        return client.get('/api/v1/membership/users', params=params, headers=headers).json()
+
+    monkeypatch.setattr(membership_index, 'enabled', False)
+    from_sql = [query(all_of=[first, second]), query(any_of=[first], none_of=[second])]
+    monkeypatch.setattr(membership_index, 'enabled', True)
+    assert [query(all_of=[first, second]), query(any_of=[first], none_of=[second])] == from_sql
+    assert from_sql[0] == {'count': 1, 'user_ids': [users[1]]}
+
+    reloaded = MembershipIndex()
+    reloaded.load(db)
+    assert reloaded.count(reloaded.select(all_of=[first, second])) == 1
+    assert reloaded.has(users[3], second) and not reloaded.has(users[2], first)
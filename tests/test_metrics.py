@@ -0,0 +1,72 @@
+import re
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.core.metrics import InstrumentedQueuePool, MetricsRegistry, instrument_pool, registry
+
+
+def test_render_uses_the_text_exposition_format() -> None:
+    metrics = MetricsRegistry()
+    requests = metrics.counter('requests_total', 'Requests', ('path',))
+    requests.inc(path='/a"b')
+    requests.inc(2, path='/a"b')
+    sizes = metrics.histogram('size', 'Sizes', buckets=(1, 10))
+    for value in (0.5, 5, 50):
+        sizes.observe(value)
+    metrics.gauge_callback('depth', 'Depth', lambda: 7, queue='q')
+
+    assert metrics.render().splitlines() == [
+        '# HELP requests_total Requests',
+        '# TYPE requests_total counter',
+        'requests_total{path="/a\\"b"} 3',
+        '# HELP size Sizes',
+        '# TYPE size histogram',
+        'size_bucket{le="1"} 1',
+        'size_bucket{le="10"} 2',
+        'size_bucket{le="+Inf"} 3',
+        'size_sum 55.5',
+        'size_count 3',
+        '# HELP depth Depth',
+        '# TYPE depth gauge',
+        'depth{queue="q"} 7',
+    ]
+
+
+def sample(name: str) -> float:
+    match = re.search(rf'^{re.escape(name)} (\S+)$', registry.render(), re.M)
+    assert match, name
+    return float(match[1])
+
+
+def test_pool_metrics_follow_the_engine_across_dispose() -> None:
+    engine = create_engine('sqlite://', poolclass=InstrumentedQueuePool, pool_size=2)
+    instrument_pool(engine, 'scratch')
+    with engine.connect() as conn:
+        conn.execute(text('select 1'))
+        assert sample('db_pool_checked_out{engine="scratch"}') == 1
+    engine.dispose()
+    with engine.connect():
+        pass
+
+    assert sample('db_pool_checkouts_total{engine="scratch"}') == 2
+    assert sample('db_pool_checked_out{engine="scratch"}') == 0
+    assert sample('db_pool_size{engine="scratch"}') == 2
+    assert sample('db_pool_wait_seconds_count{engine="scratch"}') == 2
+
+
+def test_metrics_endpoint(client: TestClient, headers: dict[str, str]) -> None:
+    client.get('/api/v1/roles/', headers=headers)
+    response = client.get('/metrics')
+
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+    body = response.text
+    assert 'http_requests_total{route="GET /api/v1/roles/",status="200"}' in body
+    for family in (
+        'http_request_duration_seconds',
+        'db_queries_per_request',
+        'activity_queue_depth',
+        'cache_hits_total',
+        'password_hash_queue_depth',
+    ):
+        assert f'# TYPE {family} ' in body
@@ -0,0 +1,87 @@
+import pytest
+from fastapi.testclient import TestClient
+from starlette.types import Receive, Scope, Send
+
+from app.core import middleware
+from app.core.middleware import TRUNCATED_MARKER, APIActivityMiddleware, BodyCapture
+from app.models.token import Token
+from app.schemas.activity import ActivityCreate
+
+
+@pytest.mark.parametrize(
+    ('chunks', 'expected'),
+    [
+        ([], None),
+        ([b'abc', b'', b'de'], 'abcde'),
+        ([b'abcdef'], 'abcdef'),
+        ([b'abc', b'defgh', b'ij'], 'abcdef' + TRUNCATED_MARKER),
+    ],
+)
+def test_body_capture_keeps_at_most_the_limit(chunks: list[bytes], expected: str) -> None:
+    capture = BodyCapture(6)
+    for chunk in chunks:
+        capture.feed(chunk)
+    assert capture.text() == expected
+    assert capture.size == sum(map(len, chunks))
+
+
+def test_most_specific_endpoint_limit_wins() -> None:
+    mw = APIActivityMiddleware(
+        None,  # type: ignore[arg-type]
+        max_body_bytes=100,
+        endpoint_limits={'POST /api/v1/users': 10, 'POST /api/v1/users/import': 0},
+    )
+    assert mw.capture_limit('POST /api/v1/users/import') == 0
+    assert mw.capture_limit('POST /api/v1/users/') == 10
+    assert mw.capture_limit('GET /api/v1/users/') == 100
+
+
+async def echo(scope: Scope, receive: Receive, send: Send) -> None:
+    """Streams the request body back in two chunks."""
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    await send({'type': 'http.response.start', 'status': 201, 'headers': []})
+    await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+@pytest.fixture
+def recorded(monkeypatch: pytest.MonkeyPatch) -> list[ActivityCreate]:
+    seen: list[ActivityCreate] = []
+
+    async def put(activity: ActivityCreate) -> bool:
+        seen.append(activity)
+        return True
+
+    monkeypatch.setattr(middleware.activity_sink, 'put', put)
+    return seen
+
+
+def test_streamed_bodies_are_captured_up_to_the_limit(
+    recorded: list[ActivityCreate], token: Token, headers: dict[str, str]
+) -> None:
+    client = TestClient(APIActivityMiddleware(echo, max_body_bytes=8))
+    response = client.post('/api/echo', content=b'0123456789', headers=headers)
+
+    assert response.content == b'0123456789' * 2
+    [activity] = recorded
+    assert activity.endpoint == 'POST /api/echo'
+    assert activity.token_id == token.id
+    assert activity.status_code == 201
+    assert activity.request == '01234567' + TRUNCATED_MARKER
+    assert activity.response == '01234567' + TRUNCATED_MARKER
+    assert activity.response_size == 20
+
+
+def test_unauthenticated_and_non_api_calls_are_not_recorded(
+    recorded: list[ActivityCreate], headers: dict[str, str]
+) -> None:
+    client = TestClient(APIActivityMiddleware(echo))
+    client.post('/api/echo', content=b'x')
+    client.post('/api/echo', content=b'x', headers={'Authorization': 'Bearer nope'})
+    client.post('/echo', content=b'x', headers=headers)
+    assert recorded == []
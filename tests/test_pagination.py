@@ -0,0 +1,79 @@
+from collections.abc import Callable
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.pagination import encode_cursor
+from app.models.token import Token
+from app.schemas.activity import ActivityCreate
+
+
+def walk(client: TestClient, url: str, headers: dict[str, str]) -> list[list[str]]:
+    """Follow the Link headers from `url`, returning the ids on each page."""
+    pages = []
+    while url:
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        pages.append([item['id'] for item in response.json()])
+        url = response.links.get('next', {}).get('url', '')
+    return pages
+
+
+@pytest.mark.parametrize('order_by', ['id', 'username'])
+def test_role_user_pages_cover_every_member_once(
+    client: TestClient,
+    headers: dict[str, str],
+    db: Session,
+    make_roles: Callable[[int], list[str]],
+    make_users: Callable[[int], list[str]],
+    order_by: str,
+) -> None:
+    (role_id,) = make_roles(1)
+    user_ids = make_users(5)
+    crud.membership.replace_role_users(db, role_id=role_id, user_ids=user_ids)
+
+    pages = walk(client, f'/api/v1/roles/{role_id}/users?limit=2&order_by={order_by}', headers)
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert sorted(user_id for page in pages for user_id in page) == sorted(user_ids)
+
+    response = client.get(
+        f'/api/v1/roles/{role_id}/users?limit=2&include_total=true', headers=headers
+    )
+    assert response.headers['X-Total-Count'] == '5'
+
+
+def test_cursor_must_match_the_ordering(client: TestClient, headers: dict[str, str]) -> None:
+    cursor = encode_cursor('id', 'a')
+    response = client.get(f'/api/v1/users/?order_by=username&cursor={cursor}', headers=headers)
+    assert response.status_code == 400
+    assert response.json()['detail'] == 'Cursor was issued for order_by=id'
+
+    response = client.get('/api/v1/users/?cursor=not-a-cursor', headers=headers)
+    assert response.json()['detail'] == 'Invalid cursor'
+
+
+def test_activity_keyset_breaks_timestamp_ties_by_id(db: Session, token: Token) -> None:
+    # Every row shares one timestamp, so only the id orders them
+    timestamp = datetime(2002, 5, 6, 7, 8, 9, tzinfo=timezone.utc)
+    objs_in = [
+        ActivityCreate(
+            endpoint='GET /ties', status_code=200, token_id=token.id, timestamp=timestamp
+        )
+        for _ in range(5)
+    ]
+    created = sorted(activity.id for activity in crud.activity.create_many(db, objs_in=objs_in))
+
+    seen: list[str] = []
+    before = None
+    while True:
+        page = crud.activity.get_page_before(
+            db, endpoint='GET /ties', before=before, limit=2
+        )
+        if not page:
+            break
+        seen += [activity.id for activity in page]
+        before = (page[-1].timestamp, page[-1].id)
+    assert seen == created[::-1]
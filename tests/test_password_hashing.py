@@ -0,0 +1,57 @@
+import asyncio
+import re
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from app.core import security
+from app.core.config import settings
+from app.core.metrics import registry
+
+
+def queue_depth() -> int:
+    match = re.search(r'^password_hash_queue_depth (\S+)$', registry.render(), re.M)
+    assert match
+    return int(float(match[1]))
+
+
+def test_queue_depth_counts_jobs_until_they_finish() -> None:
+    release = threading.Event()
+    jobs = settings.password_hash_workers + 2
+    futures: list[Future] = [security._submit('hash', release.wait, 5) for _ in range(jobs)]
+    try:
+        assert queue_depth() == jobs
+    finally:
+        release.set()
+    for future in futures:
+        future.result()
+    assert queue_depth() == 0
+
+
+def test_failed_jobs_are_settled_too() -> None:
+    future = security._submit('verify', security.pwd_context.verify, 'password', 'not-a-hash')
+    with pytest.raises(ValueError):
+        future.result()
+    assert queue_depth() == 0
+
+
+def test_async_hashing_leaves_the_event_loop_free() -> None:
+    async def run() -> tuple[bool, int]:
+        ticks = 0
+
+        async def tick() -> None:
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        ticker = asyncio.create_task(tick())
+        hashed = await security.get_password_hash_async('pass1234')
+        ticker.cancel()
+        return await security.verify_password_async('pass1234', hashed), ticks
+
+    verified, ticks = asyncio.run(run())
+    assert verified
+    # The loop kept running other tasks while bcrypt ran on the pool
+    assert ticks > 1
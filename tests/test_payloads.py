@@ -0,0 +1,66 @@
+import json
+import zlib
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core import payloads
+from app.core.config import settings
+from app.models.activity import Activity
+from app.models.token import Token
+from app.schemas.activity import ActivityCreate
+
+
+def test_secrets_are_redacted_but_other_fields_kept() -> None:
+    body = json.dumps({'email': 'a@example.com', 'Password': 'hunter2', 'token': 'x\\"y'})
+    redacted = json.loads(payloads.redact(body))
+    assert redacted == {
+        'email': 'a@example.com',
+        'Password': payloads.REDACTED,
+        'token': payloads.REDACTED,
+    }
+
+
+def test_truncated_bodies_are_redacted_too() -> None:
+    assert payloads.redact('{"password": "hunt') == f'{{"password": "{payloads.REDACTED}"'
+
+
+@pytest.mark.parametrize(
+    ('mode', 'text', 'stored_text', 'compressed'),
+    [
+        ('raw', '{"password": "p"}', '{"password": "p"}', False),
+        ('redacted', '{"password": "p"}', '{"password": "[REDACTED]"}', False),
+        ('compressed', '{"password": "p"}', '{"password": "[REDACTED]"}', False),
+        ('compressed', 'x' * 600, None, True),
+    ],
+)
+def test_encode_follows_the_payload_mode(
+    monkeypatch: pytest.MonkeyPatch, mode: str, text: str, stored_text: str, compressed: bool
+) -> None:
+    monkeypatch.setattr(settings, 'activity_payload_mode', mode)
+    monkeypatch.setattr(settings, 'activity_compress_threshold', 512)
+    stored, data = payloads.encode(text)
+    assert stored == stored_text
+    assert (data is not None) == compressed
+    expected = text if mode == 'raw' else payloads.redact(text)
+    assert payloads.decode(stored, data) == expected
+
+
+def test_large_payloads_round_trip_through_the_database(db: Session, token: Token) -> None:
+    response = json.dumps({'users': [{'id': index, 'access_token': 'abc'} for index in range(50)]})
+    created = crud.activity.create(
+        db,
+        obj_in=ActivityCreate(
+            endpoint='GET /api/v1/users/', status_code=200, token_id=token.id, response=response
+        ),
+    )
+
+    stored = db.get(Activity, created.id)
+    assert stored is not None
+    assert stored.response_text is None
+    assert stored.response_compressed is not None
+    assert len(stored.response_compressed) < len(response)
+    assert 'abc' not in zlib.decompress(stored.response_compressed).decode()
+    assert stored.response == payloads.redact(response)
+    assert stored.request is None
@@ -0,0 +1,81 @@
+from collections.abc import Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+from starlette.types import Receive, Scope, Send
+
+from app.api import deps
+from app.core import read_routing
+from app.core.cache import LRUCache
+from app.core.database import SessionLocal
+from app.core.middleware import ReadYourWritesMiddleware
+
+
+def scope(method: str, authorization: str = '', client: str = '10.0.0.1') -> dict:
+    headers = [(b'authorization', authorization.encode())] if authorization else []
+    return {'type': 'http', 'method': method, 'headers': headers, 'client': (client, 1234)}
+
+
+@pytest.fixture
+def replica(monkeypatch: pytest.MonkeyPatch) -> Iterator[list[str]]:
+    """Turns routing on with an empty writer window; lists the handlers given replica sessions."""
+    monkeypatch.setattr(read_routing, 'replica_enabled', True)
+    monkeypatch.setattr(read_routing, 'recent_writers', LRUCache(100, ttl=60))
+    opened: list[str] = []
+
+    def replica_session() -> Session:
+        opened.append('replica')
+        return SessionLocal()
+
+    monkeypatch.setattr(deps, 'ReadSessionLocal', replica_session)
+    yield opened
+
+
+def test_only_safe_requests_use_the_replica(replica: list[str]) -> None:
+    assert read_routing.use_replica(scope('GET'))
+    assert read_routing.use_replica(scope('HEAD'))
+    assert not read_routing.use_replica(scope('POST'))
+
+
+def test_writers_are_pinned_to_the_primary(replica: list[str]) -> None:
+    read_routing.record_write(scope('POST', 'Bearer a'))
+    assert not read_routing.use_replica(scope('GET', 'Bearer a'))
+    assert read_routing.use_replica(scope('GET', 'Bearer b'))
+    # Without a token, clients are told apart by address
+    read_routing.record_write(scope('POST', client='10.0.0.2'))
+    assert not read_routing.use_replica(scope('GET', client='10.0.0.2'))
+    assert read_routing.use_replica(scope('GET', client='10.0.0.3'))
+
+
+def test_disabled_without_a_replica_url() -> None:
+    assert read_routing.replica_enabled is False
+    assert not read_routing.use_replica(scope('GET'))
+
+
+def test_write_middleware_pins_the_client_during_and_after_the_write(replica: list[str]) -> None:
+    seen: list[bool] = []
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        seen.append(read_routing.use_replica({**scope, 'method': 'GET'}))
+        await send({'type': 'http.response.start', 'status': 204, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    client = TestClient(ReadYourWritesMiddleware(app))
+    client.get('/', headers={'Authorization': 'Bearer reader'})
+    client.delete('/', headers={'Authorization': 'Bearer writer'})
+    assert seen == [True, False]
+    assert not read_routing.use_replica(scope('GET', 'Bearer writer'))
+
+
+def test_read_sessions_follow_the_routing(replica: list[str]) -> None:
+    def open_session(request_scope: dict) -> None:
+        sessions = deps.get_read_db(Request(request_scope))
+        next(sessions).close()
+
+    open_session(scope('GET', 'Bearer a'))
+    read_routing.record_write(scope('POST', 'Bearer a'))
+    open_session(scope('GET', 'Bearer a'))
+    open_session(scope('GET', 'Bearer b'))
+    assert replica == ['replica', 'replica']
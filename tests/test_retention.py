@@ -0,0 +1,120 @@
+import gzip
+import json
+from collections.abc import Callable
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core import retention
+from app.core.config import settings
+from app.models.activity import Activity
+from app.models.token import Token
+from app.schemas.activity import ActivityCreate
+
+# Far enough back that no other test writes activity on these days
+DAY = date(2001, 3, 4)
+
+
+@pytest.fixture
+def archive_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setattr(settings, 'activity_archive_dir', str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def record(db: Session, token: Token) -> Callable[[date, int], None]:
+    def record(day: date, count: int) -> None:
+        start = datetime(day.year, day.month, day.day, 12, tzinfo=timezone.utc)
+        objs_in = [
+            ActivityCreate(
+                endpoint='GET /retention',
+                status_code=200,
+                token_id=token.id,
+                timestamp=start + timedelta(seconds=index),
+            )
+            for index in range(count)
+        ]
+        crud.activity.create_many(db, objs_in=objs_in, refresh=False)
+
+    return record
+
+
+def archived_records(path: Path) -> list[dict]:
+    with gzip.open(path, 'rt', encoding='utf-8') as archive:
+        return [json.loads(line) for line in archive]
+
+
+def remaining(db: Session, day: date) -> int:
+    start, end = retention._bucket_bounds(day)
+    stmt = select(func.count()).where(Activity.timestamp >= start, Activity.timestamp < end)
+    return db.scalar(stmt) or 0
+
+
+def test_only_days_with_rows_are_archived(
+    db: Session, archive_dir: Path, record: Callable[[date, int], None]
+) -> None:
+    record(DAY, 2)
+    record(DAY + timedelta(days=40), 1)
+
+    buckets = retention.expired_buckets(db, cutoff=DAY + timedelta(days=41))
+    assert buckets[:2] == [DAY, DAY + timedelta(days=40)]
+    for day in buckets[:2]:
+        retention.archive_bucket(db, day=day)
+
+    assert sorted(path.name for path in archive_dir.iterdir()) == [
+        'activities-2001-03-04.jsonl.gz',
+        'activities-2001-04-13.jsonl.gz',
+    ]
+    assert len(archived_records(retention.archive_path(DAY))) == 2
+    assert remaining(db, DAY) == 0
+
+
+def test_failed_delete_leaves_archive_unchanged(
+    db: Session,
+    archive_dir: Path,
+    record: Callable[[date, int], None],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    day = DAY + timedelta(days=1)
+    record(day, 3)
+
+    def fail() -> None:
+        raise RuntimeError('database is locked')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(db, 'commit', fail)
+        with pytest.raises(RuntimeError):
+            retention.archive_bucket(db, day=day)
+    assert list(archive_dir.iterdir()) == []
+    assert remaining(db, day) == 3
+
+    # The retry archives each row exactly once
+    assert retention.archive_bucket(db, day=day) == 3
+    assert len(archived_records(retention.archive_path(day))) == 3
+
+    # Rows arriving later for the same day are added after the earlier ones
+    record(day, 1)
+    assert retention.archive_bucket(db, day=day) == 1
+    assert len(archived_records(retention.archive_path(day))) == 4
+
+
+def test_pending_archive_is_settled_by_the_next_run(
+    db: Session, archive_dir: Path, record: Callable[[date, int], None]
+) -> None:
+    committed, rolled_back = DAY + timedelta(days=2), DAY + timedelta(days=3)
+    record(rolled_back, 1)
+    for day in (committed, rolled_back):
+        path = retention.archive_path(day)
+        with gzip.open(retention._pending_path(path), 'wt', encoding='utf-8') as archive:
+            archive.write('{}\n')
+
+    retention.finish_pending(db)
+
+    # The committed day's rows are gone, so its rename completes; the other day is redone
+    assert archived_records(retention.archive_path(committed)) == [{}]
+    assert not retention.archive_path(rolled_back).exists()
+    assert not list(archive_dir.glob('*.tmp'))
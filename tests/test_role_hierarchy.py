@@ -0,0 +1,167 @@
+import random
+import threading
+from collections.abc import Callable, Collection
+from contextlib import suppress
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.database import SessionLocal
+from app.models.role import role_closure
+
+
+def closure(db: Session, role_ids: Collection[str]) -> dict[tuple[str, str], int]:
+    """role_closure rows among `role_ids`, as (ancestor, descendant) -> paths."""
+    stmt = select(role_closure).where(role_closure.c.ancestor_id.in_(role_ids))
+    return {(row.ancestor_id, row.descendant_id): row.paths for row in db.execute(stmt)}
+
+
+def test_new_roles_have_self_rows(db: Session, make_roles: Callable[[int], list[str]]) -> None:
+    role_ids = make_roles(3)
+    assert closure(db, role_ids) == {(role_id, role_id): 1 for role_id in role_ids}
+
+
+def test_diamond_counts_paths(db: Session, make_roles: Callable[[int], list[str]]) -> None:
+    top, left, right, bottom = make_roles(4)
+    for child, parent in [(left, top), (right, top), (bottom, left), (bottom, right)]:
+        assert crud.role_hierarchy.add_parent(db, role_id=child, parent_id=parent)
+
+    rows = closure(db, [top, left, right, bottom])
+    assert rows[(top, bottom)] == 2
+    assert rows[(left, bottom)] == rows[(right, bottom)] == 1
+
+    # Dropping one side of the diamond leaves the other route in place
+    assert crud.role_hierarchy.remove_parent(db, role_id=bottom, parent_id=left)
+    rows = closure(db, [top, left, right, bottom])
+    assert rows[(top, bottom)] == 1
+    assert (left, bottom) not in rows
+    assert crud.role_hierarchy.includes(db, ancestor_id=top, descendant_id=bottom)
+
+    assert crud.role_hierarchy.remove_parent(db, role_id=bottom, parent_id=right)
+    rows = closure(db, [top, left, right, bottom])
+    assert (top, bottom) not in rows
+    assert (bottom, bottom) in rows
+    assert not crud.role_hierarchy.includes(db, ancestor_id=top, descendant_id=bottom)
+
+
+def test_duplicate_and_missing_links(db: Session, make_roles: Callable[[int], list[str]]) -> None:
+    parent, child = make_roles(2)
+    assert crud.role_hierarchy.add_parent(db, role_id=child, parent_id=parent)
+    before = closure(db, [parent, child])
+
+    assert not crud.role_hierarchy.add_parent(db, role_id=child, parent_id=parent)
+    assert closure(db, [parent, child]) == before
+
+    assert not crud.role_hierarchy.remove_parent(db, role_id=parent, parent_id=child)
+    assert closure(db, [parent, child]) == before
+
+
+def test_incremental_closure_matches_rebuild(
+    db: Session, make_roles: Callable[[int], list[str]]
+) -> None:
+    role_ids = make_roles(8)
+    rng = random.Random(23)
+    for _ in range(80):
+        child, parent = rng.sample(role_ids, 2)
+        if rng.random() < 0.6:
+            with suppress(ValueError):
+                crud.role_hierarchy.add_parent(db, role_id=child, parent_id=parent)
+        else:
+            crud.role_hierarchy.remove_parent(db, role_id=child, parent_id=parent)
+
+    incremental = closure(db, role_ids)
+    crud.role_hierarchy.rebuild(db)
+    assert closure(db, role_ids) == incremental
+
+
+def test_add_parent_rejects_cycles_without_writing(
+    db: Session, make_roles: Callable[[int], list[str]]
+) -> None:
+    top, bottom = make_roles(2)
+    crud.role_hierarchy.add_parent(db, role_id=bottom, parent_id=top)
+    before = closure(db, [top, bottom])
+
+    for role_id, parent_id in [(top, bottom), (top, top)]:
+        with pytest.raises(ValueError, match='cycle'):
+            crud.role_hierarchy.add_parent(db, role_id=role_id, parent_id=parent_id)
+    assert closure(db, [top, bottom]) == before
+    assert [role.id for role in crud.role_hierarchy.get_parents(db, role_id=top)] == []
+
+
+def test_concurrent_opposite_links_cannot_form_a_cycle(
+    db: Session, make_roles: Callable[[int], list[str]]
+) -> None:
+    first, second = make_roles(2)
+    start = threading.Barrier(2)
+    outcomes: list[str] = []
+
+    def link(role_id: str, parent_id: str) -> None:
+        with SessionLocal() as session:
+            # Both requests have read the hierarchy before either writes
+            crud.role_hierarchy.includes(session, ancestor_id=role_id, descendant_id=parent_id)
+            start.wait()
+            try:
+                crud.role_hierarchy.add_parent(session, role_id=role_id, parent_id=parent_id)
+                outcomes.append('added')
+            except ValueError:
+                outcomes.append('cycle')
+
+    threads = [
+        threading.Thread(target=link, args=(first, second)),
+        threading.Thread(target=link, args=(second, first)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(outcomes) == ['added', 'cycle']
+    incremental = closure(db, [first, second])
+    crud.role_hierarchy.rebuild(db)
+    assert closure(db, [first, second]) == incremental
+
+
+def test_cycles_are_rejected(
+    client: TestClient, headers: dict[str, str], make_roles: Callable[[int], list[str]]
+) -> None:
+    top, middle, bottom = make_roles(3)
+    for child, parent in [(middle, top), (bottom, middle)]:
+        response = client.post(f'/api/v1/roles/{child}/parents/{parent}', headers=headers)
+        assert response.status_code == 201
+
+    for child, parent in [(top, bottom), (top, middle), (top, top)]:
+        response = client.post(f'/api/v1/roles/{child}/parents/{parent}', headers=headers)
+        assert response.status_code == 400
+        assert response.json()['detail'] == 'Role inheritance would form a cycle'
+
+    response = client.post(f'/api/v1/roles/{bottom}/parents/{middle}', headers=headers)
+    assert response.status_code == 400
+    assert response.json()['detail'] == 'Role already inherits this role'
+
+
+def test_effective_roles_follow_inheritance(
+    client: TestClient,
+    headers: dict[str, str],
+    db: Session,
+    make_roles: Callable[[int], list[str]],
+    make_users: Callable[[int], list[str]],
+) -> None:
+    top, middle, bottom = make_roles(3)
+    (user_id,) = make_users(1)
+    crud.membership.apply(db, add=[(user_id, bottom)])
+    for child, parent in [(middle, top), (bottom, middle)]:
+        client.post(f'/api/v1/roles/{child}/parents/{parent}', headers=headers)
+
+    def effective_roles() -> set[str]:
+        response = client.get(f'/api/v1/users/{user_id}/effective-roles', headers=headers)
+        return {role['id'] for role in response.json()}
+
+    assert effective_roles() == {top, middle, bottom}
+    response = client.get(f'/api/v1/roles/{top}/effective-users', headers=headers)
+    assert [user['id'] for user in response.json()] == [user_id]
+
+    client.delete(f'/api/v1/roles/{bottom}/parents/{middle}', headers=headers)
+    assert effective_roles() == {bottom}
@@ -0,0 +1,144 @@
+from collections.abc import Callable
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, select
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app import crud
+from app.core.cache import role_cache
+from app.core.database import AsyncSessionLocal, SessionLocal
+from app.models.table_version import TableVersion
+from app.models.user import User
+
+
+def versions() -> dict[str, int]:
+    # A fresh session, so the counters are read after every commit so far
+    with SessionLocal() as db:
+        stmt = select(TableVersion.table_name, TableVersion.version)
+        return dict(db.execute(stmt).tuples().all())
+
+
+def bumped(before: dict[str, int]) -> set[str]:
+    return {name for name, version in versions().items() if version != before.get(name)}
+
+
+def test_orm_update_bumps_users(db: Session, make_users: Callable[[int], list[str]]) -> None:
+    (user_id,) = make_users(1)
+    user = db.get(User, user_id)
+    assert user is not None
+    before = versions()
+    crud.user.update(db, db_obj=user, obj_in={'last_name': 'Changed'})
+    assert bumped(before) == {'users'}
+
+
+def test_core_statements_bump_their_tables(
+    db: Session,
+    make_roles: Callable[[int], list[str]],
+    make_users: Callable[[int], list[str]],
+) -> None:
+    (user_id,) = make_users(1)
+    parent, child = make_roles(2)
+
+    before = versions()
+    crud.membership.apply(db, add=[(user_id, child)])
+    assert bumped(before) == {'user_roles'}
+
+    before = versions()
+    crud.role_hierarchy.add_parent(db, role_id=child, parent_id=parent)
+    assert bumped(before) == {'role_hierarchy', 'role_closure'}
+
+    before = versions()
+    crud.user.remove(db, id=user_id)
+    assert bumped(before) == {'users', 'user_roles'}
+
+
+def test_async_writes_bump_through_run_sync(
+    client: TestClient,
+    make_roles: Callable[[int], list[str]],
+    make_users: Callable[[int], list[str]],
+) -> None:
+    (user_id,) = make_users(1)
+    (role_id,) = make_roles(1)
+
+    async def assign() -> None:
+        async with AsyncSessionLocal() as db:
+            await crud.membership.apply_async(db, add=[(user_id, role_id)])
+
+    before = versions()
+    # Run on the app's event loop, which owns the async engine's connections
+    assert client.portal is not None
+    client.portal.call(assign)
+    assert bumped(before) == {'user_roles'}
+
+
+def test_reads_and_rollbacks_do_not_bump(
+    client: TestClient,
+    headers: dict[str, str],
+    db: Session,
+    make_roles: Callable[[int], list[str]],
+) -> None:
+    parent, child = make_roles(2)
+    crud.role_hierarchy.add_parent(db, role_id=child, parent_id=parent)
+
+    before = versions()
+    for path in ['/api/v1/users/', '/api/v1/roles/', f'/api/v1/roles/{child}/parents']:
+        assert client.get(path, headers=headers).status_code == 200
+    # A duplicate link rolls back without writing
+    assert not crud.role_hierarchy.add_parent(db, role_id=child, parent_id=parent)
+    assert bumped(before) == set()
+
+
+def test_conditional_get(
+    client: TestClient,
+    headers: dict[str, str],
+    db: Session,
+    make_users: Callable[[int], list[str]],
+) -> None:
+    (user_id,) = make_users(1)
+    path = f'/api/v1/users/{user_id}'
+    response = client.get(path, headers=headers)
+    assert response.status_code == 200
+    etag = response.headers['etag']
+    assert response.headers['last-modified']
+
+    response = client.get(path, headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.content == b''
+    assert response.headers['etag'] == etag
+    weak = client.get(path, headers={**headers, 'If-None-Match': f'"0", W/{etag}'})
+    assert weak.status_code == 304
+
+    user = db.get(User, user_id)
+    assert user is not None
+    crud.user.update(db, db_obj=user, obj_in={'last_name': 'Renamed'})
+    response = client.get(path, headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['etag'] != etag
+    assert response.json()['last_name'] == 'Renamed'
+
+
+def test_detail_etag_and_body_share_a_session(
+    client: TestClient,
+    headers: dict[str, str],
+    make_roles: Callable[[int], list[str]],
+) -> None:
+    (role_id,) = make_roles(1)
+    # Which session read the versions and which built the body
+    readers: dict[str, set[int]] = {'versions': set(), 'body': set()}
+
+    def record(state: ORMExecuteState) -> None:
+        sql = str(state.statement)
+        if 'FROM table_versions' in sql:
+            readers['versions'].add(id(state.session))
+        elif 'FROM roles' in sql:
+            readers['body'].add(id(state.session))
+
+    role_cache.invalidate(role_id)
+    event.listen(Session, 'do_orm_execute', record)
+    try:
+        response = client.get(f'/api/v1/roles/{role_id}', headers=headers)
+    finally:
+        event.remove(Session, 'do_orm_execute', record)
+    assert response.status_code == 200
+    assert len(readers['versions']) == 1
+    assert readers['versions'] == readers['body']
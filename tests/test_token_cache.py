@@ -0,0 +1,68 @@
+import secrets
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.cache import MISSING, LRUCache, token_cache
+
+
+def test_lru_evicts_the_least_recently_used_entry() -> None:
+    cache = LRUCache(2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is MISSING
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_none_is_only_cached_with_a_negative_ttl() -> None:
+    plain = LRUCache(4)
+    plain.set('absent', None)
+    assert plain.get('absent') is MISSING
+
+    negative = LRUCache(4, negative_ttl=60)
+    negative.set('absent', None)
+    assert negative.get('absent') is None
+
+
+def test_fill_racing_an_invalidation_is_not_stored() -> None:
+    cache = LRUCache(4)
+
+    def load() -> str:
+        # A write lands while the value is being read from the source
+        cache.invalidate('key')
+        return 'stale'
+
+    assert cache.read_through('key', load) == 'stale'
+    assert cache.get('key') is MISSING
+
+
+def status_for(client: TestClient, bearer: str) -> int:
+    return client.get('/api/v1/roles/', headers={'Authorization': f'Bearer {bearer}'}).status_code
+
+
+def test_token_writes_invalidate_cached_lookups(client: TestClient, db: Session) -> None:
+    bearer = secrets.token_urlsafe(24)[:32]
+
+    assert status_for(client, bearer) == 401
+    # The miss is cached, so creating the token must drop it again
+    assert token_cache.get(bearer) is None
+    token = crud.token.create(db, token=bearer)
+    assert status_for(client, bearer) == 200
+    assert token_cache.get(bearer) == token.id
+
+    crud.token.remove(db, id=token.id)
+    assert token_cache.get(bearer) is MISSING
+    assert status_for(client, bearer) == 401
+
+
+def test_bulk_token_removal_invalidates_every_token(db: Session) -> None:
+    tokens = [crud.token.create(db) for _ in range(3)]
+    for token in tokens:
+        token_cache.set(token.token, token.id)
+
+    crud.token.remove_many(db, ids=[token.id for token in tokens])
+    assert all(token_cache.get(token.token) is MISSING for token in tokens)
@@ -0,0 +1,74 @@
+from collections.abc import Callable
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.models.user import User, user_roles
+
+
+def assignments(db: Session, user_ids: list[str]) -> int:
+    stmt = select(func.count()).select_from(user_roles).where(user_roles.c.user_id.in_(user_ids))
+    return db.scalar(stmt) or 0
+
+
+@pytest.fixture
+def members(db: Session, make_users: Callable, make_roles: Callable) -> tuple[str, list[str]]:
+    """A role and the three users assigned to it."""
+    [role_id] = make_roles(1)
+    user_ids = make_users(3)
+    crud.membership.replace_role_users(db, role_id=role_id, user_ids=user_ids)
+    return role_id, user_ids
+
+
+def test_bulk_delete_reports_missing_ids(
+    client: TestClient, headers: dict[str, str], db: Session, members: tuple[str, list[str]]
+) -> None:
+    role_id, (first, second, kept) = members
+    # Warm the role's cached response, which lists its users
+    assert len(client.get(f'/api/v1/roles/{role_id}', headers=headers).json()['user_ids']) == 3
+
+    response = client.request(
+        'DELETE', '/api/v1/users/', headers=headers, json={'ids': [second, 'missing', first]}
+    )
+    assert response.status_code == 200
+    assert response.json() == {'deleted': [second, first], 'not_found': ['missing']}
+
+    assert set(db.scalars(select(User.id).where(User.id.in_([first, second, kept])))) == {kept}
+    assert assignments(db, [first, second]) == 0
+    assert client.get(f'/api/v1/roles/{role_id}', headers=headers).json()['user_ids'] == [kept]
+
+    # Deleting again finds nothing
+    again = client.request('DELETE', '/api/v1/users/', headers=headers, json={'ids': [first]})
+    assert again.json() == {'deleted': [], 'not_found': [first]}
+
+
+def test_bulk_delete_needs_at_least_one_id(client: TestClient, headers: dict[str, str]) -> None:
+    response = client.request('DELETE', '/api/v1/users/', headers=headers, json={'ids': []})
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize('count', [1, 20])
+def test_deletion_is_a_fixed_number_of_statements(
+    db: Session, make_users: Callable, make_roles: Callable, statements: list[str], count: int
+) -> None:
+    user_ids = make_users(count)
+    for role_id in make_roles(2):
+        crud.membership.replace_role_users(db, role_id=role_id, user_ids=user_ids)
+
+    statements.clear()
+    crud.user.remove_many(db, ids=user_ids)
+    deletes = [sql for sql in statements if sql.lstrip().startswith('DELETE')]
+    assert len(deletes) == 2
+    assert assignments(db, user_ids) == 0
+
+
+def test_single_delete(
+    client: TestClient, headers: dict[str, str], db: Session, members: tuple[str, list[str]]
+) -> None:
+    _, (user_id, *_) = members
+    assert client.delete(f'/api/v1/users/{user_id}', headers=headers).status_code == 204
+    assert assignments(db, [user_id]) == 0
+    assert client.delete(f'/api/v1/users/{user_id}', headers=headers).status_code == 404
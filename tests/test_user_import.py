@@ -0,0 +1,141 @@
+import asyncio
+import json
+from collections.abc import AsyncIterator
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core import user_import
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.security import verify_password
+from app.schemas.user import UserCreate, UserImportResponse
+from tests.conftest import unique
+
+
+def test_csv_and_ndjson_rows_are_reported_in_order(
+    client: TestClient, headers: dict[str, str]
+) -> None:
+    email = f'{unique("import")}@example.com'
+    body = (
+        'first_name,last_name,email,password\n'
+        f'Ada,Lovelace,{email},\n'
+        'Bad,Row,not-an-email,\n'
+        f'Ada,Again,{email},secret123\n'
+    )
+    response = client.post(
+        '/api/v1/users/bulk', headers={**headers, 'Content-Type': 'text/csv'}, content=body
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert (result['created'], result['failed']) == (1, 2)
+    created, invalid, duplicate = result['results']
+    assert created['status'] == 'created' and created['generated_password']
+    assert invalid['row'] == 2 and invalid['error'].startswith('email:')
+    assert duplicate['error'] == 'Duplicate email in import'
+
+    # The same email in a later import is rejected by the existence check
+    line = json.dumps({'first_name': 'Ada', 'last_name': 'L', 'email': email})
+    response = client.post(
+        '/api/v1/users/bulk',
+        headers={**headers, 'Content-Type': 'application/x-ndjson'},
+        content=line + '\n',
+    )
+    assert response.json()['results'][0]['error'] == 'A user with this email already exists.'
+
+
+def test_conflicting_batch_falls_back_to_row_by_row(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    taken, fresh = f'{unique("taken")}@example.com', f'{unique("fresh")}@example.com'
+
+    async def no_existing(db: AsyncSession, *, emails: list[str]) -> set[str]:
+        # Behave as if another writer inserted `taken` after the existence check
+        return set()
+
+    async def run() -> UserImportResponse:
+        async def records() -> AsyncIterator[dict]:
+            for email in (taken, fresh):
+                yield {
+                    'first_name': 'Row',
+                    'last_name': 'Import',
+                    'email': email,
+                    'password': 'pass1234',
+                }
+
+        async with AsyncSessionLocal() as db:
+            await crud.user.create_many_async(
+                db,
+                objs_in=[UserCreate(first_name='A', last_name='B', email=taken)],
+                refresh=False,
+                hashed_passwords=['x'],
+            )
+            monkeypatch.setattr(crud.user, 'get_existing_emails_async', no_existing)
+            return await user_import.import_users(db, records())
+
+    result = client.portal.call(run)
+    assert [row.status for row in result.results] == ['error', 'created']
+    assert result.results[1].email == fresh
+
+
+async def chunked(body: bytes, size: int) -> AsyncIterator[bytes]:
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+@pytest.mark.parametrize('size', [1, 7, 1000])
+def test_csv_records_are_parsed_across_chunk_boundaries(size: int) -> None:
+    body = '\ufefffirst_name,email\r\n"Smith, Jr",a@example.com\r\n\r\nBo,\r\n'.encode()
+
+    async def read() -> list:
+        records = user_import.read_records('text/csv', chunked(body, size))
+        return [record async for record in records]
+
+    assert asyncio.run(read()) == [
+        {'first_name': 'Smith, Jr', 'email': 'a@example.com'},
+        {'first_name': 'Bo'},
+    ]
+
+
+@pytest.mark.parametrize(
+    ('content_type', 'body', 'status_code'),
+    [('application/json', b'{"email": "a@example.com"}', 400), ('text/plain', b'x', 415)],
+)
+def test_unreadable_bodies_are_rejected(
+    client: TestClient, headers: dict[str, str], content_type: str, body: bytes, status_code: int
+) -> None:
+    response = client.post(
+        '/api/v1/users/bulk', headers={**headers, 'Content-Type': content_type}, content=body
+    )
+    assert response.status_code == status_code
+
+
+def test_batches_hash_the_given_passwords(
+    client: TestClient, db: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, 'user_import_batch_size', 2)
+    rows = [
+        {'first_name': 'Batch', 'last_name': 'Row', 'email': f'{unique("b")}@example.com'}
+        for _ in range(3)
+    ]
+    rows[0]['password'] = 'pass1234'
+
+    async def run() -> UserImportResponse:
+        async def records() -> AsyncIterator[dict]:
+            for row in rows:
+                yield row
+
+        async with AsyncSessionLocal() as session:
+            return await user_import.import_users(session, records())
+
+    result = client.portal.call(run)
+    assert result.created == 3
+    first, *generated = result.results
+    assert first.generated_password is None
+    assert all(row.generated_password for row in generated)
+    user = crud.user.get(db, id=first.id)
+    assert user is not None
+    assert verify_password('pass1234', user.hashed_password)
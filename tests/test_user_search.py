@@ -0,0 +1,91 @@
+import random
+import string
+from typing import Optional
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core import user_search
+from app.schemas.user import UserCreate
+
+
+@pytest.mark.parametrize(
+    ('query', 'expression'),
+    [
+        ('Jan smi', '"jan"* "smi"*'),
+        ('o\'brien-smith', '"o"* "brien"* "smith"*'),
+        ('"*^', None),
+    ],
+)
+def test_match_expression(query: str, expression: Optional[str]) -> None:
+    assert user_search.match_expression(query) == expression
+
+
+@pytest.fixture
+def surname(db: Session) -> str:
+    """A surname shared by three new users: Ada, Adam and Bob."""
+    name = 'Zq' + ''.join(random.choices(string.ascii_lowercase, k=10))
+    objs_in = [
+        UserCreate(first_name=first_name, last_name=name, email=f'{name}.{index}@example.com')
+        for index, first_name in enumerate(('Ada', 'Adam', 'Bob'))
+    ]
+    crud.user.create_many(db, objs_in=objs_in, hashed_passwords=['x'] * 3)
+    return name
+
+
+def search(client: TestClient, headers: dict[str, str], q: str) -> list[str]:
+    response = client.get('/api/v1/users/search', params={'q': q}, headers=headers)
+    assert response.status_code == 200
+    return sorted(user['first_name'] for user in response.json())
+
+
+def test_index_is_installed() -> None:
+    assert user_search.enabled
+
+
+def test_every_word_matches_as_a_prefix(
+    client: TestClient, headers: dict[str, str], surname: str
+) -> None:
+    assert search(client, headers, surname[:6]) == ['Ada', 'Adam', 'Bob']
+    assert search(client, headers, f'ad {surname[:4]}') == ['Ada', 'Adam']
+    assert search(client, headers, f'adam {surname}') == ['Adam']
+    assert search(client, headers, f'carol {surname}') == []
+
+
+def test_index_follows_updates_and_deletes(
+    client: TestClient, headers: dict[str, str], db: Session, surname: str
+) -> None:
+    bob = crud.user.search(db, query=f'bob {surname}')[0]
+    crud.user.update(db, db_obj=bob, obj_in={'first_name': 'Carl'})
+    assert search(client, headers, f'carl {surname}') == ['Carl']
+    assert search(client, headers, f'bob {surname}') == []
+
+    crud.user.remove(db, id=bob.id)
+    assert search(client, headers, surname) == ['Ada', 'Adam']
+
+
+def test_pages_through_ranked_results(
+    client: TestClient, headers: dict[str, str], surname: str
+) -> None:
+    seen = []
+    params: dict[str, object] = {'q': surname, 'limit': 2, 'include_total': True}
+    while True:
+        response = client.get('/api/v1/users/search', params=params, headers=headers)
+        assert response.headers['X-Total-Count'] == '3'
+        seen += [user['first_name'] for user in response.json()]
+        if 'X-Next-Cursor' not in response.headers:
+            break
+        params['cursor'] = response.headers['X-Next-Cursor']
+    assert sorted(seen) == ['Ada', 'Adam', 'Bob']
+
+
+def test_substring_scan_without_the_index(
+    db: Session, surname: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(user_search, 'enabled', False)
+    # The scan matches the query as one substring anywhere
+    users = crud.user.search(db, query=surname[2:])
+    assert [user.first_name for user in users] == ['Ada', 'Adam', 'Bob']
+    assert crud.user.count_search(db, query=f'{surname}.1@') == 1
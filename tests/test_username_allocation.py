@@ -0,0 +1,67 @@
+import uuid
+
+import pytest
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.crud.crud_username_counter import suffix_of
+from app.models.user import User
+from app.models.username_counter import UsernameCounter
+from app.schemas.user import UserCreate
+
+
+@pytest.mark.parametrize(
+    ('username', 'suffix'),
+    [('jdoe', 0), ('jdoe7', 7), ('jdoe12', 12), ('jdoex', None), ('jdo', None), ('ajdoe', None)],
+)
+def test_suffix_of(username: str, suffix: int) -> None:
+    assert suffix_of(username, 'jdoe') == suffix
+
+
+class TestAllocation:
+    """Every test gets a last name of its own, so it owns the username base."""
+
+    @pytest.fixture(autouse=True)
+    def names(self) -> None:
+        # Names may only contain letters
+        letters = ''.join(chr(ord('a') + int(digit, 16)) for digit in uuid.uuid4().hex[:10])
+        self.last_name = f'Doe{letters}'
+        self.base = f'j{self.last_name.lower()}'
+
+    def user_in(self, first_name: str = 'Jane', last_name: str = '') -> UserCreate:
+        email = f'{uuid.uuid4()}@example.com'
+        return UserCreate(first_name=first_name, last_name=last_name or self.last_name, email=email)
+
+    def create(self, db: Session, count: int = 1) -> list[str]:
+        objs_in = [self.user_in() for _ in range(count)]
+        users = crud.user.create_many(db, objs_in=objs_in, hashed_passwords=['x'] * count)
+        return [user.username for user in users]
+
+    def test_repeated_bases_get_consecutive_suffixes(self, db: Session) -> None:
+        assert self.create(db, 3) == [self.base, f'{self.base}1', f'{self.base}2']
+        assert self.create(db) == [f'{self.base}3']
+
+    def test_first_use_starts_after_existing_usernames(self, db: Session) -> None:
+        self.create(db, 2)
+        # A base whose counter is missing, e.g. users created before counters existed
+        db.execute(delete(UsernameCounter).where(UsernameCounter.base == self.base))
+        db.commit()
+        assert self.create(db) == [f'{self.base}2']
+
+    def test_collision_with_a_username_the_counter_did_not_hand_out(
+        self, db: Session, statements: list[str]
+    ) -> None:
+        [first] = self.create(db)
+        # Another user is renamed onto a suffix the counter has yet to hand out
+        other = crud.user.create(db, obj_in=self.user_in('Other', 'Person'), hashed_password='x')
+        db.execute(update(User).where(User.id == other.id).values(username=f'{self.base}2'))
+        db.commit()
+
+        user = crud.user.create(db, obj_in=self.user_in(), hashed_password='x')
+        assert user.username == f'{self.base}1'
+        # base2 is taken, so the insert fails once and the resynced counter moves past it
+        statements.clear()
+        assert self.create(db, 2) == [f'{self.base}3', f'{self.base}4']
+        assert sum(sql.lstrip().upper().startswith('INSERT INTO USERS') for sql in statements) == 2
+        assert first == self.base